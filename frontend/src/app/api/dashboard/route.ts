@@ -10,9 +10,22 @@ export async function GET(req: NextRequest) {
     const params = new URLSearchParams({ max_items: '1000' });
     if (department && department !== 'All') params.set('department', department);
     const target = `${String(base).replace(/\/$/, '')}/dashboard_data?${params.toString()}`;
-    const res = await fetch(target, { method: 'GET', cache: 'no-store' });
+    // Revalidate against the backend's ETag instead of refetching: the browser's
+    // If-None-Match is forwarded, and a 304 is passed through without a body.
+    const headers: Record<string, string> = {};
+    const ifNoneMatch = req.headers.get('if-none-match');
+    if (ifNoneMatch) headers['If-None-Match'] = ifNoneMatch;
+    const res = await fetch(target, { method: 'GET', headers, cache: 'no-store' });
+    const passthrough: Record<string, string> = {};
+    for (const name of ['etag', 'cache-control', 'x-data-version']) {
+      const value = res.headers.get(name);
+      if (value) passthrough[name] = value;
+    }
+    if (res.status === 304) {
+      return new NextResponse(null, { status: 304, headers: passthrough });
+    }
     const text = await res.text();
-    return new NextResponse(text, { status: res.status, headers: { 'Content-Type': res.headers.get('content-type') || 'application/json' } });
+    return new NextResponse(text, { status: res.status, headers: { ...passthrough, 'Content-Type': res.headers.get('content-type') || 'application/json' } });
   } catch (err: any) {
     return NextResponse.json({ error: String(err?.message || err) }, { status: 500 });
   }
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import embedding_backends  # noqa: E402
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outputs", "clean_csv.csv")
+
+SAMPLE_TEXTS = [
+    "Love this dress! It fits perfectly and the fabric is so soft.",
+    "The zipper broke after one wear and the return process was a nightmare.",
+    "Runs small, I had to exchange it for a size up.",
+    "Decent quality for the price, nothing special.",
+    "Shipping took three weeks and the package arrived damaged.",
+]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 + int8) and check parity")
+    p.add_argument("--model", default=DEFAULT_MODEL, help="SentenceTransformer model name")
+    p.add_argument("--opset", type=int, default=14, help="ONNX opset version")
+    p.add_argument("--skip-export", action="store_true", help="Only run the parity check on existing files")
+    p.add_argument("--csv", default=DEFAULT_CSV, help="CSV with a 'Review Text' column for the parity sample")
+    p.add_argument("--sample", type=int, default=512, help="Number of texts used for the parity check")
+    p.add_argument("--min-cosine", type=float, default=0.98, help="Fail if any backend's min cosine drops below this")
+    return p.parse_args()
+
+
+def export(model_name: str, opset: int) -> str:
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    pooling = next((m for m in st if isinstance(m, Pooling)), None)
+    if pooling is not None and not getattr(pooling, "pooling_mode_mean_tokens", True):
+        raise SystemExit("Only mean-pooling models are supported by the ONNX backend")
+
+    out_dir = embedding_backends.backend_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = embedding_backends.onnx_model_path(model_name, "onnx")
+    int8_path = embedding_backends.onnx_model_path(model_name, "onnx-int8")
+
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    print(f"Exporting {model_name} to {fp32_path} ...")
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(dummy[k] for k in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    print(f"Quantizing weights to int8 -> {int8_path} ...")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, "backend.json"), "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "model_name": model_name,
+                "max_seq_length": int(st.max_seq_length or 256),
+                "normalize": any(isinstance(m, Normalize) for m in st),
+            },
+            fh,
+            indent=2,
+        )
+    for path in (fp32_path, int8_path):
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1e6:.1f} MB")
+    return out_dir
+
+
+def load_sample(csv_path: str, n: int):
+    if os.path.exists(csv_path):
+        import pandas as pd
+
+        texts = pd.read_csv(csv_path, usecols=["Review Text"])["Review Text"].dropna().astype(str)
+        if len(texts):
+            return texts.sample(n=min(n, len(texts)), random_state=1).tolist()
+    return (SAMPLE_TEXTS * (n // len(SAMPLE_TEXTS) + 1))[:n]
+
+
+def main():
+    args = parse_args()
+    if not args.skip_export:
+        export(args.model, args.opset)
+
+    texts = load_sample(args.csv, args.sample)
+    print(f"\nParity check on {len(texts)} texts:")
+    report = embedding_backends.parity_report(texts, args.model)
+    ok = True
+    for backend, r in report.items():
+        print(
+            f"  {backend:<10} {r['texts_per_s']:8.1f} texts/s"
+            f"  speedup={r.get('speedup', 1.0):.2f}x"
+            f"  mean_cos={r['mean_cosine']:.4f}  min_cos={r['min_cosine']:.4f}"
+        )
+        if r["min_cosine"] < args.min_cosine:
+            ok = False
+    if not ok:
+        print(f"\nFAIL: a backend drifted below min cosine {args.min_cosine}")
+        sys.exit(1)
+    print("\nOK. Select a backend with EMBEDDING_BACKEND=onnx or EMBEDDING_BACKEND=onnx-int8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Gemini REST API, for exercising src/llm_client.py.
+
+Implements POST /v1beta/models/<model>:generateContent and answers
+deterministically from the prompt:
+  - batch prediction prompts ([id=N] blocks)  -> JSON array, one object per id
+  - single prediction prompts                 -> JSON object
+  - anything else (RAG, replies, summaries)    -> short plain-text echo
+The reply is derived from the sentiment_score in the prompt's Signals line.
+
+--latency adds a fixed delay; --fail-rate makes that fraction of requests
+answer 429 or 503, so rate limiting, retries and deadlines can be observed.
+
+Usage:
+  python scripts/fake_gemini_server.py --port 8765 --latency 0.2 --fail-rate 0.1
+  GEMINI_API_ENDPOINT=http://127.0.0.1:8765 GEMINI_API_KEY=fake uvicorn fastapi_serve:app --app-dir src
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SCORE_RE = re.compile(r"sentiment_score=(-?\d+(?:\.\d+)?)")
+_ITEM_RE = re.compile(r"\[id=(\d+)\]\n(?:.*\n)*?Signals: [^\n]*?sentiment_score=(-?\d+(?:\.\d+)?)")
+
+STATS = {"requests": 0, "failures": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _prediction(score: float) -> dict:
+    nps = int(round(max(0.0, min(10.0, 5.0 + 5.0 * score))))
+    return {"repeat_purchase": nps >= 7, "nps_score": nps, "reason": f"fake: sentiment_score={score:.3f}"}
+
+
+def answer(prompt: str) -> str:
+    items = _ITEM_RE.findall(prompt)
+    if items and "JSON array" in prompt:
+        return json.dumps([{"id": int(i), **_prediction(float(s))} for i, s in items])
+    m = _SCORE_RE.search(prompt)
+    if m and "JSON object" in prompt:
+        return json.dumps(_prediction(float(m.group(1))))
+    return f"[fake gemini] {len(prompt)} chars received."
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    for content in body.get("contents") or []:
+        for part in content.get("parts") or []:
+            if isinstance(part, dict) and part.get("text"):
+                parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def make_handler(latency: float, fail_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            with _STATS_LOCK:
+                STATS["requests"] += 1
+            if not self.path.split("?")[0].endswith(":generateContent"):
+                self._send(404, {"error": {"code": 404, "message": f"unknown path {self.path}", "status": "NOT_FOUND"}})
+                return
+            if latency:
+                time.sleep(latency)
+            if fail_rate and random.random() < fail_rate:
+                with _STATS_LOCK:
+                    STATS["failures"] += 1
+                code, status = random.choice(((429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")))
+                self._send(code, {"error": {"code": code, "message": "fake failure", "status": status}})
+                return
+            text = answer(_prompt_text(body))
+            self._send(
+                200,
+                {
+                    "candidates": [
+                        {"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}
+                    ],
+                    "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+                },
+            )
+
+        def do_GET(self):  # noqa: N802
+            with _STATS_LOCK:
+                self._send(200, dict(STATS))
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Fake Gemini generateContent server for local testing")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 429/503")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency, args.fail_rate))
+    print(f"Fake Gemini listening on http://{args.host}:{args.port} (GET / for request counters)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# src/sentiment.py adds this directory to nltk's data path
+DEFAULT_DIR = os.path.join(ROOT, "data", "nltk_data")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Replace the committed VADER lexicon in data/nltk_data with nltk's download (the server never downloads it)")
+    p.add_argument("--dir", default=DEFAULT_DIR, help="nltk data directory to download into")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    import nltk
+
+    os.makedirs(args.dir, exist_ok=True)
+    if not nltk.download("vader_lexicon", download_dir=args.dir, quiet=True, raise_on_error=True):
+        raise SystemExit("nltk.download('vader_lexicon') failed")
+    path = os.path.join(args.dir, "sentiment", "vader_lexicon.zip")
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+DEFAULT_BUDGET = os.path.join(ROOT, "scripts", "import_budget.json")
+
+# "import time: self [us] | cumulative | imported package", nesting shown by indentation
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Measure cold import time of the server modules and check it against a budget")
+    p.add_argument("modules", nargs="*", help="Modules to measure (default: the ones in the budget file)")
+    p.add_argument("--budget-file", default=DEFAULT_BUDGET, help="JSON {module: seconds}")
+    p.add_argument("--budget", action="append", default=[], metavar="MOD=SECONDS", help="Override one budget")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest one is reported")
+    p.add_argument("--top", type=int, default=10, help="Heaviest direct imports to list per module")
+    p.add_argument("--json", action="store_true", help="Print the results as JSON")
+    return p.parse_args()
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Cold import of `module` in a fresh interpreter: (seconds, [(direct import, seconds)])."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"import {module} failed")
+    # Children are printed before their parent; one leading space is depth 1, +2 per level
+    children: List[Tuple[str, float]] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)) / 1e6, len(m.group(3)), m.group(4)
+        if depth == 3:
+            children.append((name, cumulative))
+        elif depth == 1:
+            if name == module:
+                return cumulative, sorted(children, key=lambda kv: -kv[1])
+            children = []
+    raise ImportError(f"no import time reported for {module}")
+
+
+def main():
+    args = parse_args()
+    budgets: Dict[str, float] = {}
+    if os.path.exists(args.budget_file):
+        with open(args.budget_file, "r", encoding="utf-8") as fh:
+            budgets = {k: float(v) for k, v in json.load(fh).items()}
+    for item in args.budget:
+        name, _, seconds = item.partition("=")
+        budgets[name] = float(seconds)
+    modules = args.modules or list(budgets)
+    if not modules:
+        raise SystemExit("No modules given and no budget file")
+
+    results = {}
+    failed = []
+    for module in modules:
+        budget = budgets.get(module)
+        try:
+            runs = [measure(module) for _ in range(max(1, args.repeat))]
+        except ImportError as e:
+            results[module] = {"seconds": None, "budget": budget, "ok": False, "error": str(e), "heaviest": []}
+            failed.append(module)
+            continue
+        total, heaviest = min(runs, key=lambda r: r[0])
+        ok = budget is None or total <= budget
+        results[module] = {"seconds": round(total, 3), "budget": budget, "ok": ok, "heaviest": [(n, round(t, 3)) for n, t in heaviest[: args.top]]}
+        if not ok:
+            failed.append(module)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, r in results.items():
+            budget = "no budget" if r["budget"] is None else f"budget {r['budget']:.2f}s"
+            if r["seconds"] is None:
+                print(f"{module}: import failed ({budget}): {r['error']}")
+                continue
+            print(f"{module}: {r['seconds']:.3f}s ({budget}){'' if r['ok'] else '  OVER BUDGET'}")
+            for name, seconds in r["heaviest"]:
+                print(f"    {seconds:7.3f}s  {name}")
+    if failed:
+        print(f"Import budget check failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
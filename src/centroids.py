@@ -0,0 +1,132 @@
+"""
+Persisted centroid models for emotion / intent labelling ("fit once, predict many").
+
+The clustering in emotions.py / intent.py is meant for a corpus: KMeans finds
+groups of similar reviews and each group is mapped to its closest label prompt.
+Running it on a single review degenerates to one cluster of one point. Instead,
+the precompute step fits the clusters once on the whole corpus and saves the
+centers together with their label mapping; online requests then assign each
+new text to its nearest center, which costs O(k*d) per text and always gives the
+same label for the same text.
+
+Files (one per model): outputs/centroids/<name>.npz with
+  centers (k, d) float32, labels (k,) str, model_name str,
+  backend str and quantization str (embedding backend the centers were fit with)
+
+Centers are only comparable with vectors from the same encoder, so a model is
+loaded only when its model name, backend and quantization all match the active
+EMBEDDING_BACKEND (int8 ONNX vectors drift from fp32 ones, see
+embedding_backends.parity_report). Files written before the backend was recorded
+were fit with the torch encoder. On a mismatch the model is refused and the next
+full precompute re-fits it.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from . import embedding_backends  # type: ignore
+    from . import model_registry  # type: ignore
+except Exception:
+    import embedding_backends  # type: ignore
+    import model_registry  # type: ignore
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+CENTROIDS_DIR = os.getenv("CENTROIDS_DIR") or os.path.join(ROOT, "outputs", "centroids")
+
+
+@dataclass
+class CentroidModel:
+    name: str
+    model_name: str
+    centers: np.ndarray  # (k, d) KMeans cluster centers in embedding space
+    labels: List[str]    # label assigned to each center
+    backend: str = field(default_factory=lambda: model_registry.BACKEND)  # embedding backend used for the fit
+
+    @property
+    def quantization(self) -> str:
+        return embedding_backends.quantization(self.backend)
+
+    def predict_index(self, X: np.ndarray) -> np.ndarray:
+        """Index of the nearest center (Euclidean, same rule as KMeans.predict)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2); one (n, k) matmul
+        half_norms = 0.5 * np.einsum("ij,ij->i", self.centers, self.centers)
+        return np.argmax(X @ self.centers.T - half_norms, axis=1)
+
+    def predict(self, X: np.ndarray) -> List[str]:
+        return [self.labels[int(i)] for i in self.predict_index(X)]
+
+    @property
+    def dim(self) -> int:
+        return int(self.centers.shape[1])
+
+    def save(self, directory: str = CENTROIDS_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.npz")
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            centers=self.centers.astype(np.float32),
+            labels=np.asarray(self.labels, dtype=str),
+            model_name=np.asarray(self.model_name),
+            backend=np.asarray(self.backend),
+            quantization=np.asarray(self.quantization),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, name: str, directory: str = CENTROIDS_DIR) -> "CentroidModel":
+        path = os.path.join(directory, f"{name}.npz")
+        with np.load(path) as data:
+            backend = str(data["backend"]) if "backend" in data.files else "torch"
+            m = cls(
+                name=name,
+                model_name=str(data["model_name"]),
+                centers=np.asarray(data["centers"], dtype=np.float32),
+                labels=[str(x) for x in data["labels"]],
+                backend=backend,
+            )
+            stored_quant = str(data["quantization"]) if "quantization" in data.files else m.quantization
+        if stored_quant != m.quantization:
+            raise ValueError(f"{path}: quantization {stored_quant!r} does not match backend {backend!r}")
+        return m
+
+
+def load_centroid_model(
+    name: str,
+    model_name: str,
+    directory: str = CENTROIDS_DIR,
+    backend: Optional[str] = None,
+) -> Optional[CentroidModel]:
+    """Load a persisted model, or None if missing, unreadable or fit with another encoder.
+
+    backend defaults to the active EMBEDDING_BACKEND.
+    """
+    backend = (backend or model_registry.BACKEND).lower()
+    try:
+        m = CentroidModel.load(name, directory)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[centroids] Failed to load {name} model from {directory}: {e}")
+        return None
+    if m.model_name != model_name:
+        print(f"[centroids] Ignoring {name} model fit with {m.model_name} (expected {model_name})")
+        return None
+    if m.backend != backend or m.quantization != embedding_backends.quantization(backend):
+        print(
+            f"[centroids] Ignoring {name} model fit with the {m.backend} ({m.quantization}) backend "
+            f"(active: {backend}); re-run precompute_dashboard.py to re-fit it"
+        )
+        return None
+    return m
@@ -0,0 +1,85 @@
+"""
+Micro-batching request coalescer.
+
+The Chrome extension calls /analyze_review once per review on a page, so a
+page load arrives as dozens of concurrent single-item requests. MicroBatcher
+holds each submitted item for at most `window_ms`, or until `max_batch` items are
+waiting, then runs them through one batch function call (one embedding pass,
+one classification pass and, with GEMINI_BATCH_PREDICT, packed Gemini calls)
+and hands each caller its own result.
+
+A lone request pays at most the window in extra latency; under concurrency
+throughput approaches the /analyze_reviews batch path.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(self, fn: Callable[[List[T]], Awaitable[List[R]]], window_ms: float = 5.0, max_batch: int = 32):
+        self.fn = fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[T, "asyncio.Future[R]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, item: T) -> R:
+        """Queue one item and wait for its result from the next batch."""
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[R]" = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch or self.window == 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Callers that gave up (client disconnected) are dropped from the batch
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        task = asyncio.ensure_future(self._run(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, "asyncio.Future[R]"]]) -> None:
+        try:
+            results = await self.fn([item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": (self.items / self.batches) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
@@ -0,0 +1,249 @@
+"""
+Precomputed aggregate cube for dashboard queries.
+
+Every dashboard number (review count, mean rating, NPS, sentiment and emotion
+counts, per-department mean rating) is a sum of additive measures. The
+precompute step therefore bins all reviews once into a dense cube over
+
+  department x class x rating x sentiment x emotion x age_bucket
+
+holding `count` and `rating_sum` per cell. A query with any combination of
+filters slices the cube and sums; its cost depends on the number of cells, not
+on the number of reviews.
+
+Because the measures are additive, an incremental refresh updates the cube with
+apply_delta (subtract the rows that left, add the rows that came in) instead
+of re-binning every review. `generation` records which reviews cache
+generation (review_store) the cube aggregates, so a delta is only applied to
+the cube of the cache it was computed against.
+
+File: outputs/dashboard_cube.npz (labels per dimension, the two measures, generation)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+CUBE_PATH = os.path.join(ROOT, "outputs", "dashboard_cube.npz")
+
+DIMENSIONS = ["department", "class", "rating", "sentiment", "emotion", "age_bucket"]
+
+# Upper bounds (exclusive) of the age bands; 0 / missing ages go to "unknown"
+AGE_EDGES = [25, 35, 45, 55, 65]
+AGE_BUCKETS = ["<25", "25-34", "35-44", "45-54", "55-64", "65+", "unknown"]
+
+
+def age_buckets(ages: Sequence[Any]) -> np.ndarray:
+    """Age band label per value ("unknown" for missing or non-positive ages)."""
+    a = pd.to_numeric(pd.Series(ages), errors="coerce").to_numpy(dtype=float)
+    idx = np.searchsorted(AGE_EDGES, np.nan_to_num(a), side="right")
+    out = np.asarray(AGE_BUCKETS[:-1], dtype=object)[idx]
+    out[~np.isfinite(a) | (a <= 0)] = "unknown"
+    return out
+
+
+def dimension_values(dfp: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Cube coordinates (as strings) for each row of a precomputed reviews frame."""
+    n = len(dfp)
+
+    def _col(name: str, default: Any) -> pd.Series:
+        return dfp[name] if name in dfp.columns else pd.Series([default] * n, index=dfp.index)
+
+    rating = pd.to_numeric(_col("rating", 0), errors="coerce").fillna(0)
+    return {
+        "department": _col("department", "Unknown").astype(str).to_numpy(),
+        "class": _col("class", "Unknown").astype(str).to_numpy(),
+        "rating": rating.round().astype(int).astype(str).to_numpy(),
+        "sentiment": _col("sentiment", "neutral").astype(str).to_numpy(),
+        "emotion": _col("emotion", "neutral").astype(str).to_numpy(),
+        "age_bucket": age_buckets(_col("age", np.nan)),
+    }
+
+
+@dataclass
+class AggregateCube:
+    labels: Dict[str, List[str]]  # dimension -> labels, axis order = DIMENSIONS
+    count: np.ndarray             # int64, one axis per dimension
+    rating_sum: np.ndarray        # float64, same shape
+    generation: str = ""          # reviews cache generation aggregated ("" = unknown)
+
+    @classmethod
+    def from_frame(cls, dfp: pd.DataFrame) -> "AggregateCube":
+        values = dimension_values(dfp)
+        labels: Dict[str, List[str]] = {}
+        codes = []
+        for dim in DIMENSIONS:
+            cat = pd.Categorical(values[dim])
+            labels[dim] = [str(c) for c in cat.categories]
+            codes.append(cat.codes.astype(np.int64))
+        shape = tuple(max(1, len(labels[d])) for d in DIMENSIONS)
+        size = int(np.prod(shape))
+        if len(dfp):
+            flat = np.ravel_multi_index(tuple(codes), shape)
+            ratings = pd.to_numeric(dfp["rating"], errors="coerce").fillna(0).to_numpy(dtype=float)
+            count = np.bincount(flat, minlength=size)
+            rating_sum = np.bincount(flat, weights=ratings, minlength=size)
+        else:
+            count = np.zeros(size, dtype=np.int64)
+            rating_sum = np.zeros(size, dtype=np.float64)
+        return cls(labels=labels, count=count.astype(np.int64).reshape(shape), rating_sum=rating_sum.reshape(shape))
+
+    def apply_delta(self, removed: pd.DataFrame, added: pd.DataFrame, generation: str = "") -> "AggregateCube":
+        """New cube with the rows of `removed` taken out and those of `added` put in.
+
+        Labels first seen in `added` get new slices; labels no row uses any more
+        are dropped, so the result equals from_frame() of the updated reviews.
+        Raises ValueError when a removed row is not in the cube.
+        """
+        rv, av = dimension_values(removed), dimension_values(added)
+        labels = {dim: sorted(set(self.labels[dim]) | set(av[dim].tolist())) for dim in DIMENSIONS}
+        shape = tuple(max(1, len(labels[d])) for d in DIMENSIONS)
+        count = np.zeros(shape, dtype=np.int64)
+        rating_sum = np.zeros(shape, dtype=np.float64)
+        if self.count.size and all(self.labels[d] for d in DIMENSIONS):
+            old = np.ix_(*[np.searchsorted(labels[d], self.labels[d]) for d in DIMENSIONS])
+            count[old] = self.count
+            rating_sum[old] = self.rating_sum
+
+        def _flat(values: Dict[str, np.ndarray], rows: int) -> np.ndarray:
+            if not rows:
+                return np.zeros(0, dtype=np.int64)
+            codes = []
+            for dim in DIMENSIONS:
+                lab = np.asarray(labels[dim], dtype=object)
+                pos = np.minimum(np.searchsorted(lab, values[dim]), len(lab) - 1)
+                if np.any(lab[pos] != values[dim]):
+                    raise ValueError(f"removed rows have {dim} values the cube does not have")
+                codes.append(pos.astype(np.int64))
+            return np.ravel_multi_index(tuple(codes), shape)
+
+        def _ratings(frame: pd.DataFrame) -> np.ndarray:
+            if not len(frame):
+                return np.zeros(0, dtype=float)
+            return pd.to_numeric(frame["rating"], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+        flat_count, flat_sum = count.reshape(-1), rating_sum.reshape(-1)
+        removed_at = _flat(rv, len(removed))
+        np.subtract.at(flat_count, removed_at, 1)
+        np.subtract.at(flat_sum, removed_at, _ratings(removed))
+        added_at = _flat(av, len(added))
+        np.add.at(flat_count, added_at, 1)
+        np.add.at(flat_sum, added_at, _ratings(added))
+        if np.any(flat_count < 0):
+            raise ValueError("removed rows are not all counted in the cube")
+        return AggregateCube(labels=labels, count=count, rating_sum=rating_sum, generation=generation)._compact()
+
+    def _compact(self) -> "AggregateCube":
+        """Drop labels without any rows (as from_frame never creates them)."""
+        count, rating_sum, labels = self.count, self.rating_sum, dict(self.labels)
+        if int(count.sum()) == 0:
+            empty = AggregateCube.from_frame(pd.DataFrame({"rating": []}))
+            empty.generation = self.generation
+            return empty
+        for axis, dim in enumerate(DIMENSIONS):
+            other = tuple(a for a in range(len(DIMENSIONS)) if a != axis)
+            keep = np.flatnonzero(count.sum(axis=other) > 0)
+            if len(keep) < count.shape[axis]:
+                count = np.take(count, keep, axis=axis)
+                rating_sum = np.take(rating_sum, keep, axis=axis)
+                labels[dim] = [labels[dim][i] for i in keep]
+        return AggregateCube(labels=labels, count=count, rating_sum=rating_sum, generation=self.generation)
+
+    # -- queries ------------------------------------------------------------
+    def _index(self, dim: str, allowed: Optional[Sequence[str]]) -> np.ndarray:
+        labels = self.labels[dim]
+        if allowed is None:
+            return np.arange(len(labels))
+        wanted = {str(a) for a in allowed}
+        return np.asarray([i for i, lab in enumerate(labels) if lab in wanted], dtype=np.int64)
+
+    def rating_labels(self, rating_min: Optional[float] = None, rating_max: Optional[float] = None) -> Optional[List[str]]:
+        """Rating labels inside [rating_min, rating_max], or None when unbounded."""
+        if rating_min is None and rating_max is None:
+            return None
+        lo = -np.inf if rating_min is None else float(rating_min)
+        hi = np.inf if rating_max is None else float(rating_max)
+        return [lab for lab in self.labels["rating"] if lo <= float(lab) <= hi]
+
+    def aggregate(self, filters: Optional[Dict[str, Optional[Sequence[str]]]] = None) -> Dict[str, Any]:
+        """Dashboard aggregates for the cells matching `filters` (dimension -> allowed labels)."""
+        filters = filters or {}
+        idx = [self._index(dim, filters.get(dim)) for dim in DIMENSIONS]
+        grid = np.ix_(*idx)
+        count = self.count[grid]
+        rating_sum = self.rating_sum[grid]
+
+        def _marginal(dim: str, values: np.ndarray) -> np.ndarray:
+            axis = DIMENSIONS.index(dim)
+            return values.sum(axis=tuple(a for a in range(len(DIMENSIONS)) if a != axis))
+
+        total = int(count.sum())
+        ratings = np.asarray([float(self.labels["rating"][i]) for i in idx[DIMENSIONS.index("rating")]])
+        by_rating = _marginal("rating", count)
+        promoters = int(by_rating[ratings >= 4].sum())
+        detractors = int(by_rating[ratings <= 2].sum())
+
+        sent_labels = [self.labels["sentiment"][i] for i in idx[DIMENSIONS.index("sentiment")]]
+        by_sent = dict(zip(sent_labels, _marginal("sentiment", count).tolist()))
+        sentiment_counts = {k: int(by_sent.get(k, 0)) for k in ("positive", "neutral", "negative")}
+        total_for_pct = sum(sentiment_counts.values())
+
+        emo_labels = [self.labels["emotion"][i] for i in idx[DIMENSIONS.index("emotion")]]
+        by_emo = sorted(
+            ((lab, int(c)) for lab, c in zip(emo_labels, _marginal("emotion", count).tolist()) if c > 0),
+            key=lambda kv: -kv[1],
+        )
+
+        dept_labels = [self.labels["department"][i] for i in idx[DIMENSIONS.index("department")]]
+        dept_count = _marginal("department", count)
+        dept_sum = _marginal("department", rating_sum)
+        department_ratings = [
+            {"department": lab, "averageRating": float(s / c)}
+            for lab, c, s in zip(dept_labels, dept_count.tolist(), dept_sum.tolist())
+            if c > 0
+        ]
+
+        return {
+            "total_reviews": total,
+            "average_rating": float(rating_sum.sum() / total) if total else 0.0,
+            "nps": ((promoters - detractors) / total) * 100.0 if total else 0.0,
+            "positive_sentiment_pct": (sentiment_counts["positive"] / total_for_pct) * 100.0 if total_for_pct else 0.0,
+            "department_ratings": department_ratings,
+            "sentiment_counts": sentiment_counts,
+            "emotion_counts": [{"emotion": lab, "count": c} for lab, c in by_emo[:10]],
+        }
+
+    # -- persistence --------------------------------------------------------
+    def save(self, path: str = CUBE_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            labels=np.asarray(json.dumps(self.labels)),
+            count=self.count,
+            rating_sum=self.rating_sum,
+            generation=np.asarray(self.generation),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = CUBE_PATH) -> "AggregateCube":
+        with np.load(path) as data:
+            labels = json.loads(str(data["labels"]))
+            if list(labels) != DIMENSIONS:
+                raise ValueError(f"cube dimensions {list(labels)} != {DIMENSIONS}")
+            return cls(
+                labels=labels,
+                count=np.asarray(data["count"]),
+                rating_sum=np.asarray(data["rating_sum"]),
+                generation=str(data["generation"]) if "generation" in data.files else "",
+            )
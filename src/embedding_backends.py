@@ -0,0 +1,146 @@
+"""
+ONNX Runtime embedding backends (fp32 and dynamically quantized int8) for CPU.
+
+model_registry picks the backend from EMBEDDING_BACKEND:
+  torch      SentenceTransformer (default)
+  onnx       exported fp32 ONNX graph
+  onnx-int8  same graph with int8 dynamically quantized weights
+
+The ONNX files are produced by scripts/export_onnx.py under
+outputs/onnx/<model>/ (model.onnx, model-int8.onnx, tokenizer files and
+backend.json). OnnxEncoder mirrors the part of SentenceTransformer.encode the
+rest of the code uses: mean pooling over the attention mask, optional L2
+normalization, float32 numpy output.
+
+parity_report() compares a backend against torch on sample texts (cosine
+drift + throughput) so a quantized model is only switched on with measured cost.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+ONNX_DIR = os.getenv("ONNX_MODEL_DIR") or os.path.join(ROOT, "outputs", "onnx")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+_ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model-int8.onnx"}
+# Weight precision of each backend (recorded with anything fit on its vectors, e.g. centroids)
+_QUANTIZATION = {"torch": "fp32", "onnx": "fp32", "onnx-int8": "int8"}
+
+
+def quantization(backend: str) -> str:
+    return _QUANTIZATION.get(backend.lower(), "unknown")
+
+
+def backend_dir(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name))
+
+
+def onnx_model_path(model_name: str, backend: str) -> str:
+    return os.path.join(backend_dir(model_name), _ONNX_FILES[backend])
+
+
+class OnnxEncoder:
+    """Sentence encoder running an exported transformer through onnxruntime."""
+
+    def __init__(self, model_name: str, backend: str = "onnx", num_threads: Optional[int] = None):
+        if backend not in _ONNX_FILES:
+            raise ValueError(f"Unknown ONNX backend {backend!r}; expected one of {list(_ONNX_FILES)}")
+        try:
+            import onnxruntime as ort  # type: ignore
+            from transformers import AutoTokenizer  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("Please install 'onnxruntime' and 'transformers' for the ONNX embedding backend") from e
+
+        directory = backend_dir(model_name)
+        path = onnx_model_path(model_name, backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run scripts/export_onnx.py first")
+
+        meta: Dict[str, Any] = {}
+        meta_path = os.path.join(directory, "backend.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        self.max_seq_length = int(meta.get("max_seq_length", 256))
+        # all-MiniLM-L6-v2 ends with a Normalize module, so its output is always unit length
+        self.always_normalize = bool(meta.get("normalize", False))
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = num_threads or int(os.getenv("ONNX_NUM_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.model_name = model_name
+        self.backend = backend
+        self.file_bytes = os.path.getsize(path)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = False, batch_size: int = 64, **_: Any) -> np.ndarray:
+        texts = [str(t) for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = np.argsort([len(t) for t in texts])
+        out: List[np.ndarray] = []
+        for i in range(0, len(texts), batch_size):
+            batch = [texts[j] for j in order[i : i + batch_size]]
+            enc = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            feeds = {k: np.asarray(v, dtype=np.int64) for k, v in enc.items() if k in self._input_names}
+            hidden = self.session.run(None, feeds)[0]  # (b, t, d) last_hidden_state
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            out.append(pooled.astype(np.float32))
+        X = np.empty((len(texts), out[0].shape[1]), dtype=np.float32)
+        X[order] = np.vstack(out)
+        if normalize_embeddings or self.always_normalize:
+            X /= np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+        return X
+
+
+def parity_report(
+    texts: List[str],
+    model_name: str,
+    backends: Optional[List[str]] = None,
+    batch_size: int = 64,
+) -> Dict[str, Dict[str, float]]:
+    """Cosine drift and throughput of each ONNX backend relative to torch."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("Please install 'sentence-transformers' package") from e
+
+    def _timed(encoder: Any) -> tuple[np.ndarray, float]:
+        encoder.encode(texts[: min(8, len(texts))], normalize_embeddings=True)  # warm up
+        t0 = time.perf_counter()
+        X = np.asarray(encoder.encode(texts, normalize_embeddings=True, batch_size=batch_size), dtype=np.float32)
+        return X, len(texts) / max(time.perf_counter() - t0, 1e-9)
+
+    ref, ref_tps = _timed(SentenceTransformer(model_name))
+    report: Dict[str, Dict[str, float]] = {"torch": {"texts_per_s": ref_tps, "mean_cosine": 1.0, "min_cosine": 1.0}}
+    for backend in backends or list(_ONNX_FILES):
+        X, tps = _timed(OnnxEncoder(model_name, backend))
+        cos = np.einsum("ij,ij->i", X, ref)
+        report[backend] = {
+            "texts_per_s": tps,
+            "speedup": tps / ref_tps,
+            "mean_cosine": float(cos.mean()),
+            "min_cosine": float(cos.min()),
+        }
+    return report
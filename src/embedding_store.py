@@ -0,0 +1,224 @@
+"""
+Content-addressed, on-disk embedding store shared by every embedding consumer.
+
+Vectors are keyed by (model name, hash of the text). Each model gets its own
+directory under outputs/embedding_store/ with:
+  vectors.bin  raw float32/float16 rows, appended; read through a memory map
+  keys.bin     16-byte BLAKE2b digest per row, same order as vectors.bin
+  meta.json    {"model_name", "dim", "dtype"}
+
+model_registry.encode looks texts up here before running the model and appends
+whatever was missing, so rebuilding the FAISS index or the dashboard cache after
+a small CSV change only encodes the new or edited reviews.
+
+Appends take an exclusive lock on store.lock (POSIX) and first pick up rows
+written by other processes, so several workers can share one store.
+
+Only corpus texts (reviews, index chunks) are persisted. Ad-hoc inputs such as
+search queries and API reviews are looked up in the store but their new vectors
+go to a small in-memory LRU (EMBEDDING_ONLINE_CACHE entries per model), so
+traffic cannot grow the files without bound.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+STORE_DIR = os.getenv("EMBEDDING_STORE_DIR") or os.path.join(ROOT, "outputs", "embedding_store")
+KEY_BYTES = 16
+# Vectors of non-persisted (online) texts kept in memory per model
+ONLINE_CACHE_SIZE = int(os.getenv("EMBEDDING_ONLINE_CACHE", "4096"))
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+class EmbeddingStore:
+    def __init__(self, model_name: str, root: str = STORE_DIR, dtype: str = "float32"):
+        self.model_name = model_name
+        self.dir = os.path.join(root, _slug(model_name))
+        self.vectors_path = os.path.join(self.dir, "vectors.bin")
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, "store.lock")
+        self.dtype = dtype
+        self.dim: Optional[int] = None
+
+        self._lock = threading.RLock()
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._mmap: Optional[np.memmap] = None
+        self._online: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            self.dim = int(meta["dim"])
+            # An existing store keeps the dtype it was created with
+            self.dtype = str(meta.get("dtype", self.dtype))
+            self._sync()
+
+    # -- internal ---------------------------------------------------------
+    def _row_bytes(self) -> int:
+        return int(self.dim or 0) * np.dtype(self.dtype).itemsize
+
+    def _sync(self) -> None:
+        """Pick up rows appended since the last read (possibly by another process)."""
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return
+        n_keys = os.path.getsize(self.keys_path) // KEY_BYTES
+        n_vecs = os.path.getsize(self.vectors_path) // self._row_bytes() if os.path.exists(self.vectors_path) else 0
+        # A crash between the two appends leaves them uneven; trust the shorter one
+        n = min(n_keys, n_vecs)
+        if n <= self._rows:
+            return
+        with open(self.keys_path, "rb") as fh:
+            fh.seek(self._rows * KEY_BYTES)
+            raw = fh.read((n - self._rows) * KEY_BYTES)
+        for i in range(n - self._rows):
+            self._index.setdefault(raw[i * KEY_BYTES : (i + 1) * KEY_BYTES], self._rows + i)
+        self._rows = n
+        self._mmap = None
+
+    def _matrix(self) -> np.memmap:
+        if self._mmap is None:
+            self._mmap = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, int(self.dim or 0)))
+        return self._mmap
+
+    def _append(self, keys: List[bytes], X: np.ndarray) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.lock_path, "a+") as lock_fh:
+            if fcntl is not None:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                if self.dim is None:
+                    self.dim = int(X.shape[1])
+                    with open(self.meta_path, "w", encoding="utf-8") as fh:
+                        json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype}, fh)
+                self._sync()
+                # Truncate any torn tail so both files stay aligned
+                for path, size in ((self.keys_path, self._rows * KEY_BYTES), (self.vectors_path, self._rows * self._row_bytes())):
+                    if os.path.exists(path) and os.path.getsize(path) > size:
+                        os.truncate(path, size)
+                fresh = [(k, i) for i, k in enumerate(keys) if k not in self._index]
+                if not fresh:
+                    return
+                rows = np.ascontiguousarray(X[[i for _, i in fresh]], dtype=self.dtype)
+                with open(self.vectors_path, "ab") as fh:
+                    fh.write(rows.tobytes())
+                with open(self.keys_path, "ab") as fh:
+                    fh.write(b"".join(k for k, _ in fresh))
+                for j, (k, _) in enumerate(fresh):
+                    self._index[k] = self._rows + j
+                self._rows += len(fresh)
+                self._mmap = None
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+    # -- public -----------------------------------------------------------
+    def __len__(self) -> int:
+        return self._rows
+
+    def get_or_encode(
+        self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray], persist: bool = True, cache: bool = True
+    ) -> np.ndarray:
+        """Vectors for `texts` (float32, input order); only missing texts go to encode_fn.
+
+        persist=False is for ad-hoc inputs: their new vectors are kept in the
+        in-memory LRU instead of being appended to the store. With persist=True,
+        vectors found in that LRU are appended as well (and leave it).
+        cache=False only reads: new vectors are returned but kept nowhere
+        (one-off bulk passes that would just flush the LRU). encode_fn runs
+        without holding the store lock, so lookups in other threads don't wait
+        for the model.
+        """
+        keys = [text_key(t) for t in texts]
+        n = len(keys)
+        with self._lock:
+            self._sync()
+            rows = np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64, count=n)
+            # Distinct missing texts (first position of each), minus those cached online
+            missing: Dict[bytes, int] = {}
+            for p in np.flatnonzero(rows < 0):
+                missing.setdefault(keys[p], int(p))
+            known: Dict[bytes, np.ndarray] = {}
+            for k in list(missing):
+                v = self._online.get(k)
+                if v is not None:
+                    self._online.move_to_end(k)
+                    known[k] = v
+                    del missing[k]
+            self.hits += n - sum(1 for k in keys if k in missing)
+            self.misses += len(missing)
+
+        if missing:
+            E = np.asarray(encode_fn([texts[p] for p in missing.values()]), dtype=np.float32)
+            known.update(zip(missing, E))
+
+        with self._lock:
+            if not cache:
+                pass
+            elif known and persist:
+                # Texts first seen as ad-hoc inputs move from the LRU to the store
+                fresh = list(known)
+                self._append(fresh, np.stack([known[k] for k in fresh]))
+                for k in fresh:
+                    self._online.pop(k, None)
+                rows = np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64, count=n)
+            elif missing:
+                for k in missing:
+                    self._online[k] = known[k]
+                while len(self._online) > max(0, ONLINE_CACHE_SIZE):
+                    self._online.popitem(last=False)
+            dim = int(self.dim) if self.dim else (len(next(iter(known.values()))) if known else 0)
+            out = np.empty((n, dim), dtype=np.float32)
+            stored = rows >= 0
+            if stored.any():
+                out[stored] = self._matrix()[rows[stored]]
+        for p in np.flatnonzero(~stored):
+            out[p] = known[keys[p]]
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        return {"rows": self._rows, "dim": self.dim, "dtype": self.dtype, "hits": self.hits, "misses": self.misses, "online_cached": len(self._online)}
+
+
+_STORES: Dict[str, EmbeddingStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(model_name: str) -> EmbeddingStore:
+    """Shared store instance for `model_name` (dtype from EMBEDDING_STORE_DTYPE for new stores)."""
+    with _STORES_LOCK:
+        store = _STORES.get(model_name)
+        if store is None:
+            store = EmbeddingStore(model_name, dtype=os.getenv("EMBEDDING_STORE_DTYPE", "float32"))
+            _STORES[model_name] = store
+        return store
+
+
+def store_stats() -> Dict[str, Dict[str, object]]:
+    return {name: s.stats() for name, s in _STORES.items()}
@@ -3,21 +3,22 @@ import sys
 import json
 from typing import List, Dict, Tuple
 
+import importlib.util
+
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-try:
-	# For optimal one-to-one mapping between clusters and emotions
-	from scipy.optimize import linear_sum_assignment  # type: ignore
-	_HAS_SCIPY = True
-except Exception:  # pragma: no cover
-	_HAS_SCIPY = False
+
+# scikit-learn and SciPy are imported by the functions that use them (clustering
+# only happens when centroids are fitted); SciPy gives the optimal one-to-one
+# mapping between clusters and emotions
+_HAS_SCIPY = importlib.util.find_spec("scipy") is not None
 
 try:
-	from sentence_transformers import SentenceTransformer
-except Exception as e:  # pragma: no cover
-	SentenceTransformer = None  # type: ignore
+	from . import model_registry  # type: ignore
+	from .centroids import CentroidModel  # type: ignore
+except Exception:
+	import model_registry  # type: ignore
+	from centroids import CentroidModel  # type: ignore
 
 
 EMOTIONS: List[str] = [
@@ -34,17 +35,9 @@ EMOTION_PROMPTS: Dict[str, str] = {
 }
 
 
-def _load_model(model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-	if SentenceTransformer is None:
-		raise RuntimeError("Please install 'sentence-transformers' package")
-	return SentenceTransformer(model_name)
-
-
-def _embed(model, texts: List[str]) -> np.ndarray:
-	return np.asarray(model.encode(texts, normalize_embeddings=True))
-
-
 def _kmeans_cluster(embeddings: np.ndarray, k: int, random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+	from sklearn.cluster import KMeans
+
 	kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=10)
 	labels = kmeans.fit_predict(embeddings)
 	centers = kmeans.cluster_centers_
@@ -61,10 +54,14 @@ def _label_clusters(centers: np.ndarray, emotion_embs: np.ndarray, emotion_names
 	"""
 	k = centers.shape[0]
 	m = emotion_embs.shape[0]
+	from sklearn.metrics.pairwise import cosine_similarity
+
 	sims = cosine_similarity(centers, emotion_embs)  # (k, m)
 	cluster_to_emotion: Dict[int, str] = {}
 
 	if _HAS_SCIPY and k == m:
+		from scipy.optimize import linear_sum_assignment  # type: ignore
+
 		# Maximize total similarity -> minimize negative similarity
 		row_ind, col_ind = linear_sum_assignment(-sims)
 		for ci, ej in zip(row_ind, col_ind):
@@ -78,6 +75,65 @@ def _label_clusters(centers: np.ndarray, emotion_embs: np.ndarray, emotion_names
 	return cluster_to_emotion
 
 
+def emotion_prompt_embeddings(model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> np.ndarray:
+	"""Embeddings of EMOTION_PROMPTS (row order = EMOTIONS), computed once and cached."""
+	return model_registry.prompt_embeddings([EMOTION_PROMPTS[e] for e in EMOTIONS], model_name)
+
+
+def fit_emotion_centroids(
+	X: np.ndarray,
+	*,
+	k: int | None = None,
+	model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> Tuple[List[str], CentroidModel]:
+	"""Cluster embeddings, map clusters to emotions, and return (labels, model).
+
+	The returned CentroidModel can be saved and used later to label new texts
+	by nearest center without re-running KMeans.
+	"""
+	n = int(X.shape[0])
+	# If k not provided, default to number of emotions (bounded by number of texts)
+	k_target = len(EMOTIONS) if k is None else int(k)
+	k_eff = max(1, min(k_target, n))
+	labels, centers = _kmeans_cluster(X, k=k_eff)
+	model = emotion_model_from_centers(centers, model_name=model_name)
+	# Map each text's cluster to an emotion
+	return [model.labels[int(c)] for c in labels], model
+
+
+def emotion_model_from_centers(
+	centers: np.ndarray,
+	*,
+	model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> CentroidModel:
+	"""Map cluster centers (from any clustering, e.g. MiniBatchKMeans) to emotions."""
+	# Emotion reference embeddings
+	E = emotion_prompt_embeddings(model_name)
+
+	cluster_to_emotion = _label_clusters(centers, E, EMOTIONS)
+	return CentroidModel(
+		name="emotion",
+		model_name=model_name,
+		centers=np.asarray(centers, dtype=np.float32),
+		labels=[cluster_to_emotion[i] for i in range(centers.shape[0])],
+	)
+
+
+def emotions_from_embeddings(
+	X: np.ndarray,
+	*,
+	k: int | None = None,
+	model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> List[str]:
+	"""Same as cluster_emotions, but on already-computed (normalized) text embeddings.
+
+	Lets callers embed a text once and reuse the vectors for emotion and intent.
+	"""
+	if int(X.shape[0]) == 0:
+		return []
+	return fit_emotion_centroids(X, k=k, model_name=model_name)[0]
+
+
 def cluster_emotions(
 	texts: List[str],
 	*,
@@ -89,26 +145,14 @@ def cluster_emotions(
 	Steps:
 	- Embed texts
 	- KMeans cluster with k clusters
-	- Embed emotion prompts, map centers to nearest emotion
+	- Map centers to the nearest (cached) emotion prompt embedding
 	- Return mapped emotion for each text
 	"""
 	if not texts:
 		return []
 
-	model = _load_model(model_name)
-	X = _embed(model, texts)
-	# If k not provided, default to number of emotions (bounded by number of texts)
-	k_target = len(EMOTIONS) if k is None else int(k)
-	k_eff = max(1, min(k_target, len(texts)))
-	labels, centers = _kmeans_cluster(X, k=k_eff)
-
-	# Emotion reference embeddings
-	emotion_prompts = [EMOTION_PROMPTS[e] for e in EMOTIONS]
-	E = _embed(model, emotion_prompts)
-
-	cluster_to_emotion = _label_clusters(centers, E, EMOTIONS)
-	# Map each text's cluster to an emotion
-	return [cluster_to_emotion[int(c)] for c in labels]
+	X = model_registry.encode(texts, model_name)
+	return emotions_from_embeddings(X, k=k, model_name=model_name)
 
 
 if __name__ == "__main__":
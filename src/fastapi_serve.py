@@ -1,20 +1,42 @@
+import asyncio
+import json
 import os
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
-from typing import Any, Dict, List, Optional
-from fastapi import FastAPI, HTTPException, Query
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import uvicorn
 
-from rag import RAGbot
-from orchestrator import analyze_text 
+import embedding_store
+from dashboard_cube import AGE_BUCKETS, CUBE_PATH, AggregateCube, dimension_values
+from coalescer import MicroBatcher
+from facet_index import FacetIndex
+from response_cache import ResponseCache, etag_matches
+import serialization
+from serialization import ReviewFragments
+import review_store
+from review_store import REVIEWS_DIR, ReviewStore
+import llm_cache
+import llm_client
+import model_registry
+import precompute_dashboard as precompute
+import process_memory
+import sentiment
+import signals
+import orchestrator
+from orchestrator import Deadlines, OrchestratedResult, OrchestratedSignals, fallback_prediction, gather_with_deadline, item_deadlines, iter_predictions_async, latest_deadline, local_signals_and_embeddings, predict_async, run_limited
 from reply import ReplyGenerator
-from sentiment import vader_sentiment_score, vader_sentiment_label
-try:
-    from emotions import cluster_emotions  # optional; heavy on first run
-    _HAS_EMOTIONS = True
-except Exception:
-    _HAS_EMOTIONS = False
+
+if TYPE_CHECKING:
+    # langchain / FAISS are imported by the rag startup component, not at import time
+    from rag import RAGbot
 
 # Configuration - adjust paths if needed
 ROOT = os.path.dirname(os.path.dirname(__file__))
@@ -23,9 +45,36 @@ PERSIST_PATH = os.path.join(ROOT, "faiss_index")
 NATIVE_PATH = os.path.join(ROOT, "faiss_index_native")
 CHUNK_SIZE = 500
 K = 3
-
-# Cache locations for precomputed dashboard data
-REVIEWS_JSONL = os.path.join(ROOT, "outputs", "dashboard_reviews.jsonl")
+# Max Gemini calls (predictions + replies) in flight across all requests; also
+# the size of the orchestrator's LLM thread pool
+LLM_CONCURRENCY = orchestrator.LLM_CONCURRENCY
+# Default per-request latency budget for the analyze endpoints; stages still
+# waiting on Gemini when it runs out answer with local fallbacks
+REQUEST_DEADLINE_MS = int(os.getenv("REQUEST_DEADLINE_MS", "8000"))
+# Smallest budget a request may ask for with deadline_ms; shorter ones are raised to it
+REQUEST_DEADLINE_MIN_MS = int(os.getenv("REQUEST_DEADLINE_MIN_MS", "500"))
+# Concurrent /analyze_review calls are coalesced into one batch for up to this
+# long (0 disables), at most COALESCE_MAX_BATCH reviews per batch
+COALESCE_WINDOW_MS = float(os.getenv("COALESCE_WINDOW_MS", "5"))
+COALESCE_MAX_BATCH = int(os.getenv("COALESCE_MAX_BATCH", "32"))
+
+# Cache-Control max-age for dashboard GET responses. They are also stamped with
+# an ETag of the dataset version, so after max-age clients revalidate cheaply.
+DASHBOARD_MAX_AGE = int(os.getenv("DASHBOARD_MAX_AGE", "0"))
+
+# Opt-in fast response path: dashboard reviews pre-serialized once per dataset
+# and spliced into responses, orjson (when installed) instead of the stdlib
+# encoder, and /query returned without Pydantic response validation
+FAST_JSON = os.getenv("FAST_JSON", "0").lower() in {"1", "true", "yes"}
+
+# Worker processes for `python src/fastapi_serve.py` (more than one: preloaded
+# and forked by prefork.py) and intra-op threads per worker (0 = cores / workers)
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "0"))
+
+# Cache locations for precomputed dashboard data (the JSONL is the pre-columnar
+# format, converted once on startup if it is the only cache present)
+LEGACY_REVIEWS_JSONL = os.path.join(ROOT, "outputs", "dashboard_reviews.jsonl")
 SUMMARY_JSON = os.path.join(ROOT, "outputs", "dashboard_summary.json")
 
 app = FastAPI(title="Feedback Analyzer FastAPI Server")
@@ -64,6 +113,7 @@ class ProductIn(BaseModel):
 class AnalyzeRequest(BaseModel):
     reviews: List[ReviewIn]
     product: Optional[ProductIn] = None
+    deadline_ms: Optional[int] = None  # overrides REQUEST_DEADLINE_MS
 
 
 class ReviewOut(BaseModel):
@@ -74,6 +124,8 @@ class ReviewOut(BaseModel):
     nps: float
     buy_again: str
     reply: Optional[str] = None
+    # Fields answered by a local fallback instead of the normal path ("nps", "buy_again", "reply")
+    degraded: List[str] = []
 
 
 class AnalyzeResponse(BaseModel):
@@ -82,322 +134,625 @@ class AnalyzeResponse(BaseModel):
     average_nps: Optional[float] = None
     dominant_sentiment: str
     summary: str
+    degraded: bool = False
 
 
-RAG: RAGbot | None = None
+RAG: "RAGbot | None" = None
 REPLY: ReplyGenerator | None = None
 DF: pd.DataFrame | None = None
-DFP: pd.DataFrame | None = None  # precomputed reviews: text, rating, department, sentiment, emotion
 
 
-@app.on_event("startup")
-def startup_event():
-    global RAG, REPLY, DF, DFP
-    if not os.path.exists(CSV_PATH):
-        raise RuntimeError(f"CSV file not found at {CSV_PATH}")
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """One published version of the dashboard data; replaced as a whole, never modified."""
 
-    df = pd.read_csv(CSV_PATH)
-    DF = df
+    store: ReviewStore  # memory-mapped precomputed reviews: text, rating, department, class, age, sentiment, emotion
+    cube: AggregateCube  # aggregates of store, answers every filter combination
+    facets: FacetIndex  # per-value row bitmaps of store, for filtered row selection and listing
+    fragments: Optional[ReviewFragments]  # REVIEW_FIELDS of every row as JSON, when FAST_JSON
 
-    # Load or (re)build precomputed dashboard cache
-    def _mtime(path: str) -> float:
-        try:
-            return os.path.getmtime(path)
-        except Exception:
-            return 0.0
+    @property
+    def version(self) -> str:
+        """Dataset version of responses built from this snapshot (the cache generation)."""
+        return self.store.generation
 
-    def _load_reviews_cache() -> pd.DataFrame | None:
-        try:
-            if os.path.exists(REVIEWS_JSONL):
-                return pd.read_json(REVIEWS_JSONL, lines=True)
-        except Exception as e:
-            print(f"Failed to load {REVIEWS_JSONL}: {e}")
-        return None
 
-    def _compute_and_store_cache() -> pd.DataFrame:
-        print("[cache] Computing dashboard reviews (sentiment/emotion) once...")
-        cols = [c for c in ["Review Text", "Rating", "Department Name"] if c in df.columns]
-        d = df[cols].copy().reset_index(drop=True)
-        d["Rating"] = pd.to_numeric(d["Rating"], errors="coerce").fillna(0).astype(float)
-        d.loc[:, "Review Text"] = d["Review Text"].fillna("")
-        d.loc[:, "Department Name"] = d["Department Name"].fillna("Unknown")
-
-        s_scores = d["Review Text"].astype(str).apply(vader_sentiment_score)
-        s_labels = s_scores.apply(vader_sentiment_label)
-        if _HAS_EMOTIONS and len(d):
-            try:
-                emos = cluster_emotions(d["Review Text"].astype(str).tolist())
-            except Exception:
-                emos = ["neutral"] * len(d)
-        else:
-            emos = ["neutral"] * len(d)
+# Handlers read DASHBOARD once per request, so a refresh published meanwhile
+# never mixes rows of one version with bitmaps or aggregates of another
+DASHBOARD: DashboardSnapshot | None = None
+RESPONSES = ResponseCache()  # serialized dashboard GET responses, keyed by dataset version
+WORKER_ID: Optional[int] = None  # index of this worker under prefork.py, None when serving from one process
 
-        dfp = pd.DataFrame({
-            "text": d["Review Text"].astype(str),
-            "rating": d["Rating"].astype(float),
-            "department": d["Department Name"].astype(str),
-            "sentiment": s_labels.astype(str),
-            "emotion": emos,
-        })
+# How often (seconds) a background thread checks for a reviews cache published
+# by another process; 0 disables it
+DASHBOARD_RECHECK_SECONDS = float(os.getenv("DASHBOARD_RECHECK_SECONDS", "1"))
+_FOLLOW: Dict[str, float] = {"published": 0.0}  # meta.json mtime of the cache we serve
+_FOLLOW_LOCK = threading.Lock()
 
-        os.makedirs(os.path.dirname(REVIEWS_JSONL), exist_ok=True)
-        try:
-            import json as _json
-            with open(REVIEWS_JSONL, "w", encoding="utf-8") as f:
-                for rec in dfp.to_dict(orient="records"):
-                    f.write(_json.dumps(rec, ensure_ascii=False) + "\n")
-        except Exception as e:
-            print(f"Warning: failed to write {REVIEWS_JSONL}: {e}")
 
-        try:
-            total_reviews = int(len(dfp))
-            avg_rating = float(dfp["rating"].mean()) if total_reviews else 0.0
-            promoters = int((dfp["rating"] >= 4).sum())
-            detractors = int((dfp["rating"] <= 2).sum())
-            nps = ((promoters - detractors) / total_reviews) * 100 if total_reviews else 0.0
-            positive_pct = float((dfp["sentiment"] == "positive").sum()) / total_reviews * 100 if total_reviews else 0.0
-            dept_avg = (
-                dfp.groupby("department")["rating"].mean().reset_index().rename(columns={"department": "department", "rating": "averageRating"})
-                if total_reviews else pd.DataFrame(columns=["department", "averageRating"])
-            )
-            department_ratings = [
-                {"department": str(r["department"]), "averageRating": float(r["averageRating"])}
-                for _, r in dept_avg.iterrows()
-            ]
-            import json as _json
-            with open(SUMMARY_JSON, "w", encoding="utf-8") as f:
-                _json.dump({
-                    "total_reviews": total_reviews,
-                    "average_rating": avg_rating,
-                    "nps": nps,
-                    "positive_sentiment_pct": positive_pct,
-                    "department_ratings": department_ratings,
-                }, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Warning: failed to write {SUMMARY_JSON}: {e}")
+# Startup components. They load concurrently in the background so the server
+# accepts traffic at once; /ready reports each one as it comes up. The server
+# counts as ready when the REQUIRED ones are (the others degrade gracefully:
+# templated replies, embedding model loaded on first use).
+STARTUP_COMPONENTS = ["models", "dashboard", "rag", "reply"]
+REQUIRED_COMPONENTS = ["dashboard", "rag"]
+# Set to 1 to finish loading before serving (previous behaviour)
+STARTUP_BLOCKING = os.getenv("STARTUP_BLOCKING", "0").lower() in {"1", "true", "yes"}
+STARTUP_LOCK = threading.Lock()
+STARTUP: Dict[str, Dict[str, Any]] = {name: {"state": "pending"} for name in STARTUP_COMPONENTS}
+STARTUP_TIMES: Dict[str, Any] = {}
+
+
+def _mark(component: str, state: str, **detail: Any) -> None:
+    with STARTUP_LOCK:
+        STARTUP[component].update(detail, state=state)
+
+
+def _startup_snapshot() -> Dict[str, Dict[str, Any]]:
+    with STARTUP_LOCK:
+        return {name: dict(entry) for name, entry in STARTUP.items()}
+
+
+def _run_component(name: str, load: Callable[[], Optional[Dict[str, Any]]]) -> None:
+    _mark(name, "loading", started_at=time.time())
+    t0 = time.perf_counter()
+    try:
+        detail = dict(load() or {})
+        state = detail.pop("state", "ready")
+        seconds = round(time.perf_counter() - t0, 3)
+        with STARTUP_LOCK:
+            entry = STARTUP[name]
+            # "loading" = finished by background work, which may already have reported
+            if state == "loading" and entry["state"] != "loading":
+                state = entry["state"]
+            entry.update(detail, state=state, seconds=seconds)
+        print(f"[startup] {name}: {state} in {seconds}s")
+    except Exception as e:
+        seconds = round(time.perf_counter() - t0, 3)
+        _mark(name, "failed", seconds=seconds, error=str(e))
+        print(f"[startup] {name}: failed after {seconds}s: {e}")
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except Exception:
+        return 0.0
+
+
+def _startup_models() -> Dict[str, Any]:
+    # Load the shared embedding model once so neither the dashboard refresh
+    # nor the first /analyze_review request pays for loading weights.
+    loaded = {}
+    for name, stats in model_registry.warmup().items():
+        print(f"[models] {name}: load={stats['load_seconds']}s params={stats['param_bytes'] / 1e6:.1f}MB rss+={stats['rss_delta_bytes'] / 1e6:.1f}MB")
+        loaded[name] = stats["load_seconds"]
+    t0 = time.perf_counter()
+    sentiment.warmup()
+    loaded["vader"] = round(time.perf_counter() - t0, 3)
+    return {"load_seconds": loaded}
+
+
+def _convert_legacy_cache() -> ReviewStore | None:
+    if not os.path.exists(LEGACY_REVIEWS_JSONL) or _mtime(LEGACY_REVIEWS_JSONL) < _mtime(CSV_PATH):
+        return None
+    try:
+        legacy = pd.read_json(LEGACY_REVIEWS_JSONL, lines=True)
+        if not {"class", "age"}.issubset(legacy.columns):
+            print("[cache] Legacy reviews cache predates class/age columns; recomputing")
+            return None
+        review_store.write(legacy, REVIEWS_DIR)
+        print(f"[cache] Converted {LEGACY_REVIEWS_JSONL} to {REVIEWS_DIR}")
+        return ReviewStore.load(REVIEWS_DIR)
+    except Exception as e:
+        print(f"Failed to convert {LEGACY_REVIEWS_JSONL}: {e}")
+        return None
+
+
+def _load_fresh_cube(store: ReviewStore) -> AggregateCube | None:
+    """The saved aggregate cube of `store`, or None if it aggregates another version (then it is rebuilt).
+
+    Cubes written before they recorded their generation are matched by mtime.
+    """
+    if not os.path.exists(CUBE_PATH):
+        return None
+    try:
+        cube = AggregateCube.load(CUBE_PATH)
+    except Exception as e:
+        print(f"Failed to load {CUBE_PATH}: {e}")
+        return None
+    if cube.generation:
+        return cube if cube.generation == store.generation else None
+    return cube if _mtime(CUBE_PATH) >= review_store.mtime(REVIEWS_DIR) else None
 
-        return dfp
 
-    use_cache = os.path.exists(REVIEWS_JSONL) and (_mtime(REVIEWS_JSONL) >= _mtime(CSV_PATH))
-    DFP = _load_reviews_cache() if use_cache else _compute_and_store_cache()
+def _startup_dashboard(refresh: bool = True) -> Dict[str, Any]:
+    """Map the reviews cache and publish it; recomputation goes to the refresh job.
 
+    A cache older than the CSV is served as is (stale) while an incremental
+    refresh runs. Without any cache the component stays "loading" until the
+    refresh job has scored the corpus. refresh=False only reports either case.
+    """
+    phases: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    store = review_store.load_or_none(REVIEWS_DIR)
+    if store is None and not review_store.exists(REVIEWS_DIR):
+        store = _convert_legacy_cache()
+    phases["map_reviews"] = round(time.perf_counter() - t0, 3)
+    if store is None:
+        if not refresh:
+            return {"state": "loading", "phases": phases}
+        print("[cache] No dashboard reviews cache; computing it in the background")
+        job = _start_refresh(full=False)
+        return {"state": "loading", "phases": phases, "refresh_job": job.get("id")}
+
+    t0 = time.perf_counter()
+    _set_dashboard(store, _load_fresh_cube(store))
+    phases["publish"] = round(time.perf_counter() - t0, 3)
+    print(f"[cache] Reviews cache mapped: {len(store)} rows, {store.nbytes() / 1e6:.1f}MB on disk")
+
+    detail: Dict[str, Any] = {"phases": phases, "rows": len(store), "stale": False}
+    if review_store.mtime(REVIEWS_DIR) < _mtime(CSV_PATH):
+        detail["stale"] = True
+        if refresh:
+            print("[cache] CSV is newer than the reviews cache; serving it while an incremental refresh runs")
+            detail["refresh_job"] = _start_refresh(full=False).get("id")
+    return detail
+
+
+def _startup_rag() -> Dict[str, Any]:
+    global RAG, DF
+    phases: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    df = pd.read_csv(CSV_PATH)
+    DF = df
+    phases["read_csv"] = round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
+    from rag import RAGbot
+    phases["import"] = round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
     print("Starting RAG server - initializing RAGbot (once on startup)")
     RAG = RAGbot(df, k=K, persist_path=PERSIST_PATH, chunk_size=CHUNK_SIZE, force_rebuild=False)
+    phases["index"] = round(time.perf_counter() - t0, 3)
     print("RAG server ready: index loaded and models initialized")
+    return {"phases": phases}
+
+
+def _startup_reply() -> None:
+    global REPLY
+    REPLY = ReplyGenerator()
+
+
+def _startup_all() -> None:
+    t0 = time.perf_counter()
+    loaders = {"models": _startup_models, "dashboard": _startup_dashboard, "rag": _startup_rag, "reply": _startup_reply}
+    # Components preloaded before forking (prefork.py) are already ready
+    pending = [name for name in STARTUP_COMPONENTS if _startup_snapshot()[name]["state"] != "ready"]
+    threads = [
+        threading.Thread(target=_run_component, args=(name, loaders[name]), name=f"startup-{name}", daemon=True)
+        for name in pending
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    STARTUP_TIMES["components_loaded_seconds"] = round(time.perf_counter() - t0, 3)
+    print(f"[startup] components loaded in {STARTUP_TIMES['components_loaded_seconds']}s: " + ", ".join(f"{k}={v.get('state')}" for k, v in _startup_snapshot().items()))
+
+
+@app.on_event("startup")
+def startup_event():
+    if not os.path.exists(CSV_PATH):
+        raise RuntimeError(f"CSV file not found at {CSV_PATH}")
+    STARTUP_TIMES["started_at"] = time.time()
+    if DASHBOARD_RECHECK_SECONDS > 0:
+        threading.Thread(target=_follow_dashboard_loop, name="dashboard-follow", daemon=True).start()
+    if STARTUP_BLOCKING:
+        _startup_all()
+    else:
+        threading.Thread(target=_startup_all, name="startup", daemon=True).start()
+
+
+def preload() -> None:
+    """Load the shared read-only state before prefork.py forks the workers.
 
+    Loads the embedding model weights (torch backend; ONNX sessions own thread
+    pools and are created in each worker), the VADER lexicon, the dashboard
+    cache and the RAG index, marking "dashboard" and "rag" ready so workers
+    skip them. No inference runs here: a missing or stale dashboard cache and
+    a missing RAG index are built in a throwaway child first. "models" (first
+    encode) and "reply" (network client) are left to the workers.
+    """
+    import prefork
+
+    if not os.path.exists(CSV_PATH):
+        raise RuntimeError(f"CSV file not found at {CSV_PATH}")
+    t0 = time.perf_counter()
+    if not review_store.exists(REVIEWS_DIR) or review_store.mtime(REVIEWS_DIR) < _mtime(CSV_PATH):
+        print("[preload] Dashboard cache missing or older than the CSV; refreshing it before forking")
+        if prefork.run_forked(lambda: _recompute_dashboard_cache(pd.read_csv(CSV_PATH), strict=True)) != 0:
+            retry = "serving the existing cache, POST /refresh_dashboard to retry" if review_store.exists(REVIEWS_DIR) else "workers will retry it"
+            print(f"[preload] Dashboard refresh failed; {retry}")
+    rag_index = os.path.exists(PERSIST_PATH) or os.path.exists(NATIVE_PATH)
+    if not rag_index:
+        print("[preload] No RAG index; building it before forking")
+        rag_index = prefork.run_forked(_startup_rag) == 0
     try:
-        REPLY = ReplyGenerator()
-        print("ReplyGenerator ready")
+        if model_registry.BACKEND == "torch":
+            model_registry.get_model()
+        sentiment.warmup()
     except Exception as e:
-        REPLY = None
-        print(f"ReplyGenerator init failed: {e}")
+        print(f"[preload] Models not preloaded, workers load their own: {e}")
+    _run_component("dashboard", lambda: _startup_dashboard(refresh=False))
+    if rag_index:
+        _run_component("rag", _startup_rag)
+    else:
+        print("[preload] RAG index build failed; workers will retry it")
+    STARTUP_TIMES["preload_seconds"] = round(time.perf_counter() - t0, 3)
+
+
+def post_fork(worker: int) -> None:
+    """Per-worker setup after fork: worker index and this worker's share of the cores and of LLM_RPM."""
+    import prefork
+
+    global WORKER_ID
+    WORKER_ID = worker
+    threads = WORKER_THREADS or prefork.default_threads(WORKERS)
+    model_registry.set_num_threads(threads)
+    llm_client.share_rate_limit(WORKERS)
+    print(f"[worker {worker}] pid {os.getpid()}, {threads} intra-op threads, {llm_client.LLM_RPM / max(1, WORKERS):g} Gemini requests/min")
+
+
+def _set_dashboard(store: ReviewStore, cube: Optional[AggregateCube] = None) -> None:
+    """Publish a reviews store and its aggregate cube (built here if not given) as one snapshot."""
+    global DASHBOARD
+    frame = store.frame()
+    cube = cube if cube is not None else AggregateCube.from_frame(frame)
+    facets = FacetIndex.build(dimension_values(frame))
+    fragments = ReviewFragments.build(store, REVIEW_FIELDS) if FAST_JSON else None
+    DASHBOARD = DashboardSnapshot(store=store, cube=cube, facets=facets, fragments=fragments)
+    # Entries of the previous version are never served; this only frees their memory
+    RESPONSES.clear()
+    _FOLLOW["published"] = review_store.mtime(REVIEWS_DIR)
+
+
+def _follow_published_dashboard() -> bool:
+    """Publish a reviews cache written by another process since ours; True if one was picked up.
+
+    Workers share outputs/dashboard_reviews/, so a refresh run by one worker
+    (or by precompute_dashboard.py) reaches the others through a newer
+    meta.json. They wait until the refresher has released refresh.lock, by
+    which time its aggregate cube is written too, and only map the files.
+    """
+    with _FOLLOW_LOCK:
+        published = review_store.mtime(REVIEWS_DIR)
+        if not published or published == _FOLLOW["published"]:
+            return False
+        with REFRESH_LOCK:
+            if REFRESH_JOB.get("state") == "running":
+                return False  # our own refresh is writing it and publishes when done
+        if review_store.refresh_in_progress(REVIEWS_DIR):
+            return False  # summary and cube not written yet; next round
+        store = review_store.load_or_none(REVIEWS_DIR)
+        current = DASHBOARD
+        if store is None or (current is not None and store.generation == current.version):
+            _FOLLOW["published"] = published
+            return False
+        _set_dashboard(store, _load_fresh_cube(store))
+        # A full refresh elsewhere may have refitted the emotion/intent centroids
+        signals.reload_centroids()
+        _mark("dashboard", "ready", stale=review_store.mtime(REVIEWS_DIR) < _mtime(CSV_PATH), rows=int(len(store)))
+        print(f"[cache] Picked up dashboard cache generation {store.generation} ({len(store)} rows)")
+        return True
+
+
+def _follow_dashboard_loop() -> None:
+    """Background thread: check for a newly published cache every DASHBOARD_RECHECK_SECONDS."""
+    while True:
+        time.sleep(DASHBOARD_RECHECK_SECONDS)
+        try:
+            _follow_published_dashboard()
+        except Exception as e:
+            print(f"[cache] Failed to pick up the published dashboard cache: {e}")
+
 
+def _recompute_dashboard_cache(
+    df: pd.DataFrame, strict: bool = False, incremental: bool = True
+) -> Tuple[ReviewStore, AggregateCube, Dict[str, Any]]:
+    """Compute per-review signals for `df` and write the cache files.
 
-def _compute_dashboard_from_df(df: pd.DataFrame, max_reviews: int = 1000, department: Optional[str] = None) -> Dict[str, Any]:
-    cols = [c for c in ["Review Text", "Rating", "Department Name"] if c in df.columns]
-    base = df[cols]
-    if department and "Department Name" in base.columns:
-        mask = base["Department Name"].astype(str) == str(department)
-        d = base.loc[mask].copy().reset_index(drop=True)
+    Shares the implementation with precompute_dashboard. With incremental=True
+    and a reviews cache that has row hashes, only new or edited rows are scored
+    and the aggregate cube is updated by their delta; otherwise every row is,
+    and the emotion/intent centroids are refitted. With strict=False write
+    failures are only logged (startup); with strict=True they propagate.
+    Returns the reviews store (memory-mapped from disk when the write
+    succeeded), its aggregate cube and row counts.
+    """
+    d = precompute.prepare_reviews(df)
+    previous = precompute.load_previous(REVIEWS_DIR) if incremental else None
+    previous_cube = precompute.load_previous_cube(CUBE_PATH) if previous is not None else None
+    if previous is not None:
+        dfp, stats = precompute.compute_signals_incremental(d, previous)
     else:
-        d = base.copy().reset_index(drop=True)
-    d["Rating"] = pd.to_numeric(d["Rating"], errors="coerce").fillna(0).astype(float)
-    d.loc[:, "Review Text"] = d["Review Text"].fillna("")
-
-    total_reviews = int(len(d))
-    average_rating = float(d["Rating"].mean()) if total_reviews else 0.0
-
-    promoters = int((d["Rating"] >= 4).sum())
-    detractors = int((d["Rating"] <= 2).sum())
-    nps = ((promoters - detractors) / total_reviews) * 100 if total_reviews else 0.0
-
-    # Aggregated signals from precomputed DFP for accuracy
-    global DFP
-    sentiment_counts: Dict[str, int] = {"positive": 0, "neutral": 0, "negative": 0}
-    emotion_counts_list: List[Dict[str, Any]] = []
-    if DFP is not None:
-        dfp = DFP
-        if department:
-            dfp = dfp[dfp["department"].astype(str) == str(department)]
-        # Sentiment counts
-        try:
-            vc = dfp["sentiment"].value_counts()
-            for k in ["positive", "neutral", "negative"]:
-                sentiment_counts[k] = int(vc.get(k, 0))
-        except Exception:
-            pass
-        # Emotion counts (top 10)
-        try:
-            evc = dfp["emotion"].value_counts().head(10)
-            emotion_counts_list = [{"emotion": str(idx), "count": int(val)} for idx, val in evc.items()]
-        except Exception:
-            emotion_counts_list = []
-        # Exact NPS from precomputed ratings for the (sub)set
+        dfp = precompute.compute_signals(d)
+        stats = {"rows": int(len(dfp)), "reused": 0, "computed": int(len(dfp)), "deleted": 0, "mode": "full"}
+    if stats["mode"] == "full":
+        # Online emotion/intent labelling picks up the freshly fitted centroid models
+        signals.reload_centroids()
+        previous = None
+    cube, stats["cube"] = precompute.build_cube(dfp, previous, previous_cube)
+    # Release the old mapping before the write replaces its files
+    del previous
+    try:
+        cube.generation = precompute.write_reviews(dfp, REVIEWS_DIR)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Warning: failed to write {REVIEWS_DIR}: {e}")
+    for write, path in ((precompute.write_summary, SUMMARY_JSON), (precompute.write_cube, CUBE_PATH)):
         try:
-            total_prec = int(len(dfp))
-            if total_prec:
-                prom = int((dfp["rating"] >= 4).sum())
-                det = int((dfp["rating"] <= 2).sum())
-                nps = ((prom - det) / total_prec) * 100.0
-                # Override average rating with precise per-filter value for consistency
-                average_rating = float(dfp["rating"].mean())
-        except Exception:
-            pass
-    # positive percentage uses aggregated counts if available
-    total_for_pct = sum(sentiment_counts.values())
-    if total_for_pct > 0:
-        positive_pct = (sentiment_counts["positive"] / total_for_pct) * 100.0
-    else:
-        positive_pct = 0.0
+            write(cube, path)
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Warning: failed to write {path}: {e}")
+    store = review_store.load_or_none(REVIEWS_DIR)
+    if store is None or len(store) != len(dfp):
+        if strict:
+            raise RuntimeError(f"reviews cache at {REVIEWS_DIR} is unreadable after writing")
+        # Unwritable outputs/: serve from a throwaway copy instead
+        tmp_dir = tempfile.mkdtemp(prefix="dashboard_reviews_")
+        review_store.write(dfp, tmp_dir)
+        store = ReviewStore.load(tmp_dir)
+    return store, cube, stats
+
+
+# Fields of each sampled review, in response order
+REVIEW_FIELDS = ["text", "rating", "department", "class", "age", "sentiment", "emotion"]
+
+
+def _dashboard_from_precomputed(
+    cube: AggregateCube,
+    store: ReviewStore,
+    facets: FacetIndex,
+    filters: Dict[str, Optional[List[str]]],
+    max_reviews: int = 1000,
+    fragments: Optional[ReviewFragments] = None,
+) -> Dict[str, Any] | bytes:
+    """Dashboard payload as a pure lookup over precomputed data.
+
+    Aggregates come from the cube (cost independent of the number of reviews);
+    only the review sample touches rows, selected through the facet bitmaps,
+    and decodes only the sampled rows from the memory-mapped columns. No model
+    runs on the request path. With `fragments` the payload is returned already
+    serialized, the sampled reviews spliced in from their precomputed JSON.
+    """
+    data = cube.aggregate(filters)
 
-    dept_avg = (
-        d.groupby("Department Name")["Rating"].mean().reset_index().rename(columns={"Department Name": "department", "Rating": "averageRating"})
-        if "Department Name" in d.columns and total_reviews else pd.DataFrame(columns=["department", "averageRating"]) 
-    )
-    department_ratings = [
-        {"department": str(row["department"]), "averageRating": float(row["averageRating"]) }
-        for _, row in dept_avg.iterrows()
-    ]
+    mask = facets.mask(filters)
+    rows = facets.rows_of(mask) if mask is not None else None
+    total_rows = len(store) if rows is None else len(rows)
 
     max_reviews = int(max(0, max_reviews)) or 0
-    return_count = min(total_reviews, max_reviews if max_reviews > 0 else min(total_reviews, 1000))
-    sample_indices: List[int] = []
-    if total_reviews and return_count:
-        import numpy as _np
-        sample_indices = list(_np.linspace(0, total_reviews - 1, num=return_count, dtype=int))
-
-    reviews: list[dict[str, Any]] = []
-    if sample_indices:
-        # Compute signals for sampled reviews only (keep payload light)
-        texts = [str(d.iloc[idx].get("Review Text", "")) for idx in sample_indices]
-        try:
-            s_scores_sample = pd.Series(texts).apply(vader_sentiment_score)
-            s_labels_sample = s_scores_sample.apply(vader_sentiment_label)
-        except Exception:
-            s_labels_sample = pd.Series(["neutral"] * len(texts))
-        if _HAS_EMOTIONS and len(texts):
-            try:
-                emos_sample = cluster_emotions(texts)
-            except Exception:
-                emos_sample = ["neutral"] * len(texts)
-        else:
-            emos_sample = ["neutral"] * len(texts)
-
-        for pos, idx in enumerate(sample_indices):
-            try:
-                row = d.iloc[idx]
-                review_text = str(row.get("Review Text", ""))
-                rating_val = float(row.get("Rating", 0.0))
-                dept_val = str(row.get("Department Name", "Unknown"))
-            except Exception:
-                review_text = ""
-                rating_val = 0.0
-                dept_val = "Unknown"
-            sent = str(s_labels_sample.iloc[pos]) if len(texts) else "neutral"
-            emo = emos_sample[pos] if pos < len(emos_sample) else "neutral"
-
-            reviews.append({
-                "text": review_text,
-                "rating": rating_val,
-                "department": dept_val,
-                "sentiment": sent,
-                "emotion": emo,
-            })
-
-    return {
-        "total_reviews": total_reviews,
-        "average_rating": average_rating,
-        "nps": nps,
-        "positive_sentiment_pct": positive_pct,
-        "department_ratings": department_ratings,
-        "reviews": reviews,
-        "sample_size": len(reviews),
-        "sentiment_counts": sentiment_counts,
-        "emotion_counts": emotion_counts_list,
+    return_count = min(total_rows, max_reviews if max_reviews > 0 else min(total_rows, 1000))
+    positions = np.zeros(0, dtype=np.int64)
+    if total_rows and return_count:
+        # Evenly spaced positions across the (filtered) frame
+        positions = np.linspace(0, total_rows - 1, num=return_count, dtype=int)
+        if rows is not None:
+            positions = rows[positions]
+    if fragments is not None:
+        return serialization.splice(data, "reviews", fragments.join(positions), {"sample_size": len(positions)})
+
+    columns = [store.take(f, positions) for f in REVIEW_FIELDS]
+    reviews = [dict(zip(REVIEW_FIELDS, row)) for row in zip(*columns)]
+    data["reviews"] = reviews
+    data["sample_size"] = len(reviews)
+    return data
+
+
+def _cached_json(request: Request, version: str, build: Callable[[], Any]) -> Response:
+    """JSON response for a GET on the dataset `version`, served from RESPONSES when possible.
+
+    `build` returns the payload or its serialized bytes. Responses carry
+    ETag / Cache-Control / X-Data-Version and are gzip/br compressed when the
+    client accepts it (compressed once per cached entry); a matching
+    If-None-Match answers 304. The key is the path plus every query parameter.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = RESPONSES.get(key, version)
+    if entry is None:
+        payload = build()
+        if not isinstance(payload, bytes):
+            payload = serialization.dumps(payload) if FAST_JSON else JSONResponse(payload).body
+        entry = RESPONSES.put(key, version, payload)
+
+    encoding = None
+    if len(entry.body) >= serialization.COMPRESS_MIN_BYTES:
+        encoding = serialization.negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": entry.variant_etag(encoding),
+        "Cache-Control": f"public, max-age={DASHBOARD_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding",
+        "X-Data-Version": version,
     }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        RESPONSES.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    body = entry.body
+    if encoding:
+        body = entry.variants.get(encoding) or b""
+        if not body:
+            body = serialization.compress(entry.body, encoding)
+            RESPONSES.add_variant(entry, encoding, body)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/dashboard_data")
-def dashboard_data(max_items: int = Query(1000, ge=0, le=10000), department: Optional[str] = Query(None)):
-    global DF
-    if DF is None:
-        raise HTTPException(status_code=503, detail="Dataframe not loaded")
-    try:
-        data = _compute_dashboard_from_df(DF, max_reviews=int(max_items), department=department)
-        return data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"dashboard_data failed: {e}")
+def dashboard_data(
+    request: Request,
+    max_items: int = Query(1000, ge=0, le=10000),
+    department: Optional[str] = Query(None),
+    class_name: Optional[str] = Query(None, alias="class", description="Class Name, e.g. Dresses"),
+    rating_min: Optional[float] = Query(None, ge=0, le=5),
+    rating_max: Optional[float] = Query(None, ge=0, le=5),
+    age_band: Optional[str] = Query(None, description=f"One of {AGE_BUCKETS}"),
+):
+    snapshot = DASHBOARD
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Dashboard cache not loaded")
+    if age_band is not None and age_band not in AGE_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"age_band must be one of {AGE_BUCKETS}")
+    cube, store, facets, fragments = snapshot.cube, snapshot.store, snapshot.facets, snapshot.fragments
+    filters: Dict[str, Optional[List[str]]] = {
+        "department": [department] if department else None,
+        "class": [class_name] if class_name else None,
+        "rating": cube.rating_labels(rating_min, rating_max),
+        "age_bucket": [age_band] if age_band else None,
+    }
+
+    def _build() -> Dict[str, Any]:
+        try:
+            return _dashboard_from_precomputed(cube, store, facets, filters, max_reviews=int(max_items), fragments=fragments)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"dashboard_data failed: {e}")
 
+    return _cached_json(request, snapshot.version, _build)
 
-@app.post("/refresh_dashboard")
-def refresh_dashboard():
-    """Force recomputation of dashboard cache from the CSV.
 
-    This runs once and overwrites outputs/dashboard_reviews.jsonl and dashboard_summary.json.
+def _parse_cursor(cursor: Optional[str], generation: str) -> int:
+    """Last row id of the previous page; cursors are "<cache generation>:<row id>"."""
+    if not cursor:
+        return -1
+    gen, _, row = cursor.partition(":")
+    if gen != generation:
+        raise HTTPException(status_code=409, detail="Cursor is from an older dashboard cache; restart from the first page")
+    try:
+        return int(row)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+
+
+@app.get("/reviews")
+def list_reviews(
+    request: Request,
+    department: Optional[List[str]] = Query(None),
+    class_name: Optional[List[str]] = Query(None, alias="class"),
+    rating: Optional[List[int]] = Query(None, description="Star rating 1-5"),
+    sentiment: Optional[List[str]] = Query(None),
+    emotion: Optional[List[str]] = Query(None),
+    age_band: Optional[List[str]] = Query(None, description=f"Any of {AGE_BUCKETS}"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    counts: bool = Query(False, description="Include per-facet value counts under the other filters"),
+):
+    """Filtered, cursor-paginated review listing backed by the facet bitmap index.
+
+    Repeating a parameter ORs its values (department=Tops&department=Dresses);
+    different parameters AND. Rows are returned in cache order with their `id`.
     """
-    global DF, DFP
-    if DF is None:
-        raise HTTPException(status_code=503, detail="Dataframe not loaded")
-    # Reuse the startup helper by inlining minimal logic
+    snapshot = DASHBOARD
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Dashboard cache not loaded")
+    store, facets, fragments = snapshot.store, snapshot.facets, snapshot.fragments
+    after = _parse_cursor(cursor, store.generation)
+    filters: Dict[str, Optional[List[str]]] = {
+        "department": department,
+        "class": class_name,
+        "rating": [str(r) for r in rating] if rating else None,
+        "sentiment": sentiment,
+        "emotion": emotion,
+        "age_bucket": age_band,
+    }
+
+    def _build() -> Dict[str, Any] | bytes:
+        mask = facets.mask(filters)
+        rows, more = facets.page(mask, after=after, limit=limit)
+        total = facets.count(mask)
+        next_cursor = f"{store.generation}:{int(rows[-1])}" if more else None
+        if fragments is not None:
+            tail: Dict[str, Any] = {"next_cursor": next_cursor}
+            if counts:
+                tail["facet_counts"] = facets.facet_counts(filters)
+            return serialization.splice({"total": total}, "items", fragments.join(rows, with_ids=True), tail)
+        columns = [rows.tolist()] + [store.take(f, rows) for f in REVIEW_FIELDS]
+        items = [dict(zip(["id"] + REVIEW_FIELDS, row)) for row in zip(*columns)]
+        out: Dict[str, Any] = {
+            "total": total,
+            "items": items,
+            "next_cursor": next_cursor,
+        }
+        if counts:
+            out["facet_counts"] = facets.facet_counts(filters)
+        return out
+
+    return _cached_json(request, snapshot.version, _build)
+
+
+# State of the (single) dashboard refresh job, reported by /refresh_dashboard/status
+REFRESH_LOCK = threading.Lock()
+REFRESH_JOB: Dict[str, Any] = {"state": "idle"}
+
+
+def _run_refresh(full: bool) -> None:
+    """Refresh the caches, unless another process (worker) already is; then it only waits for theirs."""
+    global DF
+    t0 = time.perf_counter()
     try:
-        # Recompute using current DF and write cache
-        cols = [c for c in ["Review Text", "Rating", "Department Name"] if c in DF.columns]
-        d = DF[cols].copy().reset_index(drop=True)
-        d["Rating"] = pd.to_numeric(d["Rating"], errors="coerce").fillna(0).astype(float)
-        d.loc[:, "Review Text"] = d["Review Text"].fillna("")
-        d.loc[:, "Department Name"] = d["Department Name"].fillna("Unknown")
-
-        s_scores = d["Review Text"].astype(str).apply(vader_sentiment_score)
-        s_labels = s_scores.apply(vader_sentiment_label)
-        if _HAS_EMOTIONS and len(d):
-            try:
-                emos = cluster_emotions(d["Review Text"].astype(str).tolist())
-            except Exception:
-                emos = ["neutral"] * len(d)
+        with review_store.refresh_lock(REVIEWS_DIR) as elected:
+            if elected:
+                df = pd.read_csv(CSV_PATH)
+                store, cube, stats = _recompute_dashboard_cache(df, strict=True, incremental=not full)
+        if elected:
+            _set_dashboard(store, cube)
+            DF = df
+            update: Dict[str, Any] = {"state": "done", "stats": stats, "total_reviews": int(len(store))}
+            _mark("dashboard", "ready", stale=False, rows=int(len(store)))
         else:
-            emos = ["neutral"] * len(d)
-
-        DFP = pd.DataFrame({
-            "text": d["Review Text"].astype(str),
-            "rating": d["Rating"].astype(float),
-            "department": d["Department Name"].astype(str),
-            "sentiment": s_labels.astype(str),
-            "emotion": emos,
-        })
-
-        import json as _json
-        os.makedirs(os.path.dirname(REVIEWS_JSONL), exist_ok=True)
-        with open(REVIEWS_JSONL, "w", encoding="utf-8") as f:
-            for rec in DFP.to_dict(orient="records"):
-                f.write(_json.dumps(rec, ensure_ascii=False) + "\n")
-
-        total_reviews = int(len(DFP))
-        avg_rating = float(DFP["rating"].mean()) if total_reviews else 0.0
-        promoters = int((DFP["rating"] >= 4).sum())
-        detractors = int((DFP["rating"] <= 2).sum())
-        nps = ((promoters - detractors) / total_reviews) * 100 if total_reviews else 0.0
-        positive_pct = float((DFP["sentiment"] == "positive").sum()) / total_reviews * 100 if total_reviews else 0.0
-        dept_avg = (
-            DFP.groupby("department")["rating"].mean().reset_index().rename(columns={"department": "department", "rating": "averageRating"})
-            if total_reviews else pd.DataFrame(columns=["department", "averageRating"])
-        )
-        department_ratings = [
-            {"department": str(r["department"]), "averageRating": float(r["averageRating"])}
-            for _, r in dept_avg.iterrows()
-        ]
-
-        with open(SUMMARY_JSON, "w", encoding="utf-8") as f:
-            _json.dump({
-                "total_reviews": total_reviews,
-                "average_rating": avg_rating,
-                "nps": nps,
-                "positive_sentiment_pct": positive_pct,
-                "department_ratings": department_ratings,
-            }, f, ensure_ascii=False, indent=2)
-
-        return {"ok": True, "total_reviews": total_reviews}
+            print("[cache] Another process is refreshing the dashboard cache; it is picked up when published")
+            update = {"state": "delegated"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"refresh_dashboard failed: {e}")
+        print(f"[cache] Dashboard refresh failed: {e}")
+        update = {"state": "failed", "error": str(e)}
+        if DASHBOARD is None:
+            _mark("dashboard", "failed", error=f"refresh failed: {e}")
+    with REFRESH_LOCK:
+        REFRESH_JOB.update(update, finished_at=time.time(), seconds=round(time.perf_counter() - t0, 3))
+
+
+def _start_refresh(full: bool) -> Dict[str, Any]:
+    """Start the refresh job unless one is running; returns the (running) job."""
+    with REFRESH_LOCK:
+        if REFRESH_JOB.get("state") == "running":
+            return dict(REFRESH_JOB)
+        REFRESH_JOB.clear()
+        REFRESH_JOB.update(id=uuid.uuid4().hex[:12], state="running", full=bool(full), started_at=time.time())
+        job = dict(REFRESH_JOB)
+    threading.Thread(target=_run_refresh, args=(bool(full),), name="dashboard-refresh", daemon=True).start()
+    return job
+
+
+@app.post("/refresh_dashboard", status_code=202)
+def refresh_dashboard(full: bool = Query(False, description="Rescore every row and refit centroids")):
+    """Start recomputing the dashboard cache from the current CSV in the background.
+
+    By default only rows added or edited since the last refresh are scored
+    (matched by row hash) and deleted rows are dropped; full=true rescores all
+    rows. The job overwrites outputs/dashboard_reviews/, dashboard_summary.json
+    and dashboard_cube.npz, then swaps the served data. Poll
+    /refresh_dashboard/status; a request while a job runs returns that job.
+    """
+    if not os.path.exists(CSV_PATH):
+        raise HTTPException(status_code=503, detail=f"CSV file not found at {CSV_PATH}")
+    return {"ok": True, "job": _start_refresh(bool(full))}
+
+
+@app.get("/refresh_dashboard/status")
+def refresh_dashboard_status():
+    with REFRESH_LOCK:
+        return dict(REFRESH_JOB)
 
 
 @app.post("/query", response_model=QueryResponse)
@@ -406,70 +761,166 @@ def query_endpoint(req: QueryRequest):
     if RAG is None:
         raise HTTPException(status_code=503, detail="RAG not ready")
     result = RAG.answer(req.query)
+    if FAST_JSON:
+        body = {"answer": result.get("answer", ""), "sources": result.get("sources"), "include_sources": bool(result.get("include_sources", False))}
+        return Response(content=serialization.dumps(body), media_type="application/json")
     return QueryResponse(answer=result.get("answer", ""), sources=result.get("sources"), include_sources=result.get("include_sources", False))
 
 
-@app.post("/analyze_reviews", response_model=AnalyzeResponse)
-def analyze_reviews_endpoint(req: AnalyzeRequest):
-    if not req.reviews:
-        raise HTTPException(status_code=400, detail="reviews list is empty")
+def _templated_reply(text: str, sentiment: str, emotion: str, intent: str) -> str:
+    base = "Thanks for your feedback."
+    if intent == "size_issue":
+        base = "Thanks for sharing your sizing experience."
+    elif intent in ("quality_concern", "complaint"):
+        base = "Sorry about your experience."
+    elif intent == "praise":
+        base = "Thanks for the kind words!"
+    tail = " We'll share this with our team. If you need help, please reach us via support."
+    return f"{base} ({sentiment}, {emotion}).{tail}"
+
+
+_LLM_SEMAPHORE: asyncio.Semaphore | None = None
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    global _LLM_SEMAPHORE
+    if _LLM_SEMAPHORE is None:
+        _LLM_SEMAPHORE = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+    return _LLM_SEMAPHORE
+
+
+def _templated(text: str, signals: OrchestratedSignals) -> str:
+    return _templated_reply(text, signals.sentiment_label, signals.emotion, signals.intent)
+
+
+def _generate_reply(text: str, signals: OrchestratedSignals) -> Tuple[str, bool]:
+    """(reply, degraded): the Gemini reply, or the templated one if Gemini failed."""
+    if REPLY is None:
+        return _templated(text, signals), False
+    try:
+        reply_text = REPLY.generate_reply(text)
+    except Exception:
+        reply_text = None
+    if not reply_text:
+        return _templated(text, signals), True
+    return reply_text, False
+
+
+def _review_out(res: OrchestratedResult, reply_text: str, reply_degraded: bool = False) -> ReviewOut:
+    """Build the API item for one orchestrated review."""
+    degraded = ["sentiment"] if res.signals.sentiment_degraded else []
+    if res.prediction.source == "fallback":
+        degraded += ["nps", "buy_again"]
+    if reply_degraded:
+        degraded.append("reply")
+    return ReviewOut(
+        review=res.text,
+        sentiment=res.signals.sentiment_label,
+        emotion=res.signals.emotion,
+        intent=res.signals.intent,
+        nps=float(res.prediction.nps_score),
+        buy_again="Yes" if res.prediction.repeat_purchase else "No",
+        reply=reply_text,
+        degraded=degraded,
+    )
+
+
+def _request_deadline(deadline_ms: Optional[int]) -> float:
+    """Absolute time.monotonic() deadline for a request's LLM stages."""
+    ms = REQUEST_DEADLINE_MS if deadline_ms is None else max(REQUEST_DEADLINE_MIN_MS, deadline_ms)
+    return time.monotonic() + max(0, ms) / 1000.0
+
+
+async def _analyze_async(texts: List[str], deadline: Deadlines = None, ratings: Optional[List[Optional[float]]] = None) -> List[ReviewOut]:
+    """Local signals for the batch, then predictions and replies concurrently.
+
+    Replies only need the text (and the signals for the templated fallback), so
+    they run alongside the prediction calls instead of after them; all LLM calls
+    share the process-wide LLM_CONCURRENCY semaphore. Whatever is still waiting
+    on Gemini at `deadline` is answered locally and marked degraded; a list
+    gives each review its own deadline. `ratings` (None where the client sent
+    none) go to the local prediction model.
+    """
+    deadlines = item_deadlines(deadline, len(texts))
+    token = llm_client.request_deadline.set(latest_deadline(deadlines))
+    try:
+        signals_list, X = await asyncio.to_thread(local_signals_and_embeddings, texts)
+        sem = _llm_semaphore()
+        predictions, replies = await asyncio.gather(
+            predict_async(texts, signals_list, semaphore=sem, embeddings=X, deadline=deadlines, ratings=ratings),
+            gather_with_deadline(
+                [run_limited(sem, _generate_reply, t, sig, deadline=d) for t, sig, d in zip(texts, signals_list, deadlines)],
+                deadlines,
+                lambda i: (_templated(texts[i], signals_list[i]), True),
+            ),
+        )
+    finally:
+        llm_client.request_deadline.reset(token)
+    return [
+        _review_out(OrchestratedResult(text=t, signals=sig, prediction=pred), reply, reply_degraded)
+        for t, sig, pred, (reply, reply_degraded) in zip(texts, signals_list, predictions, replies)
+    ]
+
+
+async def _analyze_stream(texts: List[str], deadline: float, ratings: Optional[List[Optional[float]]] = None) -> AsyncIterator[Tuple[int, ReviewOut]]:
+    """(position, ReviewOut) pairs as soon as each review's prediction and reply are ready.
 
-    items: List[ReviewOut] = []
-    sentiments: List[str] = []
-    nps_values: List[float] = []
+    Same stages and fallbacks as _analyze_async, but nothing waits for the
+    slowest review: local predictions and fast Gemini groups are emitted first.
+    """
+    signals_list, X = await asyncio.to_thread(local_signals_and_embeddings, texts)
+    sem = _llm_semaphore()
+    queue: "asyncio.Queue[Tuple[str, int, Any]]" = asyncio.Queue()
 
-    for r in req.reviews:
-        txt = (r.text or "").strip()
-        if not txt:
-            continue
+    async def _predictions() -> None:
+        seen = set()
         try:
-            res = analyze_text(txt)
+            async for i, pred in iter_predictions_async(texts, signals_list, semaphore=sem, embeddings=X, deadline=deadline, ratings=ratings):
+                seen.add(i)
+                queue.put_nowait(("prediction", i, pred))
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"orchestrator error: {e}")
-
-        sent = res.signals.sentiment_label
-        emo = res.signals.emotion
-        intent = res.signals.intent
-        nps = float(res.prediction.nps_score)
-        buy = "Yes" if res.prediction.repeat_purchase else "No"
-
-        def _templated_reply(text: str, sentiment: str, emotion: str, intent: str) -> str:
-            base = "Thanks for your feedback."
-            if intent == "size_issue":
-                base = "Thanks for sharing your sizing experience."
-            elif intent in ("quality_concern", "complaint"):
-                base = "Sorry about your experience."
-            elif intent == "praise":
-                base = "Thanks for the kind words!"
-            tail = " We'll share this with our team. If you need help, please reach us via support."
-            return f"{base} ({sentiment}, {emotion}).{tail}"
-
-        reply_text: Optional[str] = None
+            for i in range(len(texts)):
+                if i not in seen:
+                    queue.put_nowait(("prediction", i, fallback_prediction(signals_list[i], f"Fallback (error): {e}")))
+
+    async def _reply(i: int) -> None:
         try:
-            if REPLY is not None:
-                reply_text = REPLY.generate_reply(txt)
+            # On timeout a running call keeps its LLM slot until its thread returns
+            timeout = max(0.0, deadline - time.monotonic())
+            result = await asyncio.wait_for(run_limited(sem, _generate_reply, texts[i], signals_list[i], deadline=deadline), timeout)
         except Exception:
-            reply_text = None
-        if not reply_text:
-            reply_text = _templated_reply(txt, sent, emo, intent)
-
-        items.append(ReviewOut(
-            review=txt,
-            sentiment=sent,
-            emotion=emo,
-            intent=intent,
-            nps=nps,
-            buy_again=buy,
-            reply=reply_text,
-        ))
-        sentiments.append(sent)
-        nps_values.append(nps)
-
-    if not items:
-        raise HTTPException(status_code=400, detail="no valid reviews after filtering")
+            result = (_templated(texts[i], signals_list[i]), True)
+        queue.put_nowait(("reply", i, result))
+
+    # Tasks copy the context when created, so they all see the request deadline
+    token = llm_client.request_deadline.set(deadline)
+    try:
+        tasks = [asyncio.ensure_future(_predictions())] + [asyncio.ensure_future(_reply(i)) for i in range(len(texts))]
+    finally:
+        llm_client.request_deadline.reset(token)
+
+    predictions: Dict[int, Any] = {}
+    replies: Dict[int, Tuple[str, bool]] = {}
+    try:
+        for _ in range(2 * len(texts)):
+            kind, i, value = await queue.get()
+            (predictions if kind == "prediction" else replies)[i] = value
+            if i in predictions and i in replies:
+                reply, reply_degraded = replies[i]
+                res = OrchestratedResult(text=texts[i], signals=signals_list[i], prediction=predictions[i])
+                yield i, _review_out(res, reply, reply_degraded)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _analysis_summary(items: List[ReviewOut], reviews: List[ReviewIn]) -> Dict[str, Any]:
+    """Aggregate fields of AnalyzeResponse (everything except `reviews`)."""
+    sentiments = [item.sentiment for item in items]
+    nps_values = [item.nps for item in items]
 
     avg_nps = float(sum(nps_values) / max(len(nps_values), 1)) if nps_values else None
-    ratings = [float(r.rating) for r in req.reviews if r.rating is not None]
+    ratings = [float(r.rating) for r in reviews if r.rating is not None]
     avg_rating = float(sum(ratings) / len(ratings)) if ratings else None
     dom_sent = max(set(sentiments), key=sentiments.count) if sentiments else "neutral"
 
@@ -487,14 +938,72 @@ def analyze_reviews_endpoint(req: AnalyzeRequest):
             f"Analyzed {len(items)} reviews. Dominant sentiment is '{dom_sent}'. "
             f"Most common intent appears to be '{top_intent}'."
         )
+    return {
+        "average_rating": avg_rating,
+        "average_nps": avg_nps,
+        "dominant_sentiment": dom_sent,
+        "summary": summary,
+        "degraded": any(item.degraded for item in items),
+    }
 
-    return AnalyzeResponse(
-        reviews=items,
-        average_rating=avg_rating,
-        average_nps=avg_nps,
-        dominant_sentiment=dom_sent,
-        summary=summary,
-    )
+
+def _valid_reviews(req: AnalyzeRequest) -> Tuple[List[int], List[str]]:
+    """Input indices and stripped texts of the non-empty reviews; 400 if there are none."""
+    if not req.reviews:
+        raise HTTPException(status_code=400, detail="reviews list is empty")
+    kept = [(i, t) for i, t in enumerate((r.text or "").strip() for r in req.reviews) if t]
+    if not kept:
+        raise HTTPException(status_code=400, detail="no valid reviews after filtering")
+    return [i for i, _ in kept], [t for _, t in kept]
+
+
+@app.post("/analyze_reviews", response_model=AnalyzeResponse)
+async def analyze_reviews_endpoint(req: AnalyzeRequest):
+    positions, texts = _valid_reviews(req)
+    ratings = [req.reviews[i].rating for i in positions]
+    try:
+        items = await _analyze_async(texts, _request_deadline(req.deadline_ms), ratings)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"orchestrator error: {e}")
+    return AnalyzeResponse(reviews=items, **_analysis_summary(items, req.reviews))
+
+
+@app.post("/analyze_reviews/stream")
+async def analyze_reviews_stream_endpoint(
+    req: AnalyzeRequest,
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson (default) or sse; SSE is also chosen by Accept: text/event-stream"),
+):
+    """Streaming /analyze_reviews: one frame per review as it completes, then a summary frame.
+
+    Frames: {"type": "review", "index": <input index>, "review": ReviewOut}
+            {"type": "summary", "count", "average_rating", "average_nps", "dominant_sentiment", "summary", "degraded"}
+            {"type": "error", "detail"} (instead of the summary if analysis failed)
+    """
+    positions, texts = _valid_reviews(req)
+    ratings = [req.reviews[i].rating for i in positions]
+    deadline = _request_deadline(req.deadline_ms)
+    sse = (format or "").lower() == "sse" or "text/event-stream" in request.headers.get("accept", "")
+
+    def _frame(payload: Dict[str, Any]) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        return f"event: {payload['type']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    async def _frames() -> AsyncIterator[str]:
+        items: List[ReviewOut] = []
+        try:
+            async for i, item in _analyze_stream(texts, deadline, ratings):
+                items.append(item)
+                yield _frame({"type": "review", "index": positions[i], "review": item.model_dump()})
+        except Exception as e:
+            yield _frame({"type": "error", "detail": f"orchestrator error: {e}"})
+            return
+        yield _frame({"type": "summary", "count": len(items), **_analysis_summary(items, req.reviews)})
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    # no-transform / X-Accel-Buffering keep proxies from buffering the stream
+    headers = {"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_frames(), media_type=media_type, headers=headers)
 
 
 class SingleAnalyzeRequest(BaseModel):
@@ -502,59 +1011,98 @@ class SingleAnalyzeRequest(BaseModel):
     rating: Optional[float] = None
     author: Optional[str] = None
     product: Optional[ProductIn] = None
+    deadline_ms: Optional[int] = None  # overrides REQUEST_DEADLINE_MS
+
+
+async def _analyze_coalesced(items: List[Tuple[str, Optional[float], float]]) -> List[ReviewOut]:
+    """Batch function for single-review requests (text, rating, deadline); each review keeps its own deadline."""
+    return await _analyze_async([text for text, _, _ in items], [deadline for _, _, deadline in items], [rating for _, rating, _ in items])
+
+
+ANALYZE_BATCHER: MicroBatcher[Tuple[str, Optional[float], float], ReviewOut] = MicroBatcher(
+    _analyze_coalesced, window_ms=COALESCE_WINDOW_MS, max_batch=COALESCE_MAX_BATCH
+)
 
 
 @app.post("/analyze_review", response_model=ReviewOut)
-def analyze_review_endpoint(req: SingleAnalyzeRequest):
+async def analyze_review_endpoint(req: SingleAnalyzeRequest):
     txt = (req.text or "").strip()
     if not txt:
         raise HTTPException(status_code=400, detail="text is empty")
     try:
-        res = analyze_text(txt)
+        return await ANALYZE_BATCHER.submit((txt, req.rating, _request_deadline(req.deadline_ms)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"orchestrator error: {e}")
 
-    sent = res.signals.sentiment_label
-    emo = res.signals.emotion
-    intent = res.signals.intent
-    nps = float(res.prediction.nps_score)
-    buy = "Yes" if res.prediction.repeat_purchase else "No"
-
-    def _templated_reply(text: str, sentiment: str, emotion: str, intent: str) -> str:
-        base = "Thanks for your feedback."
-        if intent == "size_issue":
-            base = "Thanks for sharing your sizing experience."
-        elif intent in ("quality_concern", "complaint"):
-            base = "Sorry about your experience."
-        elif intent == "praise":
-            base = "Thanks for the kind words!"
-        tail = " We'll share this with our team. If you need help, please reach us via support."
-        return f"{base} ({sentiment}, {emotion}).{tail}"
-
-    reply_text: Optional[str] = None
-    try:
-        if REPLY is not None:
-            reply_text = REPLY.generate_reply(txt)
-    except Exception:
-        reply_text = None
-    if not reply_text:
-        reply_text = _templated_reply(txt, sent, emo, intent)
 
-    return ReviewOut(
-        review=txt,
-        sentiment=sent,
-        emotion=emo,
-        intent=intent,
-        nps=nps,
-        buy_again=buy,
-        reply=reply_text,
-    )
+@app.get("/ready")
+def ready(component: Optional[str] = Query(None, description=f"One of {STARTUP_COMPONENTS}")):
+    """Readiness per startup component; 200 when ready, 503 while loading or failed.
+
+    Without `component` the server is ready when all of REQUIRED_COMPONENTS are.
+    """
+    snapshot = _startup_snapshot()
+    if component is not None:
+        if component not in snapshot:
+            raise HTTPException(status_code=404, detail=f"component must be one of {STARTUP_COMPONENTS}")
+        ok = snapshot[component]["state"] == "ready"
+        return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, component: snapshot[component]})
+    ok = all(snapshot[name]["state"] == "ready" for name in REQUIRED_COMPONENTS)
+    body = {"ready": ok, "components": snapshot, "startup": dict(STARTUP_TIMES)}
+    return JSONResponse(status_code=200 if ok else 503, content=body)
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "ready": RAG is not None}
+    """Liveness plus the stats of every shared component of this worker."""
+    return {
+        "status": "ok",
+        "ready": RAG is not None,
+        "models": model_registry.model_stats(),
+        "embedding_store": embedding_store.store_stats(),
+        "llm_cache": llm_cache.cache_stats(),
+        "llm_client": llm_client.client_stats(),
+        "analyze_review_batches": ANALYZE_BATCHER.stats(),
+        "startup": _startup_snapshot(),
+        "dashboard": {
+            "version": DASHBOARD.version if DASHBOARD is not None else None,
+            "responses": RESPONSES.stats(),
+        },
+        "worker": WORKER_ID,
+        "memory": process_memory.memory_usage(),
+    }
+
+
+@app.get("/memory")
+def memory():
+    """Memory of this process; under prefork.py also of the parent and every worker.
+
+    `uss` is what a process holds alone, `pss` its share of pages it maps
+    together with others (weights, mapped caches); total_pss is the real
+    footprint of the group.
+    """
+    out: Dict[str, Any] = {"worker": WORKER_ID, "self": process_memory.memory_usage()}
+    if WORKER_ID is not None:
+        parent = os.getppid()
+        out["group"] = process_memory.group_report(parent, process_memory.child_pids(parent))
+    return out
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Feedback Analyzer API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="More than 1: preload once, then fork workers (prefork.py)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        import prefork
+
+        WORKERS = args.workers
+        raise SystemExit(prefork.serve(app, host=args.host, port=args.port, workers=args.workers, preload=preload, post_fork=post_fork))
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
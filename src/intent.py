@@ -5,12 +5,12 @@ import json
 import numpy as np
 
 try:
-    from sentence_transformers import SentenceTransformer
-except Exception:  # pragma: no cover
-    SentenceTransformer = None  # type: ignore
+    from . import model_registry  # type: ignore
+    from .centroids import CentroidModel  # type: ignore
+except Exception:
+    import model_registry  # type: ignore
+    from centroids import CentroidModel  # type: ignore
 
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Default intent set
 INTENTS: List[str] = [
@@ -39,17 +39,9 @@ INTENT_PROMPTS: Dict[str, str] = {
 }
 
 
-def _load_model(model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-    if SentenceTransformer is None:
-        raise RuntimeError("Please install 'sentence-transformers' package")
-    return SentenceTransformer(model_name)
-
-
-def _embed(model, texts: List[str]) -> np.ndarray:
-    return np.asarray(model.encode(texts, normalize_embeddings=True))
-
-
 def _kmeans_cluster(X: np.ndarray, k: int, random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    from sklearn.cluster import KMeans
+
     kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=10)
     labels = kmeans.fit_predict(X)
     centers = kmeans.cluster_centers_
@@ -58,6 +50,8 @@ def _kmeans_cluster(X: np.ndarray, k: int, random_state: int = 42) -> Tuple[np.n
 
 def _label_clusters(centers: np.ndarray, intent_embs: np.ndarray, intents: List[str]) -> Dict[int, str]:
     # centers: (k, d), intent_embs: (m, d)
+    from sklearn.metrics.pairwise import cosine_similarity
+
     sims = cosine_similarity(centers, intent_embs)  # (k, m)
     mapping: Dict[int, str] = {}
     for i in range(centers.shape[0]):
@@ -66,6 +60,64 @@ def _label_clusters(centers: np.ndarray, intent_embs: np.ndarray, intents: List[
     return mapping
 
 
+def intent_prompt_embeddings(
+    intents: List[str] | None = None,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> np.ndarray:
+    """Embeddings of the intent prompts (row order = intents), computed once and cached."""
+    intents = intents or INTENTS
+    return model_registry.prompt_embeddings([INTENT_PROMPTS.get(name, name) for name in intents], model_name)
+
+
+def fit_intent_centroids(
+    X: np.ndarray,
+    *,
+    intents: List[str] | None = None,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    k: int | None = None,
+) -> Tuple[List[str], CentroidModel]:
+    """Cluster embeddings, map clusters to intents, and return (labels, model)."""
+    n = int(X.shape[0])
+    intents = intents or INTENTS
+    k_eff = min(len(intents), n) if k is None else max(1, min(k, n))
+    labels, centers = _kmeans_cluster(X, k=k_eff)
+    model = intent_model_from_centers(centers, intents=intents, model_name=model_name)
+    return [model.labels[int(c)] for c in labels], model
+
+
+def intent_model_from_centers(
+    centers: np.ndarray,
+    *,
+    intents: List[str] | None = None,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+) -> CentroidModel:
+    """Map cluster centers (from any clustering, e.g. MiniBatchKMeans) to intents."""
+    intents = intents or INTENTS
+    # Intent reference embedding matrix
+    R = intent_prompt_embeddings(intents, model_name)
+
+    c2i = _label_clusters(centers, R, intents)
+    return CentroidModel(
+        name="intent",
+        model_name=model_name,
+        centers=np.asarray(centers, dtype=np.float32),
+        labels=[c2i[i] for i in range(centers.shape[0])],
+    )
+
+
+def intents_from_embeddings(
+    X: np.ndarray,
+    *,
+    intents: List[str] | None = None,
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    k: int | None = None,
+) -> List[str]:
+    """Same as cluster_intents, but on already-computed (normalized) text embeddings."""
+    if int(X.shape[0]) == 0:
+        return []
+    return fit_intent_centroids(X, intents=intents, model_name=model_name, k=k)[0]
+
+
 def cluster_intents(
     texts: List[str],
     *,
@@ -81,19 +133,8 @@ def cluster_intents(
     if not texts:
         return []
 
-    intents = intents or INTENTS
-    model = _load_model(model_name)
-
-    X = _embed(model, texts)
-    k_eff = min(len(intents), len(texts)) if k is None else max(1, min(k, len(texts)))
-    labels, centers = _kmeans_cluster(X, k=k_eff)
-
-    # Build intent reference embedding matrix
-    prompt_texts = [INTENT_PROMPTS.get(name, name) for name in intents]
-    R = _embed(model, prompt_texts)
-
-    c2i = _label_clusters(centers, R, intents)
-    return [c2i[int(c)] for c in labels]
+    X = model_registry.encode(texts, model_name)
+    return intents_from_embeddings(X, intents=intents, model_name=model_name, k=k)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+"""
+Persistent, shared cache for Gemini responses (SQLite).
+
+The orchestrator, RAG, reply and summary modules all send prompts to Gemini,
+and the Chrome extension re-analyzes the same product page again and again.
+Responses are cached by (model, generation config, prompt) hash so identical
+calls are answered from disk.
+
+- TTL: entries older than LLM_CACHE_TTL seconds (default 7 days) are misses
+- Size bound: about LLM_CACHE_MAX_ENTRIES rows; least recently used go first.
+  The row count is checked every LLM_CACHE_EVICT_EVERY puts (default 1% of the
+  bound), not on every insert, so the table may briefly exceed the bound
+- LRU order: a hit refreshes last_access only when the stored value is older
+  than a tenth of the TTL, so most hits are read-only
+- Counters: hits / misses / stores / evictions via stats()
+- LLM_CACHE=0 disables it; LLM_CACHE_PATH moves the database file
+
+Usage:
+  text = cached_call("gemini-2.5-flash", {"temperature": 0.2}, prompt, lambda: call_gemini(prompt))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+CACHE_PATH = os.getenv("LLM_CACHE_PATH") or os.path.join(ROOT, "outputs", "llm_cache.sqlite3")
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "0"))  # 0 = max_entries // 100
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def cache_key(model: str, config: Optional[Dict[str, Any]], prompt: str) -> str:
+    head = json.dumps({"model": model, "config": config or {}}, sort_keys=True, default=str)
+    return hashlib.sha256((head + "\x00" + prompt).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        evict_every: int = CACHE_EVICT_EVERY,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every if evict_every > 0 else max(1, max_entries // 100)
+        # Hits within this many seconds of the last recorded access skip the UPDATE
+        self.touch_interval = ttl / 10 if ttl > 0 else 3600.0
+        self._puts_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        # WAL lets several server processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, last_access FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at, last_access = row
+            if self.ttl > 0 and now - float(created_at) > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            if now - float(last_access) > self.touch_interval:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return str(value)
+
+    def peek(self, key: str) -> Optional[str]:
+        """Unexpired value without touching counters or LRU order (offline tooling)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl > 0 and time.time() - float(row[1]) > self.ttl):
+            return None
+        return str(row[0])
+
+    def put(self, key: str, model: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, model, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, value, now, now),
+            )
+            self.stores += 1
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self.evict_every:
+                self._evict()
+
+    def _evict(self) -> None:
+        self._puts_since_evict = 0
+        if self.max_entries <= 0:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = int(count) - self.max_entries
+        if excess > 0:
+            # Drop expired rows first, then the least recently used ones
+            if self.ttl > 0:
+                cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+                self.evictions += max(0, cur.rowcount)
+                excess -= max(0, cur.rowcount)
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": int(count),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+        }
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Process-wide cache instance, or None when disabled or the database can't be opened."""
+    global _CACHE, CACHE_ENABLED
+    if not CACHE_ENABLED:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                try:
+                    _CACHE = LLMCache()
+                except Exception as e:
+                    print(f"[llm_cache] Disabled, could not open {CACHE_PATH}: {e}")
+                    CACHE_ENABLED = False
+                    return None
+    return _CACHE
+
+
+def cached_call(
+    model: str,
+    config: Optional[Dict[str, Any]],
+    prompt: str,
+    fn: Callable[[], str],
+    *,
+    cache_if: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """Return the cached response for this call, or run `fn` and cache its result.
+
+    Empty responses are never cached; `cache_if` can reject others (e.g. unparsable JSON).
+    """
+    cache = get_cache()
+    if cache is None:
+        return fn()
+    key = cache_key(model, config, prompt)
+    try:
+        hit = cache.get(key)
+    except Exception:
+        hit = None
+    if hit is not None:
+        return hit
+    value = fn()
+    if value and (cache_if is None or cache_if(value)):
+        try:
+            cache.put(key, model, value)
+        except Exception as e:
+            print(f"[llm_cache] Failed to store response: {e}")
+    return value
+
+
+def cache_stats() -> Dict[str, Any]:
+    cache = _CACHE
+    return cache.stats() if cache is not None else {"enabled": CACHE_ENABLED}
@@ -0,0 +1,392 @@
+"""
+Shared Gemini client layer: pooled clients, global rate limit, retries, deadlines.
+
+Every Gemini call in the server (orchestrator predictions, RAG answers and the
+include-sources classifier, replies, summaries) goes through this module:
+
+- Clients are built once per process and reused: one configured
+  google.generativeai GenerativeModel per model name, one ChatGoogleGenerativeAI
+  per (model, temperature). Their underlying connections are reused too.
+- A token bucket caps requests per minute for the whole process (LLM_RPM,
+  burst LLM_BURST), so extension bursts queue briefly instead of hitting 429s.
+  Forked server workers split it evenly (share_rate_limit).
+- Retryable failures (429, 5xx, timeouts, connection errors) are retried with
+  exponential backoff and full jitter, at most LLM_MAX_RETRIES times.
+- Each call has a deadline (LLM_TIMEOUT seconds, or less when the calling
+  request set a tighter one via request_deadline); waiting for the bucket, the
+  request itself and backoff sleeps all count against it.
+- A circuit breaker opens after LLM_BREAKER_FAILURES consecutive failed or slow
+  (> LLM_SLOW_CALL_SECONDS) calls; while open, calls fail immediately with
+  CircuitOpenError. After LLM_BREAKER_RESET seconds one probe call is let
+  through (half-open) and its outcome closes or re-opens the circuit.
+
+For local testing, GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8765) switches
+both SDKs to the REST transport against that endpoint; see
+scripts/fake_gemini_server.py.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except Exception:
+    pass
+
+
+T = TypeVar("T")
+
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+LLM_BURST = float(os.getenv("LLM_BURST", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "10"))
+
+# Absolute time.monotonic() deadline of the request being served, if any.
+# asyncio.to_thread copies the context, so worker threads see it too.
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not complete (or even start) before its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Gemini is skipped because recent calls kept failing or were too slow."""
+
+
+def api_key() -> Optional[str]:
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+def _require_api_key() -> str:
+    key = api_key()
+    if not key:
+        raise ValueError("GEMINI_API_KEY environment variable not set.")
+    return key
+
+
+# Rate limiting
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = max(rate_per_minute, 0.0) / 60.0
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> None:
+        """Take one token, sleeping as needed; raises LLMDeadlineExceeded past `deadline`."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise LLMDeadlineExceeded("rate limit wait would exceed the call deadline")
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+
+_BUCKET = TokenBucket(LLM_RPM, LLM_BURST)
+
+
+def share_rate_limit(processes: int) -> None:
+    """Limit this process to 1/`processes` of LLM_RPM and LLM_BURST.
+
+    The bucket lives in process memory, so forked server workers each call this
+    once (with the worker count) to keep the total under LLM_RPM.
+    """
+    global _BUCKET
+    n = max(1, int(processes))
+    _BUCKET = TokenBucket(LLM_RPM / n, LLM_BURST / n)
+
+
+# Circuit breaker
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; open -> half_open after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open and not yet due for a probe)."""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == "half_open" and self._probe_in_flight
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if calls are rejected; True if this call is the half-open probe."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Gemini circuit open")
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError("Gemini circuit half-open, probe in flight")
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe slot that was never used."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"[llm_client] Circuit opened after {self.failures} failure(s)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened}
+
+
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+
+_STATS: Dict[str, float] = {"calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0, "circuit_rejected": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str, n: float = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[name] = _STATS.get(name, 0) + n
+
+
+# Retries
+_RETRYABLE_MARKERS = (
+    "429",
+    "500",
+    "502",
+    "503",
+    "504",
+    "resource exhausted",
+    "resourceexhausted",
+    "rate limit",
+    "unavailable",
+    "internal",
+    "deadline",
+    "timeout",
+    "timed out",
+    "connection",
+)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (LLMDeadlineExceeded, CircuitOpenError)):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    try:
+        code = int(code() if callable(code) else code)  # grpc codes are callables
+    except Exception:
+        code = None
+    if code is not None and (code == 429 or 500 <= code < 600):
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(m in text for m in _RETRYABLE_MARKERS)
+
+
+def call_with_policy(fn: Callable[[float], T], *, timeout: Optional[float] = None) -> T:
+    """Run fn(remaining_seconds) under the breaker and rate limit, with jittered retries and a deadline."""
+    budget = LLM_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + budget
+    outer = request_deadline.get()
+    if outer is not None and outer < deadline:
+        deadline = outer
+        budget = max(0.0, outer - time.monotonic())
+    attempt = 0
+    probe = False
+    while True:
+        # A half-open probe keeps its slot across its own retries
+        if not probe:
+            try:
+                probe = breaker.before_call()
+            except CircuitOpenError:
+                _count("circuit_rejected")
+                raise
+        try:
+            _BUCKET.acquire(deadline)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded(f"LLM call exceeded {budget:.1f}s deadline")
+            _count("calls")
+            started = time.monotonic()
+            result = fn(remaining)
+        except LLMDeadlineExceeded:
+            # Our own budget ran out before the call was made; only earlier failed attempts count
+            if attempt:
+                breaker.record_failure()
+            elif probe:
+                breaker.release_probe()
+            _count("deadline_exceeded")
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                # A bad request says nothing about Gemini's health
+                if probe:
+                    breaker.release_probe()
+                _count("failures")
+                raise
+            attempt += 1
+            if attempt > LLM_MAX_RETRIES:
+                breaker.record_failure()
+                _count("failures")
+                raise
+            # Full jitter: sleep uniformly in [0, base * 2^attempt], capped
+            sleep = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+            if time.monotonic() + sleep >= deadline:
+                breaker.record_failure()
+                _count("deadline_exceeded")
+                raise LLMDeadlineExceeded(f"LLM call exceeded {budget:.1f}s deadline after {attempt} attempt(s): {e}") from e
+            _count("retries")
+            time.sleep(sleep)
+            continue
+        if time.monotonic() - started > LLM_SLOW_CALL_SECONDS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
+
+
+# Client pools
+_POOL_LOCK = threading.Lock()
+_GENAI_CONFIGURED = False
+_GENERATIVE_MODELS: Dict[str, Any] = {}
+_CHAT_MODELS: Dict[Tuple[str, float], Any] = {}
+
+
+def get_generative_model(model_name: str) -> Any:
+    """Shared google.generativeai GenerativeModel (genai.configure runs once per process)."""
+    global _GENAI_CONFIGURED
+    model = _GENERATIVE_MODELS.get(model_name)
+    if model is not None:
+        return model
+    try:
+        import google.generativeai as genai  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError(
+            "google-generativeai is not installed. Install with: pip install google-generativeai"
+        ) from e
+    with _POOL_LOCK:
+        if not _GENAI_CONFIGURED:
+            key = api_key()
+            if not key:
+                raise RuntimeError("Missing API key. Set GOOGLE_API_KEY or GEMINI_API_KEY in your environment.")
+            kwargs: Dict[str, Any] = {"api_key": key}
+            if API_ENDPOINT:
+                kwargs.update(transport="rest", client_options={"api_endpoint": API_ENDPOINT})
+            genai.configure(**kwargs)  # type: ignore[attr-defined]
+            _GENAI_CONFIGURED = True
+        model = _GENERATIVE_MODELS.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)  # type: ignore[attr-defined]
+            _GENERATIVE_MODELS[model_name] = model
+    return model
+
+
+def get_chat_model(model_name: str, temperature: float) -> Any:
+    """Shared LangChain ChatGoogleGenerativeAI for (model, temperature)."""
+    key = (model_name, float(temperature))
+    llm = _CHAT_MODELS.get(key)
+    if llm is not None:
+        return llm
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    with _POOL_LOCK:
+        llm = _CHAT_MODELS.get(key)
+        if llm is None:
+            kwargs: Dict[str, Any] = {
+                "google_api_key": _require_api_key(),
+                "model": model_name,
+                "temperature": temperature,
+                "timeout": LLM_TIMEOUT,
+                # Retries are handled here, with jitter and a deadline
+                "max_retries": 0,
+            }
+            if API_ENDPOINT:
+                kwargs.update(transport="rest", client_options={"api_endpoint": API_ENDPOINT})
+            llm = ChatGoogleGenerativeAI(**kwargs)
+            _CHAT_MODELS[key] = llm
+    return llm
+
+
+# Calls
+def generate_content(prompt: str, generation_config: Dict[str, Any], *, model: str, timeout: Optional[float] = None) -> Any:
+    """GenerativeModel.generate_content through the shared client and call policy."""
+    client = get_generative_model(model)
+    return call_with_policy(
+        lambda remaining: client.generate_content(
+            prompt,
+            generation_config=generation_config,  # type: ignore[arg-type]
+            request_options={"timeout": remaining},
+        ),
+        timeout=timeout,
+    )
+
+
+def invoke_chat(prompt: str, *, model: str, temperature: float, timeout: Optional[float] = None) -> str:
+    """ChatGoogleGenerativeAI.invoke through the shared client and call policy; returns text."""
+    llm = get_chat_model(model, temperature)
+    # The client's own timeout is LLM_TIMEOUT; each attempt is sent with what is left of the deadline
+    resp = call_with_policy(lambda remaining: llm.invoke(prompt, timeout=remaining), timeout=timeout)
+    return getattr(resp, "content", str(resp)).strip()
+
+
+def client_stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        stats: Dict[str, Any] = dict(_STATS)
+    stats.update(
+        rpm=round(_BUCKET.rate * 60.0, 3),
+        burst=_BUCKET.capacity,
+        rate_limit_wait_seconds=round(_BUCKET.waited_seconds, 3),
+        pooled_clients=len(_GENERATIVE_MODELS) + len(_CHAT_MODELS),
+        circuit=breaker.stats(),
+    )
+    return stats
@@ -0,0 +1,226 @@
+"""
+Process-wide registry for sentence-embedding models.
+
+emotions.py, intent.py and rag.py all embed with the same MiniLM model. Instead of
+each building its own SentenceTransformer (which reloads the weights on every
+call), they ask this registry, which loads each model once per process and hands
+the same instance to every caller.
+
+Usage:
+  from model_registry import get_model, encode, warmup, model_stats
+  X = encode(["some text"])          # (n, d) float32, L2-normalized
+  warmup()                           # load + run one tiny encode at startup
+  model_stats()                      # load time / memory per loaded model
+  set_num_threads(n)                 # per-worker intra-op thread cap (prefork.py)
+  prompt_embeddings(prompts)         # fixed label prompts, embedded once and cached on disk
+
+encode() consults the on-disk embedding store (embedding_store.py) first and only
+runs the model for texts it has not seen; set EMBEDDING_STORE=0 to bypass it.
+
+EMBEDDING_BACKEND selects how models run: torch (SentenceTransformer, default),
+onnx or onnx-int8 (see embedding_backends.py). Each backend has its own registry
+entry and embedding-store namespace, so quantized vectors never mix with fp32 ones.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from . import embedding_store  # type: ignore
+    from . import embedding_backends  # type: ignore
+except Exception:
+    import embedding_store  # type: ignore
+    import embedding_backends  # type: ignore
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR") or os.path.join(ROOT, "outputs", "embedding_cache")
+
+BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+USE_STORE = os.getenv("EMBEDDING_STORE", "1").lower() not in ("0", "false", "no", "off")
+
+_LOCK = threading.Lock()
+_MODELS: Dict[str, Any] = {}
+_STATS: Dict[str, Dict[str, Any]] = {}
+_PROMPT_CACHE: Dict[str, np.ndarray] = {}
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (best effort, 0 if unknown)."""
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+
+        # ru_maxrss is KiB on Linux; it is a peak value, good enough as a fallback
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return 0
+
+
+def _param_bytes(model: Any) -> int:
+    try:
+        return int(sum(p.numel() * p.element_size() for p in model.parameters()))
+    except Exception:
+        # ONNX encoders: size of the graph file
+        return int(getattr(model, "file_bytes", 0))
+
+
+def model_key(model_name: str, backend: Optional[str] = None) -> str:
+    """Registry / embedding-store key: the model name, suffixed for non-torch backends."""
+    backend = (backend or BACKEND).lower()
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _build_model(model_name: str, backend: str) -> Any:
+    if backend != "torch":
+        return embedding_backends.OnnxEncoder(model_name, backend)
+    try:
+        from sentence_transformers import SentenceTransformer
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("Please install 'sentence-transformers' package") from e
+    return SentenceTransformer(model_name)
+
+
+def get_model(model_name: str = DEFAULT_MODEL, backend: Optional[str] = None) -> Any:
+    """Return the shared model instance for `model_name`, loading it on first use."""
+    backend = (backend or BACKEND).lower()
+    if backend not in embedding_backends.BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {embedding_backends.BACKENDS}")
+    key = model_key(model_name, backend)
+    model = _MODELS.get(key)
+    if model is not None:
+        return model
+    with _LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            rss0 = _rss_bytes()
+            t0 = time.perf_counter()
+            model = _build_model(model_name, backend)
+            load_s = time.perf_counter() - t0
+            _MODELS[key] = model
+            _STATS[key] = {
+                "backend": backend,
+                "load_seconds": round(load_s, 3),
+                "param_bytes": _param_bytes(model),
+                "rss_delta_bytes": max(0, _rss_bytes() - rss0),
+                "loaded_at": time.time(),
+            }
+            print(f"[models] Loaded {key} in {load_s:.2f}s")
+    return model
+
+
+def _encode_with_model(texts: List[str], model_name: str, normalize: bool) -> np.ndarray:
+    model = get_model(model_name)
+    return np.asarray(model.encode(texts, normalize_embeddings=normalize), dtype=np.float32)
+
+
+def encode(
+    texts: List[str],
+    model_name: str = DEFAULT_MODEL,
+    *,
+    normalize: bool = True,
+    use_store: Optional[bool] = None,
+    persist: bool = True,
+    cache: bool = True,
+) -> np.ndarray:
+    """Embed `texts` with the shared model; returns a float32 (n, d) matrix.
+
+    Vectors already in the embedding store are read from disk; only unseen texts
+    are encoded, and added to the store unless persist=False (ad-hoc inputs,
+    kept in a bounded in-memory cache instead). cache=False still reads the
+    store but keeps the new vectors nowhere.
+    """
+    texts = list(texts)
+    if not (USE_STORE if use_store is None else use_store):
+        return _encode_with_model(texts, model_name, normalize)
+
+    store = embedding_store.get_store(model_key(model_name))
+    # The store keeps raw model output; normalization is applied on the way out
+    X = store.get_or_encode(texts, lambda missing: _encode_with_model(missing, model_name, False), persist=persist, cache=cache)
+    if normalize and len(X):
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        X = X / np.maximum(norms, 1e-12)
+    return X
+
+
+def warmup(model_names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Load the given models (default: DEFAULT_MODEL) and run one tiny encode.
+
+    The first encode initializes tokenizer/kernel state, so running it at startup
+    keeps that cost off the first real request.
+    """
+    for name in list(model_names or [DEFAULT_MODEL]):
+        t0 = time.perf_counter()
+        encode(["warmup"], name, use_store=False)
+        _STATS[model_key(name)]["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+    return model_stats()
+
+
+def set_num_threads(n: int) -> None:
+    """Cap intra-op threads of this process (e.g. one of several forked workers).
+
+    Applies to torch right away and to ONNX sessions created afterwards.
+    """
+    n = max(1, int(n))
+    os.environ["ONNX_NUM_THREADS"] = str(n)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(n)
+
+
+def model_stats() -> Dict[str, Dict[str, Any]]:
+    """Load time and memory footprint of every model loaded so far."""
+    return {name: dict(stats) for name, stats in _STATS.items()}
+
+
+def is_loaded(model_name: str = DEFAULT_MODEL) -> bool:
+    return model_key(model_name) in _MODELS
+
+
+def prompt_embeddings(prompts: List[str], model_name: str = DEFAULT_MODEL) -> np.ndarray:
+    """Normalized embeddings for a fixed list of prompts (e.g. EMOTION_PROMPTS).
+
+    The result is memoized in-process and persisted under CACHE_DIR, keyed by a
+    hash of the model name and the prompt texts, so editing a prompt invalidates it.
+    """
+    h = hashlib.sha1("\x00".join([model_key(model_name), *prompts]).encode("utf-8")).hexdigest()[:16]
+    cached = _PROMPT_CACHE.get(h)
+    if cached is not None:
+        return cached
+
+    path = os.path.join(CACHE_DIR, f"prompts-{h}.npy")
+    E: Optional[np.ndarray] = None
+    if os.path.exists(path):
+        try:
+            E = np.load(path)
+            if E.shape[0] != len(prompts):
+                E = None
+        except Exception:
+            E = None
+    if E is None:
+        E = encode(prompts, model_name)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = path + ".tmp.npy"
+            np.save(tmp, E)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[models] Could not persist prompt embeddings to {path}: {e}")
+    E = np.asarray(E, dtype=np.float32)
+    _PROMPT_CACHE[h] = E
+    return E
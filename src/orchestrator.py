@@ -1,10 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import concurrent.futures
+import contextvars
 import json
 import os
+import threading
+import time
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
 try:
 	from dotenv import load_dotenv  
 	load_dotenv()
@@ -19,6 +24,10 @@ try:
 	from . import sentiment as sentiment_mod  # type: ignore
 	from . import emotions as emotions_mod  # type: ignore
 	from . import intent as intents_mod  # type: ignore
+	from . import signals as signals_mod  # type: ignore
+	from . import llm_cache  # type: ignore
+	from . import llm_client  # type: ignore
+	from . import surrogate as surrogate_mod  # type: ignore
 except Exception:
 	# When imported from a sibling (e.g., fastapi_serve.py in same folder)
 	import sys as _sys, os as _os
@@ -26,28 +35,37 @@ except Exception:
 	import sentiment as sentiment_mod  # type: ignore
 	import emotions as emotions_mod  # type: ignore
 	import intent as intents_mod  # type: ignore
+	import signals as signals_mod  # type: ignore
+	import llm_cache  # type: ignore
+	import llm_client  # type: ignore
+	import surrogate as surrogate_mod  # type: ignore
 
 
-def _get_api_key() -> Optional[str]:
-	return os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.5-flash"
 
+SINGLE_GENERATION_CONFIG: Dict[str, Any] = {
+	"temperature": 0.2,
+	"max_output_tokens": 256,
+	# Ask the model to respond with JSON to simplify parsing
+	"response_mime_type": "application/json",
+}
+
+# Who predicts repeat_purchase / nps_score:
+#   hybrid  local surrogate model; items below SURROGATE_MIN_CONFIDENCE go to Gemini (default)
+#   local   surrogate only (sentiment fallback when no model is trained)
+#   gemini  Gemini for every item
+PREDICTION_MODES = ("hybrid", "local", "gemini")
+PREDICTION_MODE = os.getenv("PREDICTION_MODE", "hybrid").lower()
+SURROGATE_MIN_CONFIDENCE = float(os.getenv("SURROGATE_MIN_CONFIDENCE", "0.75"))
+
+
+def _get_api_key() -> Optional[str]:
+	return llm_client.api_key()
 
-def _load_gemini_model(model_name: str = "gemini-2.5-flash"):
-	try:
-		import google.generativeai as genai  # type: ignore
-	except Exception as e:  # pragma: no cover
-		raise RuntimeError(
-			"google-generativeai is not installed. Install with: pip install google-generativeai"
-		) from e
-
-	api_key = _get_api_key()
-	if not api_key:
-		raise RuntimeError(
-			"Missing API key. Set GOOGLE_API_KEY or GEMINI_API_KEY in your environment."
-		)
 
-	genai.configure(api_key=api_key)  # type: ignore[attr-defined]
-	return genai.GenerativeModel(model_name)  # type: ignore[attr-defined]
+def _load_gemini_model(model_name: str = GEMINI_MODEL):
+	"""Process-wide GenerativeModel from the shared client pool."""
+	return llm_client.get_generative_model(model_name)
 
 
 # Data structures 
@@ -57,6 +75,8 @@ class OrchestratedSignals:
 	sentiment_label: str
 	emotion: str
 	intent: str
+	# True when VADER was unavailable and the sentiment is a neutral placeholder
+	sentiment_degraded: bool = False
 
 
 @dataclass
@@ -64,6 +84,8 @@ class GeminiPrediction:
 	repeat_purchase: bool
 	nps_score: int
 	reason: str
+	# "gemini", "local" (surrogate model) or "fallback" (sentiment heuristic)
+	source: str = "gemini"
 
 
 @dataclass
@@ -74,38 +96,60 @@ class OrchestratedResult:
 
 
 # Core orchestration 
-def analyze_text_with_locals(text: str) -> OrchestratedSignals:
-	"""Compute sentiment, emotion, and intent using local modules.
+def local_signals_and_embeddings(texts: List[str]) -> tuple[List[OrchestratedSignals], Optional[np.ndarray]]:
+	"""Compute sentiment, emotion, and intent for a batch of texts (input order).
 
-	- sentiment: VADER compound and label
-	- emotion: emotions.cluster_emotions on single-item list
-	- intent: intent_cluster.cluster_intents on single-item list
+	- sentiment: VADER compound and label, one shared analyzer for the batch
+	- emotion + intent: derived from one embedding pass over the batch (see
+	  signals.py); the embeddings are returned too, for the surrogate model,
+	  or None when the embedding model is unavailable
 	"""
-	text_s = str(text)
-
-	# Sentiment
-	s_score = float(sentiment_mod.vader_sentiment_score(text_s))
-	s_label = sentiment_mod.vader_sentiment_label(s_score)
+	texts_s = [str(t) for t in texts]
+	if not texts_s:
+		return [], None
 
-	# Emotion
+	# Sentiment (neutral when the VADER lexicon is missing)
+	sentiment_degraded = False
 	try:
-		emo = emotions_mod.cluster_emotions([text_s])[0]
-	except Exception:
-		# Fallback neutral if emotion model not available
-		emo = "neutral"
-
-	# Intent
+		s_scores = sentiment_mod.vader_sentiment_scores(texts_s)
+	except LookupError as e:
+		print(f"[orchestrator] {e}")
+		s_scores = [0.0] * len(texts_s)
+		sentiment_degraded = True
+
+	# Emotion + intent from a single embedding pass (falls back to neutral/other)
+	X: Optional[np.ndarray]
 	try:
-		intent = intents_mod.cluster_intents([text_s])[0]
+		# Request texts are not corpus rows; keep them out of the on-disk store
+		X = signals_mod.embed_texts(texts_s, persist=False)
 	except Exception:
-		intent = "other"
+		X = None
+	if X is None:
+		emos, intents = ["neutral"] * len(texts_s), ["other"] * len(texts_s)
+	else:
+		emos, intents = signals_mod.classify_embeddings(X)
+
+	signals_list = [
+		OrchestratedSignals(
+			sentiment_score=float(score),
+			sentiment_label=sentiment_mod.vader_sentiment_label(float(score)),
+			emotion=emo,
+			intent=intent,
+			sentiment_degraded=sentiment_degraded,
+		)
+		for score, emo, intent in zip(s_scores, emos, intents)
+	]
+	return signals_list, X
 
-	return OrchestratedSignals(
-		sentiment_score=s_score,
-		sentiment_label=s_label,
-		emotion=emo,
-		intent=intent,
-	)
+
+def analyze_texts_with_locals(texts: List[str]) -> List[OrchestratedSignals]:
+	"""Local signals only (see local_signals_and_embeddings)."""
+	return local_signals_and_embeddings(texts)[0]
+
+
+def analyze_text_with_locals(text: str) -> OrchestratedSignals:
+	"""Single-text version of analyze_texts_with_locals."""
+	return analyze_texts_with_locals([text])[0]
 
 
 def _build_gemini_prompt(text: str, signals: OrchestratedSignals) -> str:
@@ -132,59 +176,81 @@ def _build_gemini_prompt(text: str, signals: OrchestratedSignals) -> str:
 	)
 
 
-def gemini_predict(text: str, signals: OrchestratedSignals) -> GeminiPrediction:
-	model = _load_gemini_model()
+def _response_text(r) -> str:
+	# Try the convenience accessor first
+	try:
+		t = r.text  # may raise if no valid Part
+		if t:
+			return str(t)
+	except Exception:
+		pass
+	# Fallback: scan candidates/parts
+	try:
+		for c in getattr(r, "candidates", []) or []:
+			content = getattr(c, "content", None)
+			if not content:
+				continue
+			for p in getattr(content, "parts", []) or []:
+				t = getattr(p, "text", None)
+				if t:
+					return str(t)
+	except Exception:
+		pass
+	return ""
 
-	generation_config: Dict[str, Any] = {
-		"temperature": 0.2,
-		"max_output_tokens": 256,
-		# Ask the model to respond with JSON to simplify parsing
-		"response_mime_type": "application/json",
-	}
 
-	prompt = _build_gemini_prompt(text, signals)
+def _finish_reason(resp) -> Any:
+	try:
+		return getattr(getattr(resp, "candidates", [None])[0], "finish_reason", None)
+	except Exception:
+		return None
+
+
+def _extract_json(s: str, open_ch: str = "{", close_ch: str = "}") -> Any:
+	"""Defensive parsing: handle code fences or extra text around the JSON value."""
+	s = s.strip()
+	# Remove common Markdown code fences
+	if s.startswith("```") and s.endswith("```"):
+		s = s.strip("`")
+		if s.startswith("json\n"):
+			s = s[5:]
+	# Find first and last brackets as a fallback
+	l = s.find(open_ch)
+	r = s.rfind(close_ch)
+	if l != -1 and r != -1 and r > l:
+		s = s[l : r + 1]
+	return json.loads(s)
+
+
+def _is_json(s: str, open_ch: str = "{", close_ch: str = "}") -> bool:
+	try:
+		_extract_json(s, open_ch, close_ch)
+		return True
+	except Exception:
+		return False
 
-	# The Python SDK accepts plain strings as content
-	resp = model.generate_content(prompt, generation_config=generation_config)  # type: ignore[arg-type]
 
-	def _response_text(r) -> str:
-		# Try the convenience accessor first
-		try:
-			t = r.text  # may raise if no valid Part
-			if t:
-				return str(t)
-		except Exception:
-			pass
-		# Fallback: scan candidates/parts
-		try:
-			for c in getattr(r, "candidates", []) or []:
-				content = getattr(c, "content", None)
-				if not content:
-					continue
-				for p in getattr(content, "parts", []) or []:
-					t = getattr(p, "text", None)
-					if t:
-						return str(t)
-		except Exception:
-			pass
-		return ""
-
-	raw = _response_text(resp).strip()
-
-	# Defensive parsing: handle code fences or extra text
-	def _extract_json(s: str) -> Dict:
-		s = s.strip()
-		# Remove common Markdown code fences
-		if s.startswith("```") and s.endswith("```"):
-			s = s.strip("`")
-			if s.startswith("json\n"):
-				s = s[5:]
-		# Find first and last braces as a fallback
-		l = s.find("{")
-		r = s.rfind("}")
-		if l != -1 and r != -1 and r > l:
-			s = s[l : r + 1]
-		return json.loads(s)
+def _cached_generate(prompt: str, generation_config: Dict[str, Any], finish: Dict[str, Any], cache_if=None) -> str:
+	"""Response text for `prompt`, served from llm_cache when the same call was made before.
+
+	The model is only built on a cache miss, so repeat views need no API call at all.
+	`finish` receives the finish_reason of a live call for fallback messages.
+	"""
+	def _call() -> str:
+		# Shared client, global rate limit, retries and a deadline (see llm_client)
+		resp = llm_client.generate_content(prompt, generation_config, model=GEMINI_MODEL)
+		finish["finish_reason"] = _finish_reason(resp)
+		return _response_text(resp).strip()
+
+	return llm_cache.cached_call(GEMINI_MODEL, generation_config, prompt, _call, cache_if=cache_if).strip()
+
+
+def gemini_predict(text: str, signals: OrchestratedSignals) -> GeminiPrediction:
+	generation_config = dict(SINGLE_GENERATION_CONFIG)
+	prompt = _build_gemini_prompt(text, signals)
+
+	finish: Dict[str, Any] = {}
+	raw = _cached_generate(prompt, generation_config, finish, cache_if=_is_json)
 
 	try:
 		data = _extract_json(raw) if raw else {}
@@ -194,16 +260,7 @@ def gemini_predict(text: str, signals: OrchestratedSignals) -> GeminiPrediction:
 
 	if not data:
 		# No usable JSON from model; provide safe defaults with context
-		finish_reason = None
-		try:
-			finish_reason = getattr(getattr(resp, "candidates", [None])[0], "finish_reason", None)
-		except Exception:
-			pass
-		data = {
-			"repeat_purchase": signals.sentiment_label == "positive",
-			"nps_score": int(np.clip(round((signals.sentiment_score + 1) * 5), 0, 10)),
-			"reason": f"Fallback (no model JSON). finish_reason={finish_reason}",
-		}
+		return fallback_prediction(signals, f"Fallback (no model JSON). finish_reason={finish.get('finish_reason')}")
 
 	repeat_purchase = bool(data.get("repeat_purchase", False))
 	try:
@@ -216,33 +273,575 @@ def gemini_predict(text: str, signals: OrchestratedSignals) -> GeminiPrediction:
 	return GeminiPrediction(repeat_purchase=repeat_purchase, nps_score=nps_score, reason=reason)
 
 
-def analyze_text(text: str) -> OrchestratedResult:
-	signals = analyze_text_with_locals(text)
+# Batched prediction 
+# Rough prompt-size budget per Gemini call; ~4 characters per token is close
+# enough for packing decisions.
+GEMINI_BATCH_TOKEN_BUDGET = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", "6000"))
+GEMINI_BATCH_MAX_ITEMS = int(os.getenv("GEMINI_BATCH_MAX_ITEMS", "25"))
+GEMINI_BATCH_PREDICT = os.getenv("GEMINI_BATCH_PREDICT", "1").lower() not in ("0", "false", "no", "off")
+
+_BATCH_HEADER = (
+	"You are a customer feedback analyst.\n"
+	"For EACH feedback item below, given the raw text and pre-computed signals, predict whether"
+	" the customer is likely to make a repeat purchase and estimate an NPS score (0-10)."
+	" Keep answers consistent with the signals but use your judgment.\n\n"
+)
+_BATCH_FOOTER = (
+	"\nReturn ONLY a JSON array with one object per item, in any order, each with keys "
+	"id (the item's integer id), repeat_purchase (boolean), nps_score (integer 0-10), "
+	"reason (short string)."
+)
+
+
+def _estimate_tokens(s: str) -> int:
+	return len(s) // 4 + 1
+
+
+def _batch_item_block(item_id: int, text: str, signals: OrchestratedSignals) -> str:
+	return (
+		f"[id={item_id}]\n"
+		f"Feedback: {text}\n"
+		f"Signals: sentiment_label={signals.sentiment_label}, sentiment_score={signals.sentiment_score:.3f}, "
+		f"emotion={signals.emotion}, intent={signals.intent}\n"
+	)
+
+
+def _pack_batches(blocks: List[str], token_budget: int, max_items: int) -> List[List[int]]:
+	"""Greedily group item indices so each prompt stays under the token budget.
+
+	An item that alone exceeds the budget still gets its own batch.
+	"""
+	overhead = _estimate_tokens(_BATCH_HEADER) + _estimate_tokens(_BATCH_FOOTER)
+	batches: List[List[int]] = []
+	cur: List[int] = []
+	used = overhead
+	for i, block in enumerate(blocks):
+		cost = _estimate_tokens(block)
+		if cur and (used + cost > token_budget or len(cur) >= max_items):
+			batches.append(cur)
+			cur, used = [], overhead
+		cur.append(i)
+		used += cost
+	if cur:
+		batches.append(cur)
+	return batches
+
+
+def _coerce_bool(v: Any) -> Optional[bool]:
+	if isinstance(v, bool):
+		return v
+	if isinstance(v, str) and v.strip().lower() in ("true", "false", "yes", "no"):
+		return v.strip().lower() in ("true", "yes")
+	return None
+
+
+def _validate_batch_item(obj: Any) -> Optional[GeminiPrediction]:
+	"""Strict per-item validation; None means the item falls back individually."""
+	if not isinstance(obj, dict):
+		return None
+	repeat_purchase = _coerce_bool(obj.get("repeat_purchase"))
+	if repeat_purchase is None:
+		return None
+	nps = obj.get("nps_score")
+	if isinstance(nps, bool):
+		return None
+	try:
+		nps_score = int(round(float(nps)))
+	except Exception:
+		return None
+	return GeminiPrediction(
+		repeat_purchase=repeat_purchase,
+		nps_score=int(np.clip(nps_score, 0, 10)),
+		reason=str(obj.get("reason", ""))[:500],
+	)
+
+
+def _gemini_predict_one_batch(
+	texts: List[str], signals_list: List[OrchestratedSignals], blocks: List[str]
+) -> List[GeminiPrediction]:
+	generation_config: Dict[str, Any] = {
+		"temperature": 0.2,
+		# ~64 output tokens per item (id, two fields and a short reason)
+		"max_output_tokens": min(8192, 128 + 96 * len(texts)),
+		"response_mime_type": "application/json",
+	}
+	prompt = _BATCH_HEADER + "\n".join(blocks) + _BATCH_FOOTER
+	finish: Dict[str, Any] = {}
+	raw = _cached_generate(prompt, generation_config, finish, cache_if=lambda r: _is_json(r, "[", "]"))
+
+	by_id: Dict[int, GeminiPrediction] = {}
 	try:
-		prediction = gemini_predict(text, signals)
+		data = _extract_json(raw, "[", "]") if raw else []
+	except Exception:
+		data = []
+	if isinstance(data, dict):
+		# Some responses wrap the array, e.g. {"items": [...]}
+		data = next((v for v in data.values() if isinstance(v, list)), [])
+	for obj in data if isinstance(data, list) else []:
+		try:
+			item_id = int(obj.get("id"))  # type: ignore[union-attr]
+		except Exception:
+			continue
+		pred = _validate_batch_item(obj)
+		if pred is not None and 0 <= item_id < len(texts) and item_id not in by_id:
+			by_id[item_id] = pred
+
+	finish_reason = finish.get("finish_reason")
+	return [
+		by_id.get(i) or fallback_prediction(s, f"Fallback (item missing or malformed in batch). finish_reason={finish_reason}")
+		for i, s in enumerate(signals_list)
+	]
+
+
+def gemini_predict_batch(
+	texts: List[str],
+	signals_list: List[OrchestratedSignals],
+	*,
+	token_budget: Optional[int] = None,
+	max_items: Optional[int] = None,
+) -> List[GeminiPrediction]:
+	"""Predict repeat_purchase / nps_score / reason for many reviews with few Gemini calls.
+
+	Reviews are packed into prompts under `token_budget` (GEMINI_BATCH_TOKEN_BUDGET);
+	Gemini answers with a JSON array keyed by item id. Each item is validated on
+	its own, so a missing or malformed entry (or a failed call) only falls back for
+	the affected items. Results are in input order.
+	"""
+	if not texts:
+		return []
+	out: List[GeminiPrediction] = [None] * len(texts)  # type: ignore[list-item]
+	for idxs in _plan_batches(texts, signals_list, token_budget, max_items):
+		for i, pred in zip(idxs, _predict_group(idxs, texts, signals_list)):
+			out[i] = pred
+	return out
+
+
+def _plan_batches(
+	texts: List[str],
+	signals_list: List[OrchestratedSignals],
+	token_budget: Optional[int] = None,
+	max_items: Optional[int] = None,
+) -> List[List[int]]:
+	budget = int(token_budget or GEMINI_BATCH_TOKEN_BUDGET)
+	limit = int(max_items or GEMINI_BATCH_MAX_ITEMS)
+	blocks = [_batch_item_block(i, t, s) for i, (t, s) in enumerate(zip(texts, signals_list))]
+	return _pack_batches(blocks, budget, limit)
+
+
+def _predict_group(
+	idxs: List[int], texts: List[str], signals_list: List[OrchestratedSignals]
+) -> List[GeminiPrediction]:
+	"""One batched Gemini call for the items at `idxs`; never raises."""
+	# Ids are local to each prompt (0..n-1) to keep them short
+	sub_texts = [texts[i] for i in idxs]
+	sub_signals = [signals_list[i] for i in idxs]
+	sub_blocks = [_batch_item_block(j, texts[i], signals_list[i]) for j, i in enumerate(idxs)]
+	try:
+		return _gemini_predict_one_batch(sub_texts, sub_signals, sub_blocks)
 	except Exception as e:
-		prediction = GeminiPrediction(
-			repeat_purchase=signals.sentiment_label == "positive",
-			nps_score=int(np.clip(round((signals.sentiment_score + 1) * 5), 0, 10)),
-			reason=f"Fallback (Gemini error): {e}",
+		return [fallback_prediction(s, f"Fallback (Gemini error): {e}") for s in sub_signals]
+
+
+def fallback_prediction(signals: OrchestratedSignals, reason: str) -> GeminiPrediction:
+	"""Sentiment-based prediction used whenever Gemini gives no usable answer."""
+	return GeminiPrediction(
+		repeat_purchase=signals.sentiment_label == "positive",
+		nps_score=int(np.clip(round((signals.sentiment_score + 1) * 5), 0, 10)),
+		reason=reason,
+		source="fallback",
+	)
+
+
+def _predict(text: str, signals: OrchestratedSignals) -> GeminiPrediction:
+	try:
+		return gemini_predict(text, signals)
+	except Exception as e:
+		return fallback_prediction(signals, f"Fallback (Gemini error): {e}")
+
+
+def surrogate_predict(
+	signals_list: List[OrchestratedSignals],
+	embeddings: Optional[np.ndarray],
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> tuple[List[Optional[GeminiPrediction]], List[float]]:
+	"""Local model predictions and confidences; all None / 0.0 when no model applies.
+
+	`ratings` are the reviews' star ratings where known; None marks a missing one.
+	"""
+	n = len(signals_list)
+	model = surrogate_mod.get_model()
+	if model is None or embeddings is None or embeddings.shape[0] != n or embeddings.shape[1] != model.dim:
+		return [None] * n, [0.0] * n
+	F = model.features(
+		[s.sentiment_score for s in signals_list],
+		[s.emotion for s in signals_list],
+		[s.intent for s in signals_list],
+		embeddings,
+		ratings=ratings,
+	)
+	rec, nps, conf = model.predict(F)
+	preds: List[Optional[GeminiPrediction]] = [
+		GeminiPrediction(
+			repeat_purchase=bool(r),
+			nps_score=int(v),
+			reason=f"Local model (confidence {c:.2f})",
+			source="local",
 		)
-	return OrchestratedResult(text=text, signals=signals, prediction=prediction)
+		for r, v, c in zip(rec, nps, conf)
+	]
+	return preds, [float(c) for c in conf]
+
+
+def _route_predictions(
+	signals_list: List[OrchestratedSignals],
+	embeddings: Optional[np.ndarray],
+	mode: Optional[str],
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> tuple[List[Optional[GeminiPrediction]], List[int]]:
+	"""Predictions settled locally (None where unset) and the indices that need Gemini."""
+	mode = (mode or PREDICTION_MODE).lower()
+	n = len(signals_list)
+	if mode not in PREDICTION_MODES:
+		raise ValueError(f"Unknown prediction mode {mode!r}; expected one of {PREDICTION_MODES}")
+	if mode == "gemini":
+		if llm_client.breaker.is_open():
+			return [fallback_prediction(s, "Fallback (Gemini circuit open)") for s in signals_list], []
+		return [None] * n, list(range(n))
+
+	preds, conf = surrogate_predict(signals_list, embeddings, ratings)
+	if mode == "local":
+		out: List[Optional[GeminiPrediction]] = [
+			p if p is not None else fallback_prediction(s, "Fallback (no local model)")
+			for p, s in zip(preds, signals_list)
+		]
+		return out, []
+	escalate = [i for i in range(n) if preds[i] is None or conf[i] < SURROGATE_MIN_CONFIDENCE]
+	if escalate and llm_client.breaker.is_open():
+		# Gemini is being skipped; answer locally right away instead of queueing calls that fail
+		for i in escalate:
+			preds[i] = fallback_prediction(signals_list[i], "Fallback (Gemini circuit open)")
+		return preds, []
+	for i in escalate:
+		preds[i] = None
+	return preds, escalate
+
+
+def _gemini_predictions(
+	texts: List[str], signals_list: List[OrchestratedSignals], batch_llm: Optional[bool]
+) -> List[GeminiPrediction]:
+	use_batch = GEMINI_BATCH_PREDICT if batch_llm is None else batch_llm
+	if use_batch and len(texts) > 1:
+		return gemini_predict_batch(list(texts), signals_list)
+	return [_predict(t, s) for t, s in zip(texts, signals_list)]
+
+
+def predict(
+	texts: List[str],
+	signals_list: List[OrchestratedSignals],
+	embeddings: Optional[np.ndarray] = None,
+	*,
+	batch_llm: Optional[bool] = None,
+	mode: Optional[str] = None,
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> List[GeminiPrediction]:
+	"""Repeat-purchase / NPS predictions for the batch (input order), per PREDICTION_MODE."""
+	out, escalate = _route_predictions(signals_list, embeddings, mode, ratings)
+	if escalate:
+		preds = _gemini_predictions([texts[i] for i in escalate], [signals_list[i] for i in escalate], batch_llm)
+		for i, pred in zip(escalate, preds):
+			out[i] = pred
+	return out  # type: ignore[return-value]
+
+
+def analyze_texts(
+	texts: List[str],
+	*,
+	batch_llm: Optional[bool] = None,
+	mode: Optional[str] = None,
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> List[OrchestratedResult]:
+	"""Batch entry point: local signals computed once for all texts; results in input order.
+
+	Predictions come from the local surrogate model where it is confident
+	(PREDICTION_MODE=hybrid); the rest go to Gemini. With batch_llm (default
+	GEMINI_BATCH_PREDICT) several reviews share one Gemini call via
+	gemini_predict_batch; otherwise each review gets its own call. `ratings`
+	(None where unknown) feed the local model only.
+	"""
+	signals_list, X = local_signals_and_embeddings(texts)
+	predictions = predict(list(texts), signals_list, X, batch_llm=batch_llm, mode=mode, ratings=ratings)
+	return [
+		OrchestratedResult(text=text, signals=signals, prediction=prediction)
+		for text, signals, prediction in zip(texts, signals_list, predictions)
+	]
+
+
+def analyze_text(text: str) -> OrchestratedResult:
+	return analyze_texts([text])[0]
+
+
+# Async fan-out 
+# The Gemini SDK calls are blocking, so each one runs in a worker thread of a
+# dedicated pool (LLM_CONCURRENCY threads), separate from asyncio's default
+# executor that the local signal stage uses. An optional semaphore caps how many
+# calls are in flight across concurrent requests.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+T = TypeVar("T")
+# A time.monotonic() deadline for a whole batch, or one per item
+Deadlines = Union[None, float, Sequence[Optional[float]]]
+
+_LLM_EXECUTOR: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_LLM_EXECUTOR_LOCK = threading.Lock()
+
+
+def _llm_executor() -> concurrent.futures.ThreadPoolExecutor:
+	# Created on first use, so forked server workers each start their own threads
+	global _LLM_EXECUTOR
+	with _LLM_EXECUTOR_LOCK:
+		if _LLM_EXECUTOR is None:
+			_LLM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max(1, LLM_CONCURRENCY), thread_name_prefix="llm")
+		return _LLM_EXECUTOR
+
+
+async def run_limited(semaphore: Optional[asyncio.Semaphore], fn, *args, deadline: Optional[float] = None):
+	"""fn(*args) on the LLM thread pool, holding a `semaphore` slot until the thread is done.
+
+	A thread can't be interrupted, so when the awaiting task is cancelled (a
+	deadline passed) the call keeps running and keeps its slot until it returns;
+	abandoned calls therefore never push the number in flight past the limit.
+	`deadline` (time.monotonic()) tightens llm_client.request_deadline for the
+	call, so the SDK request itself is sent with only the remaining budget.
+	"""
+	if semaphore is not None:
+		await semaphore.acquire()
+	loop = asyncio.get_running_loop()
+	ctx = contextvars.copy_context()
+	if deadline is not None:
+		outer = ctx.run(llm_client.request_deadline.get)
+		ctx.run(llm_client.request_deadline.set, deadline if outer is None else min(outer, deadline))
+	try:
+		future = _llm_executor().submit(ctx.run, fn, *args)
+	except BaseException:
+		if semaphore is not None:
+			semaphore.release()
+		raise
+	if semaphore is not None:
+
+		def _release(_: concurrent.futures.Future) -> None:
+			try:
+				loop.call_soon_threadsafe(semaphore.release)
+			except RuntimeError:
+				pass  # loop already closed
+
+		future.add_done_callback(_release)
+	# Cancelling the wrapper only drops calls that have not started yet
+	return await asyncio.wrap_future(future)
+
+
+def item_deadlines(deadline: Deadlines, n: int) -> List[Optional[float]]:
+	"""One deadline per item: a single deadline is shared, a sequence is per item."""
+	if deadline is None or isinstance(deadline, (int, float)):
+		return [deadline] * n  # type: ignore[list-item]
+	out = list(deadline)
+	if len(out) != n:
+		raise ValueError(f"Expected {n} deadlines, got {len(out)}")
+	return out
+
+
+def latest_deadline(deadlines: Sequence[Optional[float]]) -> Optional[float]:
+	"""The deadline that covers all of `deadlines` (None if any item has none)."""
+	if not deadlines or any(d is None for d in deadlines):
+		return None
+	return max(deadlines)  # type: ignore[type-var]
+
+
+async def gather_with_deadline(
+	aws: List[Awaitable[T]], deadline: Deadlines, on_miss: Callable[[int], T]
+) -> List[T]:
+	"""Like asyncio.gather, but stops waiting at `deadline` (time.monotonic()).
+
+	`deadline` is one deadline for all awaitables or a sequence with one per
+	awaitable. Awaitables that are unfinished at their deadline, or that raised,
+	are replaced by on_miss(index). Calls already running in run_limited threads
+	finish in the background and hold their slot until then; they were sent
+	with the same deadline, so they end soon after.
+	"""
+	tasks = [asyncio.ensure_future(a) for a in aws]
+	if not tasks:
+		return []
+	deadlines = item_deadlines(deadline, len(tasks))
+	pending = set(tasks)
+	while pending:
+		now = time.monotonic()
+		for t, d in zip(tasks, deadlines):
+			if t in pending and d is not None and d <= now:
+				pending.discard(t)
+				t.cancel()
+		if not pending:
+			break
+		nxt = min((d for t, d in zip(tasks, deadlines) if t in pending and d is not None), default=None)
+		timeout = None if nxt is None else max(0.0, nxt - now)
+		_, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+	out: List[T] = []
+	for i, t in enumerate(tasks):
+		if t.done() and not t.cancelled() and t.exception() is None:
+			out.append(t.result())
+		else:
+			out.append(on_miss(i))
+	return out
+
+
+def _predict_items(idxs: List[int], texts: List[str], signals_list: List[OrchestratedSignals]) -> List[GeminiPrediction]:
+	"""One gemini_predict call per item at `idxs` (unbatched mode)."""
+	return [_predict(texts[i], signals_list[i]) for i in idxs]
+
+
+async def iter_predictions_async(
+	texts: List[str],
+	signals_list: List[OrchestratedSignals],
+	*,
+	semaphore: Optional[asyncio.Semaphore] = None,
+	batch_llm: Optional[bool] = None,
+	embeddings: Optional[np.ndarray] = None,
+	mode: Optional[str] = None,
+	deadline: Deadlines = None,
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> AsyncIterator[Tuple[int, GeminiPrediction]]:
+	"""(input index, prediction) pairs in completion order.
+
+	Local predictions come first; only the items escalated to Gemini leave the
+	process, as packed groups (batched mode) or one call each, all concurrent.
+	Items still waiting on Gemini at `deadline` (time.monotonic(); one for the
+	batch or one per item) get the sentiment fallback.
+	"""
+	if not texts:
+		return
+	deadlines = item_deadlines(deadline, len(texts))
+	local, escalate = _route_predictions(signals_list, embeddings, mode, ratings)
+	for i, pred in enumerate(local):
+		if pred is not None:
+			yield i, pred
+	if not escalate:
+		return
+
+	use_batch = GEMINI_BATCH_PREDICT if batch_llm is None else batch_llm
+	if use_batch and len(escalate) > 1:
+		planned = _plan_batches([texts[i] for i in escalate], [signals_list[i] for i in escalate])
+		groups = [[escalate[j] for j in g] for g in planned]
+		fn = _predict_group
+	else:
+		groups = [[i] for i in escalate]
+		fn = _predict_items
+	# Each call gets the latest deadline among its items; items are cut off at their own
+	tasks = {
+		asyncio.ensure_future(
+			run_limited(semaphore, fn, g, texts, signals_list, deadline=latest_deadline([deadlines[i] for i in g]))
+		): g
+		for g in groups
+	}
+	pending = set(tasks)
+	waiting = set(escalate)
+	try:
+		while pending:
+			now = time.monotonic()
+			for i in sorted(waiting):
+				if deadlines[i] is not None and deadlines[i] <= now:
+					waiting.discard(i)
+					yield i, fallback_prediction(signals_list[i], "Fallback (deadline exceeded)")
+			abandoned = {task for task in pending if waiting.isdisjoint(tasks[task])}
+			for task in abandoned:
+				task.cancel()
+			pending -= abandoned
+			if not pending:
+				break
+			nxt = min((deadlines[i] for i in waiting if deadlines[i] is not None), default=None)
+			timeout = None if nxt is None else max(0.0, nxt - now)
+			done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+			for task in done:
+				g = tasks[task]
+				try:
+					preds = task.result()
+				except Exception as e:
+					preds = [fallback_prediction(signals_list[i], f"Fallback (Gemini error): {e}") for i in g]
+				for i, pred in zip(g, preds):
+					if i in waiting:
+						waiting.discard(i)
+						yield i, pred
+	finally:
+		# Running calls finish in the background (see run_limited); they were sent with their deadline
+		for task in pending:
+			task.cancel()
+
+
+async def predict_async(
+	texts: List[str],
+	signals_list: List[OrchestratedSignals],
+	*,
+	semaphore: Optional[asyncio.Semaphore] = None,
+	batch_llm: Optional[bool] = None,
+	embeddings: Optional[np.ndarray] = None,
+	mode: Optional[str] = None,
+	deadline: Deadlines = None,
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> List[GeminiPrediction]:
+	"""Concurrent version of predict (input order); see iter_predictions_async."""
+	out: List[GeminiPrediction] = [None] * len(texts)  # type: ignore[list-item]
+	async for i, pred in iter_predictions_async(
+		texts,
+		signals_list,
+		semaphore=semaphore,
+		batch_llm=batch_llm,
+		embeddings=embeddings,
+		mode=mode,
+		deadline=deadline,
+		ratings=ratings,
+	):
+		out[i] = pred
+	return out
+
+
+async def analyze_texts_async(
+	texts: List[str],
+	*,
+	semaphore: Optional[asyncio.Semaphore] = None,
+	batch_llm: Optional[bool] = None,
+	mode: Optional[str] = None,
+	deadline: Optional[float] = None,
+	ratings: Optional[Sequence[Optional[float]]] = None,
+) -> List[OrchestratedResult]:
+	signals_list, X = await asyncio.to_thread(local_signals_and_embeddings, texts)
+	predictions = await predict_async(
+		texts, signals_list, semaphore=semaphore, batch_llm=batch_llm, embeddings=X, mode=mode, deadline=deadline, ratings=ratings
+	)
+	return [
+		OrchestratedResult(text=text, signals=signals, prediction=prediction)
+		for text, signals, prediction in zip(texts, signals_list, predictions)
+	]
 
 
 
 # CLI 
 def _build_arg_parser() -> argparse.ArgumentParser:
-	p = argparse.ArgumentParser(description="Gemini-backed feedback orchestrator (single text)")
-	p.add_argument("--text", required=True, help="Feedback text to analyze")
+	p = argparse.ArgumentParser(description="Gemini-backed feedback orchestrator")
+	p.add_argument("--text", action="append", default=[], help="Feedback text to analyze (repeat for a batch)")
+	p.add_argument("--file", help="File with one feedback text per line (analyzed as one batch)")
+	p.add_argument("--mode", choices=PREDICTION_MODES, default=None, help="Prediction mode (default: PREDICTION_MODE env or hybrid)")
 	return p
 
 
-def _print_result(result: OrchestratedResult) -> None:
-	data = {
+def _result_dict(result: OrchestratedResult) -> Dict[str, Any]:
+	return {
 		"text": result.text,
 		"signals": asdict(result.signals),
 		"prediction": asdict(result.prediction),
 	}
+
+
+def _print_results(results: List[OrchestratedResult]) -> None:
+	data: Any = [_result_dict(r) for r in results]
+	if len(results) == 1:
+		data = data[0]
 	print(json.dumps(data, ensure_ascii=False, indent=2))
 
 
@@ -250,8 +849,14 @@ def main(argv: Optional[list[str]] = None) -> int:
 	parser = _build_arg_parser()
 	args = parser.parse_args(argv)
 
-	res = analyze_text(args.text)
-	_print_result(res)
+	texts = list(args.text)
+	if args.file:
+		with open(args.file, "r", encoding="utf-8") as fh:
+			texts.extend(line.strip() for line in fh if line.strip())
+	if not texts:
+		parser.error("provide --text and/or --file")
+
+	_print_results(analyze_texts(texts, mode=args.mode))
 	return 0
 
 
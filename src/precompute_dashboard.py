@@ -2,26 +2,55 @@
 Precompute dashboard signals from outputs/clean_csv.csv and save cache files.
 
 Writes:
-- outputs/dashboard_reviews.jsonl  (one JSON per line with: text, rating, department, sentiment, emotion)
+- outputs/dashboard_reviews/        (columnar, memory-mappable: text, rating, department, class, age, sentiment, emotion; see review_store.py)
 - outputs/dashboard_summary.json    (aggregated totals and per-department averages)
+- outputs/dashboard_cube.npz        (aggregate cube answering filtered dashboard queries, see dashboard_cube.py)
+- outputs/centroids/{emotion,intent}.npz  (corpus centroid models used to label new texts online)
+
+fastapi_serve reuses these helpers for its startup cache and /refresh_dashboard.
+
+Every cached row carries `row_hash`, a 64-bit BLAKE2b digest of its source
+fields. With --incremental (and in the server's default refresh) the current
+CSV is diffed against the existing cache by hash: unchanged rows keep their
+cached sentiment/emotion, only added or edited rows are scored, and deleted
+rows drop out. New rows get their emotion from the persisted emotion centroid
+model, the same clustering that labelled the cached rows. Without a usable
+centroid model the refresh falls back to a full compute, which refits it.
+The aggregate cube is updated in place: rows that left are subtracted and
+rows that came in are added (AggregateCube.apply_delta). The summary is read
+off the cube.
+
+Large corpora (more than STREAMING_MIN_ROWS reviews, or with --streaming) are
+clustered with MiniBatchKMeans over chunked embeddings spilled to disk, so peak
+memory stays bounded (see streaming_clusters.py).
 
 Run:
-  python src/precompute_dashboard.py
+  python src/precompute_dashboard.py [--incremental] [--streaming] [--chunk-size 2048] [--spill-dir DIR]
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
 import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from dashboard_cube import CUBE_PATH, AggregateCube
+import review_store
+from review_store import REVIEWS_DIR, ReviewStore
 from sentiment import vader_sentiment_score, vader_sentiment_label
 
 try:
-    from emotions import cluster_emotions
+    from emotions import EMOTIONS, fit_emotion_centroids, emotion_model_from_centers
+    from intent import INTENTS, fit_intent_centroids, intent_model_from_centers
+    import signals
+    from signals import embed_texts
+    import streaming_clusters
     _HAS_EMOTIONS = True
 except Exception:
     _HAS_EMOTIONS = False
@@ -29,16 +58,15 @@ except Exception:
 
 ROOT = os.path.dirname(os.path.dirname(__file__))
 CSV_PATH = os.path.join(ROOT, "outputs", "clean_csv.csv")
-REVIEWS_JSONL = os.path.join(ROOT, "outputs", "dashboard_reviews.jsonl")
 SUMMARY_JSON = os.path.join(ROOT, "outputs", "dashboard_summary.json")
 
+# Above this many reviews, emotion clustering switches to the streaming path
+STREAMING_MIN_ROWS = int(os.getenv("PRECOMPUTE_STREAMING_MIN_ROWS", "50000"))
 
-def _load_df() -> pd.DataFrame:
-    if not os.path.exists(CSV_PATH):
-        raise FileNotFoundError(f"CSV file not found: {CSV_PATH}")
-    df = pd.read_csv(CSV_PATH)
-    # Normalize columns we need
-    need = [c for c in ["Review Text", "Rating", "Department Name"] if c in df.columns]
+
+def prepare_reviews(df: pd.DataFrame) -> pd.DataFrame:
+    """Select and normalize the columns the dashboard needs from the raw CSV frame."""
+    need = [c for c in ["Review Text", "Rating", "Department Name", "Class Name", "Age"] if c in df.columns]
     d = df[need].copy().reset_index(drop=True)
     # Ensure required columns exist even if missing in CSV
     if "Review Text" not in d.columns:
@@ -47,23 +75,114 @@ def _load_df() -> pd.DataFrame:
         d["Rating"] = 0
     if "Department Name" not in d.columns:
         d["Department Name"] = "Unknown"
+    if "Class Name" not in d.columns:
+        d["Class Name"] = "Unknown"
+    if "Age" not in d.columns:
+        d["Age"] = 0
 
     d["Rating"] = pd.to_numeric(d["Rating"], errors="coerce").fillna(0).astype(float)
     # Avoid chained-assignment warnings: assign the filled series back
     d.loc[:, "Review Text"] = d["Review Text"].fillna("")
     d.loc[:, "Department Name"] = d["Department Name"].fillna("Unknown")
+    d.loc[:, "Class Name"] = d["Class Name"].fillna("Unknown")
+    d["Age"] = pd.to_numeric(d["Age"], errors="coerce").fillna(0).astype(float)
     return d
 
 
-def _compute_signals(d: pd.DataFrame) -> pd.DataFrame:
+# Source fields that determine a row's cached signals
+HASH_FIELDS = ["Review Text", "Rating", "Department Name", "Class Name", "Age"]
+
+
+def row_hashes(d: pd.DataFrame) -> np.ndarray:
+    """uint64 content hash per prepared row; equal rows hash equal."""
+    cols = [d[c].astype(str).tolist() for c in HASH_FIELDS]
+    out = np.empty(len(d), dtype=np.uint64)
+    for i, fields in enumerate(zip(*cols)):
+        digest = hashlib.blake2b("\x1f".join(fields).encode("utf-8"), digest_size=8).digest()
+        out[i] = int.from_bytes(digest, "little")
+    return out
+
+
+def _load_df() -> pd.DataFrame:
+    if not os.path.exists(CSV_PATH):
+        raise FileNotFoundError(f"CSV file not found: {CSV_PATH}")
+    return prepare_reviews(pd.read_csv(CSV_PATH))
+
+
+def _compute_emotions(texts: List[str], fit_centroids: bool) -> List[str]:
+    """Corpus emotion labels; optionally persist emotion/intent centroid models.
+
+    The texts are embedded once and the same matrix is used to fit both models.
+    """
+    X = embed_texts(texts)
+    emos, emotion_model = fit_emotion_centroids(X)
+    if fit_centroids:
+        try:
+            emotion_model.save()
+            _, intent_model = fit_intent_centroids(X)
+            intent_model.save()
+        except Exception as e:
+            print(f"Warning: failed to persist centroid models: {e}")
+    return emos
+
+
+def _compute_emotions_streaming(
+    texts: List[str],
+    fit_centroids: bool,
+    chunk_size: int = 2048,
+    spill_dir: Optional[str] = None,
+) -> List[str]:
+    """Same as _compute_emotions with bounded memory: chunked MiniBatchKMeans + disk spill."""
+    spill_dir = spill_dir or streaming_clusters.default_spill_dir()
+    centers, spill = streaming_clusters.fit_minibatch_centers(
+        texts,
+        {"emotion": len(EMOTIONS), "intent": len(INTENTS)},
+        chunk_size=chunk_size,
+        spill_dir=spill_dir,
+    )
+    try:
+        emotion_model = emotion_model_from_centers(centers["emotion"])
+        emos = streaming_clusters.predict_in_chunks(
+            emotion_model, streaming_clusters.iter_embeddings(texts, spill=spill, chunk_size=chunk_size)
+        )
+    finally:
+        if spill is not None:
+            spill.remove()
+    if fit_centroids:
+        try:
+            emotion_model.save()
+            intent_model_from_centers(centers["intent"]).save()
+        except Exception as e:
+            print(f"Warning: failed to persist centroid models: {e}")
+    return emos
+
+
+def compute_signals(
+    d: pd.DataFrame,
+    *,
+    fit_centroids: bool = True,
+    streaming: Optional[bool] = None,
+    chunk_size: int = 2048,
+    spill_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """Per-review sentiment/emotion frame for the dashboard.
+
+    streaming=None picks the streaming clustering path when len(d) > STREAMING_MIN_ROWS.
+    """
     # Sentiment via VADER
     s_scores = d["Review Text"].astype(str).apply(vader_sentiment_score)
     s_labels = s_scores.apply(vader_sentiment_label)
 
     # Emotions (optional)
-    if _HAS_EMOTIONS:
+    if streaming is None:
+        streaming = len(d) > STREAMING_MIN_ROWS
+    if _HAS_EMOTIONS and len(d):
+        texts = d["Review Text"].astype(str).tolist()
         try:
-            emos: List[str] = cluster_emotions(d["Review Text"].astype(str).tolist())
+            if streaming:
+                emos: List[str] = _compute_emotions_streaming(texts, fit_centroids, chunk_size, spill_dir)
+            else:
+                emos = _compute_emotions(texts, fit_centroids)
         except Exception:
             emos = ["neutral"] * len(d)
     else:
@@ -71,9 +190,12 @@ def _compute_signals(d: pd.DataFrame) -> pd.DataFrame:
 
     out = pd.DataFrame(
         {
+            "row_hash": row_hashes(d),
             "text": d["Review Text"].astype(str),
             "rating": d["Rating"].astype(float),
             "department": d["Department Name"].astype(str),
+            "class": d["Class Name"].astype(str),
+            "age": d["Age"].astype(float),
             "sentiment": s_labels.astype(str),
             "emotion": emos,
         }
@@ -81,51 +203,212 @@ def _compute_signals(d: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def _write_reviews_jsonl(dfp: pd.DataFrame) -> None:
-    with open(REVIEWS_JSONL, "w", encoding="utf-8") as f:
-        for rec in dfp.to_dict(orient="records"):
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+def _centroid_emotions(texts: List[str]) -> Optional[List[str]]:
+    """Emotions of `texts` from the persisted centroid model; None if there is no usable model.
+
+    Never clusters `texts` themselves: labels of a fresh clustering would not
+    match those of the cached rows. An embedding failure labels them "neutral",
+    as compute_signals does.
+    """
+    if not _HAS_EMOTIONS:
+        return ["neutral"] * len(texts)
+    model = signals.centroid_model("emotion")
+    if model is None:
+        return None
+    try:
+        X = embed_texts(texts)
+    except Exception:
+        return ["neutral"] * len(texts)
+    if X.shape[1] != model.dim:
+        return None
+    return model.predict(X)
+
+
+def compute_signals_incremental(d: pd.DataFrame, previous: ReviewStore) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """compute_signals for `d`, reusing the cached signals of rows `previous` already has.
+
+    Rows are matched by row_hash. Added or edited rows get VADER sentiment and
+    their emotion from the persisted centroid model; centroids are not refitted.
+    Returns the frame (in `d` order) and counts of reused / computed / deleted
+    rows with mode "incremental". If rows need an emotion and no centroid
+    model fits the active encoder, every row is recomputed (and the centroids
+    refitted) instead, reported as mode "full".
+    """
+    hashes = row_hashes(d)
+    prev_hashes = np.asarray(previous.codes("row_hash"))
+    uniq, first = np.unique(prev_hashes, return_index=True)
+    if len(uniq):
+        pos = np.minimum(np.searchsorted(uniq, hashes), len(uniq) - 1)
+        found = uniq[pos] == hashes
+        src = first[pos]
+    else:
+        # Empty previous cache: every row is fresh
+        found = np.zeros(len(d), dtype=bool)
+        src = np.zeros(len(d), dtype=np.int64)
+    deleted = int((~np.isin(prev_hashes, hashes)).sum())
 
+    sentiment = np.empty(len(d), dtype=object)
+    emotion = np.empty(len(d), dtype=object)
+    reuse = np.flatnonzero(found)
+    sentiment[reuse] = previous.take("sentiment", src[reuse])
+    emotion[reuse] = previous.take("emotion", src[reuse])
 
-def _write_summary(dfp: pd.DataFrame) -> None:
-    total_reviews = int(len(dfp))
-    avg_rating = float(dfp["rating"].mean()) if total_reviews else 0.0
-    promoters = int((dfp["rating"] >= 4).sum())
-    detractors = int((dfp["rating"] <= 2).sum())
-    nps = ((promoters - detractors) / total_reviews) * 100 if total_reviews else 0.0
-    positive_pct = float((dfp["sentiment"] == "positive").sum()) / total_reviews * 100 if total_reviews else 0.0
+    fresh = np.flatnonzero(~found)
+    if len(fresh):
+        texts = d["Review Text"].astype(str).iloc[fresh].tolist()
+        emos = _centroid_emotions(texts)
+        if emos is None:
+            print("No usable emotion centroid model for the new rows; recomputing all rows")
+            out = compute_signals(d)
+            return out, {"rows": int(len(d)), "reused": 0, "computed": int(len(d)), "deleted": deleted, "mode": "full"}
+        emotion[fresh] = emos
+        sentiment[fresh] = [vader_sentiment_label(vader_sentiment_score(t)) for t in texts]
 
-    dept_avg = (
-        dfp.groupby("department")["rating"].mean().reset_index().rename(columns={"department": "department", "rating": "averageRating"})
-        if total_reviews
-        else pd.DataFrame(columns=["department", "averageRating"])
+    out = pd.DataFrame(
+        {
+            "row_hash": hashes,
+            "text": d["Review Text"].astype(str),
+            "rating": d["Rating"].astype(float),
+            "department": d["Department Name"].astype(str),
+            "class": d["Class Name"].astype(str),
+            "age": d["Age"].astype(float),
+            "sentiment": sentiment.astype(str),
+            "emotion": emotion.astype(str),
+        }
     )
-    department_ratings = [
-        {"department": str(r["department"]), "averageRating": float(r["averageRating"])}
-        for _, r in dept_avg.iterrows()
-    ]
+    stats = {
+        "rows": int(len(d)),
+        "reused": int(len(reuse)),
+        "computed": int(len(fresh)),
+        "deleted": deleted,
+        "mode": "incremental",
+    }
+    return out, stats
+
+
+def _occurrences(hashes: np.ndarray) -> np.ndarray:
+    """0 for the first row with a given hash, 1 for the second, ... (input order)."""
+    order = np.argsort(hashes, kind="stable")
+    h = hashes[order]
+    n = len(h)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = h[1:] != h[:-1]
+    first = np.maximum.accumulate(np.where(starts, np.arange(n), 0)) if n else np.zeros(0, dtype=np.int64)
+    occ = np.empty(n, dtype=np.int64)
+    occ[order] = np.arange(n) - first
+    return occ
+
+
+def cache_delta(previous: ReviewStore, dfp: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(rows of `previous` not in `dfp`, rows of `dfp` not in `previous`) by row hash.
+
+    Hashes are matched as a multiset, so removing one of two identical reviews
+    removes one row. Only the cube dimensions of the removed rows are read.
+    """
+    old = np.asarray(previous.codes("row_hash"))
+    new = np.asarray(dfp["row_hash"], dtype=np.uint64)
+    old_keys = pd.MultiIndex.from_arrays([old, _occurrences(old)])
+    new_keys = pd.MultiIndex.from_arrays([new, _occurrences(new)])
+    gone = np.flatnonzero(~old_keys.isin(new_keys))
+    came = np.flatnonzero(~new_keys.isin(old_keys))
+    removed = pd.DataFrame({c: previous.take(c, gone) for c in ("rating", "department", "class", "age", "sentiment", "emotion")})
+    return removed, dfp.iloc[came]
+
+
+def load_previous_cube(path: str = CUBE_PATH) -> Optional[AggregateCube]:
+    try:
+        return AggregateCube.load(path) if os.path.exists(path) else None
+    except Exception as e:
+        print(f"Failed to load {path}: {e}")
+        return None
 
+
+def build_cube(
+    dfp: pd.DataFrame,
+    previous: Optional[ReviewStore] = None,
+    previous_cube: Optional[AggregateCube] = None,
+) -> Tuple[AggregateCube, str]:
+    """Aggregate cube of `dfp`, and whether it was "updated" from previous_cube or "rebuilt".
+
+    previous_cube is only updated when it aggregates exactly `previous` (same
+    generation); otherwise, or if the delta does not fit it, every row is binned.
+    """
+    if previous is not None and previous_cube is not None and previous_cube.generation == previous.generation:
+        try:
+            removed, added = cache_delta(previous, dfp)
+            return previous_cube.apply_delta(removed, added), "updated"
+        except ValueError as e:
+            print(f"Aggregate cube does not match the reviews cache ({e}); rebuilding it")
+    return AggregateCube.from_frame(dfp), "rebuilt"
+
+
+def load_previous(path: str = REVIEWS_DIR) -> Optional[ReviewStore]:
+    """Existing reviews cache usable for an incremental refresh (has row hashes), or None."""
+    store = review_store.load_or_none(path)
+    if store is None or "row_hash" not in store.meta["columns"]:
+        return None
+    return store
+
+
+def write_reviews(dfp: pd.DataFrame, path: str = REVIEWS_DIR) -> str:
+    """Write the reviews cache; returns its new generation."""
+    return str(review_store.write(dfp, path)["generation"])
+
+
+def write_summary(cube: AggregateCube, path: str = SUMMARY_JSON) -> None:
+    totals = cube.aggregate()
     summary: Dict[str, Any] = {
         "generated_at": datetime.utcnow().isoformat() + "Z",
         "source_csv": os.path.relpath(CSV_PATH, ROOT),
-        "total_reviews": total_reviews,
-        "average_rating": avg_rating,
-        "nps": nps,
-        "positive_sentiment_pct": positive_pct,
-        "department_ratings": department_ratings,
+        **{k: totals[k] for k in ("total_reviews", "average_rating", "nps", "positive_sentiment_pct", "department_ratings")},
     }
 
-    with open(SUMMARY_JSON, "w", encoding="utf-8") as f:
+    with open(path, "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
 
-def main() -> int:
+def write_cube(cube: AggregateCube, path: str = CUBE_PATH) -> None:
+    cube.save(path)
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Precompute dashboard caches from outputs/clean_csv.csv")
+    p.add_argument("--incremental", action="store_true", help="Only score rows that are new or changed since the existing cache")
+    p.add_argument("--streaming", action="store_true", help="Force chunked MiniBatchKMeans clustering with disk spill")
+    p.add_argument("--chunk-size", type=int, default=2048, help="Texts embedded per chunk in streaming mode")
+    p.add_argument("--spill-dir", default=None, help="Directory for spilled embeddings (default: system temp)")
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
     d = _load_df()
-    dfp = _compute_signals(d)
-    os.makedirs(os.path.dirname(REVIEWS_JSONL), exist_ok=True)
-    _write_reviews_jsonl(dfp)
-    _write_summary(dfp)
-    print(f"Wrote {REVIEWS_JSONL} and {SUMMARY_JSON}")
+    previous = load_previous() if args.incremental else None
+    previous_cube = load_previous_cube() if previous is not None else None
+    if previous is not None:
+        dfp, stats = compute_signals_incremental(d, previous)
+    else:
+        if args.incremental:
+            print("No reusable reviews cache found; computing all rows")
+        dfp = compute_signals(
+            d,
+            streaming=True if args.streaming else None,
+            chunk_size=args.chunk_size,
+            spill_dir=args.spill_dir,
+        )
+    if previous is not None:
+        if stats["mode"] != "incremental":
+            previous = None  # all rows were rescored; the cached aggregates no longer apply
+        cube, how = build_cube(dfp, previous, previous_cube)
+        print(f"Incremental refresh: {stats}, cube {how}")
+    else:
+        cube, _ = build_cube(dfp)
+    # Release the old mapping before the write replaces its files
+    del previous
+    cube.generation = write_reviews(dfp)
+    write_summary(cube)
+    write_cube(cube)
+    print(f"Wrote {REVIEWS_DIR}, {SUMMARY_JSON} and {CUBE_PATH}")
     return 0
 
 
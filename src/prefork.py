@@ -0,0 +1,237 @@
+"""
+Preload-then-fork serving: several uvicorn workers sharing one copy of the read-only state.
+
+`uvicorn --workers N` starts N fresh interpreters, each loading its own copy of
+the embedding model, the RAG index and the dashboard caches. serve() loads that
+state once in the parent (`preload`) and then forks the workers, which inherit
+it copy-on-write. Pages stay shared as long as nobody writes them:
+
+  - model weights are loaded before forking and only read afterwards;
+  - the reviews cache, the native FAISS vectors and their metadata are
+    memory-mapped files, shared through the page cache in any case;
+  - gc.freeze() before forking moves every object allocated so far out of the
+    collector's reach, so collections in a worker don't touch (and so copy)
+    the inherited heap.
+
+Nothing that owns threads may be created before forking (threads don't survive
+fork, and OpenMP / onnxruntime pools left behind deadlock the child), so
+`preload` must not start threads, open network clients or run inference. Work
+that needs inference can go through run_forked(), which runs it in a
+throwaway child.
+
+Each worker runs `post_fork(index)`, then a uvicorn Server on the listening
+socket bound by the parent. The parent only supervises: it restarts workers
+that exit, forwards SIGTERM / SIGINT, and prints a memory report per process
+(RSS, PSS, USS; see process_memory.py) MEMORY_REPORT_SECONDS after start and on
+SIGUSR1.
+
+POSIX only; where os.fork is missing serve() runs the app in this process.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from . import process_memory  # type: ignore
+except Exception:
+    import process_memory  # type: ignore
+
+
+# Seconds after start for the parent's memory report (0 = only on SIGUSR1)
+MEMORY_REPORT_SECONDS = float(os.getenv("MEMORY_REPORT_SECONDS", "30"))
+# Seconds workers get to finish in-flight requests on shutdown before SIGKILL
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# A worker exiting sooner than this after its start counts as a crash; after
+# MAX_QUICK_EXITS of them in a row the server shuts down instead of respawning
+_QUICK_EXIT_SECONDS = 5.0
+_MAX_QUICK_EXITS = 5
+
+
+def can_fork() -> bool:
+    return hasattr(os, "fork")
+
+
+def default_threads(workers: int) -> int:
+    """Intra-op threads per worker so that all workers together use each core once."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def run_forked(fn: Callable[[], Any]) -> int:
+    """Run `fn` in a forked child and wait for it; returns the child's exit code (0 = success).
+
+    For one-off work before serving that would otherwise leave thread pools
+    (torch / OpenMP, onnxruntime) behind in the parent.
+    """
+    if not can_fork():
+        fn()
+        return 0
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            fn()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(index: int, app: Any, sock: socket.socket, post_fork: Optional[Callable[[int], None]], log_level: str) -> None:
+    code = 0
+    try:
+        # The parent's handlers don't apply here; uvicorn installs its own for SIGTERM / SIGINT
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        if post_fork is not None:
+            post_fork(index)
+        import uvicorn
+
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def serve(
+    app: Any,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 1,
+    preload: Optional[Callable[[], Any]] = None,
+    post_fork: Optional[Callable[[int], None]] = None,
+    log_level: str = "info",
+) -> int:
+    """Preload, fork `workers` uvicorn workers on host:port and supervise them; returns an exit code."""
+    if not can_fork():
+        print("[prefork] os.fork is not available on this platform; serving from a single process")
+        if preload is not None:
+            preload()
+        if post_fork is not None:
+            post_fork(0)
+        import uvicorn
+
+        uvicorn.run(app, host=host, port=port, log_level=log_level)
+        return 0
+
+    sock = _bind(host, port)
+    t0 = time.perf_counter()
+    if preload is not None:
+        preload()
+    others = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+    if others:
+        print(f"[prefork] Warning: threads still running before fork ({', '.join(others)}); they will not exist in the workers")
+    gc.collect()
+    gc.freeze()
+    print(f"[prefork] Preloaded in {time.perf_counter() - t0:.2f}s; starting {workers} workers on {host}:{port}")
+
+    pids: Dict[int, int] = {}  # pid -> worker index
+    started: Dict[int, float] = {}  # worker index -> start time
+    flags = {"stop": False, "report": False}
+
+    def _spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(index, app, sock, post_fork, log_level)
+        pids[pid] = index
+        started[index] = time.monotonic()
+        print(f"[prefork] Worker {index} started (pid {pid})")
+
+    def _report() -> None:
+        ordered = [pid for pid, _ in sorted(pids.items(), key=lambda kv: kv[1])]
+        print("[prefork] Memory per process:\n" + process_memory.format_report(process_memory.group_report(os.getpid(), ordered)))
+
+    def _on_stop(signum: int, frame: Any) -> None:
+        flags["stop"] = True
+
+    def _on_report(signum: int, frame: Any) -> None:
+        flags["report"] = True
+
+    signal.signal(signal.SIGTERM, _on_stop)
+    signal.signal(signal.SIGINT, _on_stop)
+    signal.signal(signal.SIGUSR1, _on_report)
+
+    for index in range(workers):
+        _spawn(index)
+    report_at = time.monotonic() + MEMORY_REPORT_SECONDS if MEMORY_REPORT_SECONDS > 0 else None
+    quick_exits = 0
+    exit_code = 0
+
+    while not flags["stop"]:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        if pid and pid in pids:
+            index = pids.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            lived = time.monotonic() - started[index]
+            print(f"[prefork] Worker {index} (pid {pid}) exited with {code} after {lived:.1f}s")
+            quick_exits = quick_exits + 1 if lived < _QUICK_EXIT_SECONDS else 0
+            if quick_exits >= _MAX_QUICK_EXITS:
+                print("[prefork] Workers keep exiting at startup; shutting down")
+                exit_code = 1
+                break
+            _spawn(index)
+            continue
+        if flags["report"] or (report_at is not None and time.monotonic() >= report_at):
+            flags["report"] = False
+            report_at = None
+            _report()
+        time.sleep(0.2)
+
+    print(f"[prefork] Stopping {len(pids)} workers")
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT
+    while pids and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            pids.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in pids:
+        print(f"[prefork] Worker pid {pid} did not stop in {GRACEFUL_TIMEOUT:.0f}s; killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+    sock.close()
+    print("[prefork] Stopped")
+    return exit_code
@@ -0,0 +1,124 @@
+"""
+Per-process memory accounting for forked workers (Linux).
+
+RSS counts every resident page a process maps, so N workers that share model
+weights and memory-mapped caches with their parent each report the full size.
+What a worker actually costs is its USS (unique set size: pages mapped by it
+alone, Private_Clean + Private_Dirty) and its PSS (proportional share: each
+shared page divided by the number of processes mapping it). Summing PSS over the
+parent and its workers gives the real footprint of the whole group.
+
+Values come from /proc/<pid>/smaps_rollup (kernel 4.14+), or /proc/<pid>/smaps
+on older kernels. Elsewhere only RSS is known (ru_maxrss of this process).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+# smaps fields (kB) -> report keys
+_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+    "Swap": "swap",
+}
+
+
+def _read_smaps(pid: int) -> Optional[Dict[str, int]]:
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            with open(f"/proc/{pid}/{name}", "r") as fh:
+                lines = fh.readlines()
+        except OSError:
+            continue
+        totals = {key: 0 for key in _FIELDS.values()}
+        for line in lines:
+            field, _, rest = line.partition(":")
+            key = _FIELDS.get(field)
+            if key is not None:
+                totals[key] += int(rest.split()[0]) * 1024
+        return totals
+    return None
+
+
+def memory_usage(pid: Optional[int] = None) -> Dict[str, Optional[int]]:
+    """RSS / PSS / USS / shared bytes of `pid` (default: this process); None where unknown."""
+    pid = os.getpid() if pid is None else int(pid)
+    totals = _read_smaps(pid)
+    if totals is None:
+        rss: Optional[int] = None
+        if pid == os.getpid():
+            try:
+                import resource
+
+                # ru_maxrss is KiB on Linux, bytes on macOS; a peak value either way
+                rss = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+            except Exception:
+                pass
+        return {"pid": pid, "rss": rss, "pss": None, "uss": None, "shared": None, "swap": None}
+    return {
+        "pid": pid,
+        "rss": totals["rss"],
+        "pss": totals["pss"],
+        "uss": totals["private_clean"] + totals["private_dirty"],
+        "shared": totals["shared_clean"] + totals["shared_dirty"],
+        "swap": totals["swap"],
+    }
+
+
+def child_pids(pid: Optional[int] = None) -> List[int]:
+    """Direct children of `pid` (default: this process), ascending."""
+    pid = os.getpid() if pid is None else int(pid)
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as fh:
+            return sorted(int(p) for p in fh.read().split())
+    except OSError:
+        pass
+    children = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as fh:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                ppid = int(fh.read().rpartition(")")[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def group_report(parent: int, workers: Sequence[int]) -> Dict[str, object]:
+    """Memory of a parent process and its workers (pids in worker order) plus group totals."""
+    rows = [dict(memory_usage(parent), role="parent")]
+    for index, pid in enumerate(workers):
+        rows.append(dict(memory_usage(pid), role=f"worker {index}"))
+
+    def _sum(key: str) -> Optional[int]:
+        values = [r[key] for r in rows]
+        return None if any(v is None for v in values) else int(sum(values))  # type: ignore[arg-type]
+
+    return {"processes": rows, "total_pss": _sum("pss"), "total_uss": _sum("uss"), "total_rss": _sum("rss")}
+
+
+def format_report(report: Dict[str, object]) -> str:
+    def _mb(value: Optional[int]) -> str:
+        return "-" if value is None else f"{value / 1e6:.1f}"
+
+    lines = [f"{'process':<10} {'pid':>7} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9} {'shared MB':>10}"]
+    for r in report["processes"]:  # type: ignore[union-attr]
+        lines.append(f"{r['role']:<10} {r['pid']:>7} {_mb(r['rss']):>9} {_mb(r['pss']):>9} {_mb(r['uss']):>9} {_mb(r['shared']):>10}")
+    lines.append(
+        f"{'total':<10} {'':>7} {_mb(report['total_rss']):>9} {_mb(report['total_pss']):>9} {_mb(report['total_uss']):>9}"  # type: ignore[arg-type]
+    )
+    return "\n".join(lines)
@@ -1,30 +1,103 @@
 import pandas as pd
 import os
-from typing import List, Dict, Any, Optional, TypedDict
+import importlib.util
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, TypedDict
 
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.embeddings import Embeddings
 from dotenv import load_dotenv
 load_dotenv()
 import time
 import json
 import numpy as np
-try:
-    import faiss
-    _HAS_FAISS = True
-except Exception:
-    faiss = None
-    _HAS_FAISS = False
-
-# LangGraph for decision routing
-try:
-    from langgraph.graph import StateGraph, START, END
-    _HAS_LANGGRAPH = True
-except Exception:
-    _HAS_LANGGRAPH = False
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+# faiss, langchain_community, the text splitter and LangGraph (decision routing)
+# are imported where they are used; only their availability is checked here
+_HAS_FAISS = importlib.util.find_spec("faiss") is not None
+_HAS_LANGGRAPH = importlib.util.find_spec("langgraph") is not None
+
+import llm_cache
+import llm_client
+import model_registry
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LLM_MODEL = "gemini-2.5-flash"
+LLM_TEMPERATURE = 0.2
+
+
+class SharedEmbeddings(Embeddings):
+    """LangChain embeddings backed by the process-wide model registry.
+
+    Behaves like HuggingFaceEmbeddings with default settings (newlines replaced,
+    no normalization) but reuses the same SentenceTransformer as emotions/intent.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        return model_registry.encode(texts, self.model_name, normalize=False).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are ad hoc; only the indexed chunks go to the on-disk store
+        return model_registry.encode([text.replace("\n", " ")], self.model_name, normalize=False, persist=False)[0].tolist()
+
+
+class NativeMetadata:
+    """Chunk records of a native index, memory-mapped instead of parsed.
+
+    json.load of metadata.json builds a dict per chunk in every process. The
+    records are instead kept serialized, one JSON object per chunk, in
+    metadata.records.bin with int64 offsets in metadata.offsets.bin; a search
+    decodes only the k hits, and forked workers share the mapped pages.
+    """
+
+    RECORDS = "metadata.records.bin"
+    OFFSETS = "metadata.offsets.bin"
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def write(cls, records: List[Dict[str, Any]], native_dir: str) -> None:
+        parts = [json.dumps(r, ensure_ascii=False).encode("utf-8") for r in records]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        for name, data in ((cls.RECORDS, b"".join(parts)), (cls.OFFSETS, offsets.tobytes())):
+            tmp = os.path.join(native_dir, name + ".tmp")
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, os.path.join(native_dir, name))
+
+    @classmethod
+    def load(cls, native_dir: str) -> "NativeMetadata":
+        """Map the records, converting metadata.json first when they are missing or older."""
+        meta_path = os.path.join(native_dir, "metadata.json")
+        records_path = os.path.join(native_dir, cls.RECORDS)
+        offsets_path = os.path.join(native_dir, cls.OFFSETS)
+        fresh = all(os.path.exists(p) for p in (records_path, offsets_path))
+        if fresh and os.path.exists(meta_path):
+            fresh = os.path.getmtime(offsets_path) >= os.path.getmtime(meta_path)
+        if not fresh:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                cls.write(json.load(fh), native_dir)
+        offsets = np.fromfile(offsets_path, dtype=np.int64)
+        size = int(offsets[-1]) if len(offsets) else 0
+        # np.memmap refuses zero-length files
+        blob = np.memmap(records_path, dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return json.loads(bytes(self._blob[self._offsets[i] : self._offsets[i + 1]]))
+
 
 class RAGbot:
     def __init__(self, df: pd.DataFrame, review_col: Optional[str] = None, k: int = 5, persist_path: Optional[str] = "faiss_index", chunk_size: int = 500, force_rebuild: bool = False):
@@ -93,6 +166,8 @@ class RAGbot:
         return obj_cols[0]
 
     def _create_chunks(self) -> List[Document]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=int(self.chunk_size * 0.1),
@@ -113,10 +188,12 @@ class RAGbot:
                 documents.append(Document(page_content=chunk, metadata=metadata))
         return documents
 
-    def _create_vectorstore(self) -> FAISS:
+    def _create_vectorstore(self) -> "FAISS":
+        from langchain_community.vectorstores import FAISS
+
         # reuse embeddings instance to avoid repeated model loads
         if self._embeddings is None:
-            self._embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            self._embeddings = SharedEmbeddings(EMBEDDING_MODEL)
 
         # If persisted index exists, try to load it (fast). Otherwise build and save.
         if self.persist_path and os.path.exists(self.persist_path):
@@ -150,7 +227,7 @@ class RAGbot:
             self.chunks = self._create_chunks()
 
         if self._embeddings is None:
-            self._embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            self._embeddings = SharedEmbeddings(EMBEDDING_MODEL)
 
         os.makedirs(native_dir, exist_ok=True)
 
@@ -191,6 +268,7 @@ class RAGbot:
         metadata_list = [{"page_content": d.page_content, "metadata": d.metadata} for d in self.chunks]
         with open(meta_path, "w", encoding="utf-8") as fh:
             json.dump(metadata_list, fh)
+        NativeMetadata.write(metadata_list, native_dir)
 
         print(f"Exported native FAISS index ({len(self.chunks)} docs) to {native_dir}")
 
@@ -209,22 +287,37 @@ class RAGbot:
             raise FileNotFoundError("native faiss index or metadata missing in " + native_dir)
 
         import faiss as _faiss
-        index = _faiss.read_index(faiss_path)
-        with open(meta_path, "r", encoding="utf-8") as fh:
-            metadata_list = json.load(fh)
+        # Map the vectors instead of reading them onto the heap where faiss
+        # supports it (flat indexes, IO_FLAG_MMAP_IFC in faiss >= 1.10)
+        index = None
+        mmap_flag = getattr(_faiss, "IO_FLAG_MMAP_IFC", None)
+        if mmap_flag is not None:
+            try:
+                index = _faiss.read_index(faiss_path, mmap_flag)
+            except RuntimeError:
+                index = None
+        if index is None:
+            index = _faiss.read_index(faiss_path)
 
         # keep in instance for retrieval
         self._native_index = index
-        self._native_metadata = metadata_list
+        self._native_metadata = NativeMetadata.load(native_dir)
         # embeddings needed to convert queries
         if self._embeddings is None:
-            self._embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            self._embeddings = SharedEmbeddings(EMBEDDING_MODEL)
 
-    def _initialize_gemini_llm(self) -> ChatGoogleGenerativeAI:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set.")
-        return ChatGoogleGenerativeAI(google_api_key=api_key, model="gemini-2.5-flash", temperature=0.2)
+    def _initialize_gemini_llm(self):
+        if self.llm is None:
+            self.llm = llm_client.get_chat_model(LLM_MODEL, LLM_TEMPERATURE)
+        return self.llm
+
+    def _invoke_llm(self, prompt: str) -> str:
+        """LLM response text, served from the shared response cache when possible."""
+        def _call() -> str:
+            self._initialize_gemini_llm()
+            return llm_client.invoke_chat(prompt, model=LLM_MODEL, temperature=LLM_TEMPERATURE)
+
+        return llm_cache.cached_call(LLM_MODEL, {"temperature": LLM_TEMPERATURE}, prompt, _call)
 
     def _build_prompt(self, question: str, docs: List[Document]) -> str:
         context_blocks = []
@@ -263,12 +356,12 @@ class RAGbot:
                 "- YES if the user asks to show examples, IDs, specific rows/records, cite evidence, or wants to inspect data.\n"
                 "- NO if a high-level summary is sufficient and no explicit request for examples or IDs.\n"
             )
-            llm = self.llm or self._initialize_gemini_llm()
-            out = llm.invoke(prompt)
-            text = getattr(out, "content", str(out)).strip().lower()
+            text = self._invoke_llm(prompt).lower()
             return text.startswith("y")
 
         if _HAS_LANGGRAPH:
+            from langgraph.graph import StateGraph, START, END
+
             class_state = self._State
             graph = StateGraph(class_state)
 
@@ -295,7 +388,7 @@ class RAGbot:
         if getattr(self, "_native_index", None) is not None:
             # ensure embeddings available
             if self._embeddings is None:
-                self._embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+                self._embeddings = SharedEmbeddings(EMBEDDING_MODEL)
             # compute query embedding
             q_emb = np.array(self._embeddings.embed_query(query), dtype='float32')
             import faiss as _faiss
@@ -317,9 +410,7 @@ class RAGbot:
 
             docs = self.retriever.invoke(query)
         prompt = self._build_prompt(query, docs)
-        llm = self.llm or self._initialize_gemini_llm()
-        resp = llm.invoke(prompt)
-        raw = getattr(resp, "content", str(resp)).strip()
+        raw = self._invoke_llm(prompt)
 
         # Parse final flag line 'INCLUDE_SOURCES: YES' or NO
         include_sources = False
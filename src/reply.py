@@ -1,14 +1,15 @@
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 load_dotenv()
 
+import llm_cache
+import llm_client
+
+MODEL = "gemini-2.5-flash"
+TEMPERATURE = 0.4
+
 class ReplyGenerator:
 	def __init__(self):
-		api_key = os.getenv("GEMINI_API_KEY")
-		if not api_key:
-			raise ValueError("GEMINI_API_KEY environment variable not set.")
-		self.llm = ChatGoogleGenerativeAI(google_api_key=api_key, model="gemini-2.5-flash", temperature=0.4)
+		self.llm = llm_client.get_chat_model(MODEL, TEMPERATURE)
 
 	def generate_reply(self, feedback: str) -> str:
 		prompt = (
@@ -16,8 +17,10 @@ class ReplyGenerator:
 			"If the feedback is positive, thank the customer. If it is negative, apologize and offer help.\n\n"
 			f"Customer feedback: {feedback}\n\nReply:"
 		)
-		resp = self.llm.invoke(prompt)
-		return getattr(resp, "content", str(resp)).strip()
+		return llm_cache.cached_call(MODEL, {"temperature": TEMPERATURE}, prompt, lambda: self._invoke(prompt))
+
+	def _invoke(self, prompt: str) -> str:
+		return llm_client.invoke_chat(prompt, model=MODEL, temperature=TEMPERATURE)
 
 if __name__ == "__main__":
 	rg = ReplyGenerator()
@@ -0,0 +1,134 @@
+"""
+Bounded in-process cache of serialized GET responses, keyed by dataset version.
+
+Dashboard responses only change when the precomputed dataset does, so the
+server stamps every published dataset with a version (the reviews cache
+generation) and keeps the rendered JSON bytes per (path, query parameters).
+Entries carry a strong ETag derived from the version and the body, which lets
+clients revalidate with If-None-Match and get a 304 without a body.
+
+Compressed variants (gzip / br) are produced on first request for that
+coding and kept on the entry, each with its own ETag.
+
+Publishing a new dataset clears the cache; entries of another version are
+never served. Eviction is LRU, bounded by entry count and total bytes
+(identity body plus compressed variants).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional
+
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+@dataclass
+class CachedResponse:
+    version: str
+    etag: str
+    body: bytes
+    variants: Dict[str, bytes] = field(default_factory=dict)  # content coding -> compressed body
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if not encoding else f'{self.etag[:-1]}-{encoding}"'
+
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+
+def make_etag(version: str, body: bytes) -> str:
+    digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == bare:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, version: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(version=version, etag=make_etag(version, body), body=body)
+        if self.max_entries == 0 or len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size()
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size()
+        return entry
+
+    def add_variant(self, entry: CachedResponse, encoding: str, data: bytes) -> None:
+        """Attach a compressed body to `entry` (accounted only while the entry is cached)."""
+        with self._lock:
+            if encoding in entry.variants:
+                return
+            entry.variants[encoding] = data
+            if any(e is entry for e in self._entries.values()):
+                self._bytes += len(data)
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
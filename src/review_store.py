@@ -0,0 +1,279 @@
+"""
+Columnar, memory-mapped cache of the precomputed dashboard reviews.
+
+Replaces outputs/dashboard_reviews.jsonl. Each column is a raw binary file in
+outputs/dashboard_reviews/ that the server memory-maps at startup, so loading
+the cache parses nothing and pages are only read when a request touches them:
+
+  meta.json                 {"version", "generation", "rows", "columns": {...}}
+  <gen>.text.bin            UTF-8 bytes of all review texts, concatenated
+  <gen>.text_offsets.bin    int64, rows + 1 offsets into text.bin
+  <gen>.row_hash.bin        uint64 content hash of the source row (incremental refresh)
+  <gen>.rating.bin          float32 (same for age)
+  <gen>.department.bin      int32 codes into meta["columns"]["department"]["labels"]
+                            (same for class, sentiment, emotion)
+
+A write puts a new generation of column files next to the old one and then
+swaps meta.json in one os.replace, so a process that already mapped the
+previous generation keeps reading consistent data. Old generations are
+deleted afterwards where the OS allows it (files still mapped on Windows are
+left for the next write). Writes hold an exclusive lock on write.lock (POSIX),
+so workers refreshing at the same time publish one after the other.
+
+A whole refresh (scoring rows and writing the cache files) runs under
+refresh.lock: the first process to take it refreshes, the others see
+refresh_in_progress() and map the result once it is published.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+REVIEWS_DIR = os.path.join(ROOT, "outputs", "dashboard_reviews")
+FORMAT_VERSION = 1
+# How long refresh_lock() retries before deciding another process is refreshing
+# (refresh_in_progress() probes hold the lock only for an instant)
+_ELECTION_SECONDS = 0.5
+
+# Column name -> storage; "dict" columns hold int32 codes plus a label table
+COLUMNS: Dict[str, Dict[str, str]] = {
+    "row_hash": {"kind": "numeric", "dtype": "uint64"},
+    "rating": {"kind": "numeric", "dtype": "float32"},
+    "department": {"kind": "dict", "dtype": "int32"},
+    "class": {"kind": "dict", "dtype": "int32"},
+    "age": {"kind": "numeric", "dtype": "float32"},
+    "sentiment": {"kind": "dict", "dtype": "int32"},
+    "emotion": {"kind": "dict", "dtype": "int32"},
+}
+DEFAULTS: Dict[str, Any] = {
+    "row_hash": 0,
+    "rating": 0.0,
+    "department": "Unknown",
+    "class": "Unknown",
+    "age": 0.0,
+    "sentiment": "neutral",
+    "emotion": "neutral",
+}
+
+
+def _map(path: str, dtype: str, count: int) -> np.ndarray:
+    # np.memmap refuses zero-length files
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class ReviewStore:
+    """Read-only view over one generation of the columnar reviews cache."""
+
+    def __init__(self, path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.meta = meta
+        self.rows = int(meta["rows"])
+        self._arrays = arrays
+        self._labels: Dict[str, np.ndarray] = {
+            name: np.asarray(spec["labels"], dtype=object)
+            for name, spec in meta["columns"].items()
+            if spec["kind"] == "dict"
+        }
+
+    @classmethod
+    def load(cls, path: str = REVIEWS_DIR) -> "ReviewStore":
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if int(meta.get("version", 0)) != FORMAT_VERSION:
+            raise ValueError(f"unsupported reviews cache version {meta.get('version')}")
+        gen, rows = meta["generation"], int(meta["rows"])
+        arrays = {
+            "text_offsets": _map(os.path.join(path, f"{gen}.text_offsets.bin"), "int64", rows + 1),
+            "text": _map(os.path.join(path, f"{gen}.text.bin"), "uint8", int(meta["text_bytes"])),
+        }
+        for name, spec in meta["columns"].items():
+            arrays[name] = _map(os.path.join(path, f"{gen}.{name}.bin"), spec["dtype"], rows)
+        return cls(path, meta, arrays)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def generation(self) -> str:
+        """Identifies this version of the cache; changes on every write."""
+        return str(self.meta.get("generation", ""))
+
+    @property
+    def columns(self) -> List[str]:
+        return ["text"] + list(self.meta["columns"])
+
+    def labels(self, name: str) -> List[str]:
+        return list(self._labels[name])
+
+    def codes(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def texts(self, positions: Sequence[int]) -> List[str]:
+        offsets, blob = self._arrays["text_offsets"], self._arrays["text"]
+        return [bytes(blob[offsets[i] : offsets[i + 1]]).decode("utf-8") for i in positions]
+
+    def take(self, name: str, positions: Sequence[int]) -> List[Any]:
+        """Python values of one column at the given row positions."""
+        if name == "text":
+            return self.texts(positions)
+        values = self._arrays[name][np.asarray(positions, dtype=np.int64)]
+        if name in self._labels:
+            return self._labels[name][values].tolist()
+        return values.tolist()
+
+    def frame(self, include_text: bool = False) -> pd.DataFrame:
+        """Columns as a DataFrame; dictionary columns become Categoricals over the mapped codes."""
+        data: Dict[str, Any] = {}
+        if include_text:
+            data["text"] = self.texts(range(self.rows))
+        for name in self.meta["columns"]:
+            if name in self._labels:
+                data[name] = pd.Categorical.from_codes(np.asarray(self._arrays[name]), categories=self._labels[name])
+            else:
+                data[name] = np.asarray(self._arrays[name])
+        return pd.DataFrame(data)
+
+    def nbytes(self) -> int:
+        return int(sum(a.nbytes for a in self._arrays.values()))
+
+
+def write(dfp: pd.DataFrame, path: str = REVIEWS_DIR) -> Dict[str, Any]:
+    """Write a precomputed reviews frame as a new generation and publish it; returns meta."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "write.lock"), "a+") as lock_fh:
+        if fcntl is not None:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+        try:
+            return _write(dfp, path)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+
+def _write(dfp: pd.DataFrame, path: str) -> Dict[str, Any]:
+    rows = int(len(dfp))
+    gen = f"{time.time_ns():x}"
+
+    def _col(name: str) -> pd.Series:
+        if name in dfp.columns:
+            return dfp[name]
+        return pd.Series([DEFAULTS.get(name, "")] * rows, index=dfp.index)
+
+    def _dump(name: str, arr: np.ndarray) -> None:
+        with open(os.path.join(path, f"{gen}.{name}.bin"), "wb") as fh:
+            fh.write(np.ascontiguousarray(arr).tobytes())
+
+    encoded = [t.encode("utf-8") for t in _col("text").fillna("").astype(str)]
+    offsets = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    _dump("text", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    _dump("text_offsets", offsets)
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for name, spec in COLUMNS.items():
+        col = _col(name)
+        if spec["kind"] == "dict":
+            cat = pd.Categorical(col.fillna(DEFAULTS[name]).astype(str))
+            _dump(name, cat.codes.astype(spec["dtype"]))
+            columns[name] = {**spec, "labels": [str(c) for c in cat.categories]}
+        else:
+            values = pd.to_numeric(col, errors="coerce").fillna(DEFAULTS[name])
+            _dump(name, values.to_numpy(dtype=spec["dtype"]))
+            columns[name] = dict(spec)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "generation": gen,
+        "rows": rows,
+        "text_bytes": int(offsets[-1]),
+        "columns": columns,
+    }
+    meta_path = os.path.join(path, "meta.json")
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+    os.replace(tmp, meta_path)
+    _remove_stale(path, gen)
+    return meta
+
+
+def _remove_stale(path: str, keep: str) -> None:
+    for name in os.listdir(path):
+        if name.endswith(".bin") and not name.startswith(keep + "."):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass  # still mapped by a reader (Windows); retried on the next write
+
+
+@contextlib.contextmanager
+def refresh_lock(path: str = REVIEWS_DIR) -> Iterator[bool]:
+    """Hold refresh.lock unless another process does; yields whether this one got it."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "refresh.lock"), "a+") as lock_fh:
+        if fcntl is None:
+            yield True
+            return
+        deadline = time.monotonic() + _ELECTION_SECONDS
+        while True:
+            try:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.05)
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+
+def refresh_in_progress(path: str = REVIEWS_DIR) -> bool:
+    """True while a process (this one included) holds refresh.lock."""
+    lock_path = os.path.join(path, "refresh.lock")
+    if fcntl is None or not os.path.exists(lock_path):
+        return False
+    with open(lock_path, "a+") as lock_fh:
+        try:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+def exists(path: str = REVIEWS_DIR) -> bool:
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+def mtime(path: str = REVIEWS_DIR) -> float:
+    try:
+        return os.path.getmtime(os.path.join(path, "meta.json"))
+    except OSError:
+        return 0.0
+
+
+def load_or_none(path: str = REVIEWS_DIR) -> Optional[ReviewStore]:
+    try:
+        return ReviewStore.load(path) if exists(path) else None
+    except Exception as e:
+        print(f"[reviews] Failed to load {path}: {e}")
+        return None
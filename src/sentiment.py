@@ -1,16 +1,55 @@
+import os
+import threading
+from typing import TYPE_CHECKING, List
+
 import pandas as pd
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 
-# Ensure VADER lexicon is downloaded
-try:
-	nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-	nltk.download('vader_lexicon')
+if TYPE_CHECKING:
+	from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+# The VADER lexicon is read from local nltk data only: the copy committed in
+# data/nltk_data (python scripts/fetch_vader_lexicon.py replaces it with nltk's
+# download), then $NLTK_DATA and nltk's default locations. Nothing is downloaded at run time. nltk itself
+# (over a second of imports, most of it scipy.stats) is only imported when the
+# analyzer is first built.
+ROOT = os.path.dirname(os.path.dirname(__file__))
+VENDORED_NLTK_DATA = os.path.join(ROOT, "data", "nltk_data")
+LEXICON_RESOURCE = 'sentiment/vader_lexicon.zip'
+
+_ANALYZER = None
+_ANALYZER_LOCK = threading.Lock()
+
+def _get_analyzer() -> "SentimentIntensityAnalyzer":
+	# Building the analyzer parses the whole lexicon; do it once per process
+	global _ANALYZER
+	if _ANALYZER is None:
+		with _ANALYZER_LOCK:
+			if _ANALYZER is None:
+				import nltk
+				from nltk.sentiment.vader import SentimentIntensityAnalyzer
+				if VENDORED_NLTK_DATA not in nltk.data.path:
+					nltk.data.path.insert(0, VENDORED_NLTK_DATA)
+				try:
+					nltk.data.find(LEXICON_RESOURCE)
+				except LookupError:
+					raise LookupError(
+						"VADER lexicon not found. Run `python scripts/fetch_vader_lexicon.py` once "
+						"(writes data/nltk_data) or point NLTK_DATA at a directory containing "
+						f"{LEXICON_RESOURCE}"
+					) from None
+				_ANALYZER = SentimentIntensityAnalyzer()
+	return _ANALYZER
+
+def warmup() -> None:
+	"""Import nltk and parse the lexicon now rather than on the first request."""
+	_get_analyzer()
 
 def vader_sentiment_score(text: str) -> float:
-	analyzer = SentimentIntensityAnalyzer()
-	return analyzer.polarity_scores(text)['compound']
+	return _get_analyzer().polarity_scores(text)['compound']
+
+def vader_sentiment_scores(texts: List[str]) -> List[float]:
+	analyzer = _get_analyzer()
+	return [analyzer.polarity_scores(str(t))['compound'] for t in texts]
 
 def vader_sentiment_label(compound: float) -> str:
 	if compound >= 0.2:
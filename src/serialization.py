@@ -0,0 +1,129 @@
+"""
+Fast JSON serialization and response compression for large responses.
+
+- dumps(): orjson when installed (optional dependency), stdlib json otherwise;
+  both emit compact UTF-8 with the same key order as FastAPI's JSONResponse.
+- ReviewFragments: every review of a ReviewStore serialized once, when the
+  cache is published, into one bytes blob plus offsets. A response with N
+  sampled reviews is then a join of N slices instead of building N dicts and
+  encoding them per request.
+- negotiate_encoding() / compress(): br (when the optional brotli package is
+  installed) or gzip, chosen from the request's Accept-Encoding.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional
+    orjson = None  # type: ignore
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional
+    brotli = None  # type: ignore
+
+
+HAS_ORJSON = orjson is not None
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def splice(head: Dict[str, Any], key: str, items: bytes, tail: Optional[Dict[str, Any]] = None) -> bytes:
+    """dumps({**head, key: <items>, **tail}) where `items` is an already serialized JSON array body."""
+    parts = [dumps(head)[:-1]]
+    if head:
+        parts.append(b",")
+    parts += [dumps(key), b":[", items, b"]"]
+    if tail:
+        parts += [b",", dumps(tail)[1:]]
+    else:
+        parts.append(b"}")
+    return b"".join(parts)
+
+
+class ReviewFragments:
+    """Pre-serialized JSON object per review row, in store order."""
+
+    def __init__(self, blob: bytes, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, store: Any, fields: Sequence[str]) -> "ReviewFragments":
+        rows = range(len(store))
+        columns = [store.take(f, rows) for f in fields]
+        parts = [dumps(dict(zip(fields, row))) for row in zip(*columns)]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        return cls(b"".join(parts), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def join(self, positions: Sequence[int], with_ids: bool = False) -> bytes:
+        """Comma-joined objects for the rows at `positions` (optionally prefixed with "id")."""
+        blob, offsets = self.blob, self.offsets
+        if with_ids:
+            return b",".join(
+                b'{"id":%d,%s' % (i, blob[offsets[i] + 1 : offsets[i + 1]]) for i in (int(p) for p in positions)
+            )
+        return b",".join(blob[offsets[i] : offsets[i + 1]] for i in (int(p) for p in positions))
+
+    def nbytes(self) -> int:
+        return len(self.blob) + int(self.offsets.nbytes)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported content coding ("br" or "gzip") from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[name.strip().lower()] = q
+    supported: List[str] = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for enc in supported:
+        q = qualities.get(enc, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"unsupported content coding {encoding}")
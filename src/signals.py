@@ -0,0 +1,92 @@
+"""
+Combined emotion + intent stage that embeds each text only once.
+
+emotions.cluster_emotions and intent.cluster_intents each embed their input with
+the same MiniLM model. When both labels are needed for the same texts (the
+orchestrator, the dashboard precompute) this module embeds once and classifies
+emotion and intent from the same vectors. Prompt embeddings come from the
+on-disk cache in model_registry, so they are not re-encoded per call either.
+
+When corpus centroid models exist (fit by precompute_dashboard, see
+centroids.py) texts are labelled by nearest corpus centroid; otherwise the
+input batch itself is clustered as before.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from . import model_registry  # type: ignore
+    from . import emotions as emotions_mod  # type: ignore
+    from . import intent as intents_mod  # type: ignore
+    from . import centroids as centroids_mod  # type: ignore
+except Exception:
+    import model_registry  # type: ignore
+    import emotions as emotions_mod  # type: ignore
+    import intent as intents_mod  # type: ignore
+    import centroids as centroids_mod  # type: ignore
+
+
+DEFAULT_MODEL = model_registry.DEFAULT_MODEL
+
+# Loaded corpus centroid models keyed by (name, model_name); None = not available
+_CENTROIDS: Dict[Tuple[str, str], Optional["centroids_mod.CentroidModel"]] = {}
+
+
+def centroid_model(name: str, model_name: str = DEFAULT_MODEL) -> Optional["centroids_mod.CentroidModel"]:
+    """Persisted corpus centroid model for 'emotion' or 'intent', loaded once."""
+    key = (name, model_name)
+    if key not in _CENTROIDS:
+        _CENTROIDS[key] = centroids_mod.load_centroid_model(name, model_name)
+    return _CENTROIDS[key]
+
+
+def reload_centroids() -> None:
+    """Forget loaded centroid models so the next call re-reads them from disk."""
+    _CENTROIDS.clear()
+
+
+def embed_texts(texts: List[str], model_name: str = DEFAULT_MODEL, persist: bool = True) -> np.ndarray:
+    """Normalized embeddings for `texts`, one row per text (persist=False for ad-hoc inputs)."""
+    return model_registry.encode([str(t) for t in texts], model_name, persist=persist)
+
+
+def classify_embeddings(X: np.ndarray, model_name: str = DEFAULT_MODEL) -> Tuple[List[str], List[str]]:
+    """Emotion and intent labels for pre-computed embeddings.
+
+    Each classifier falls back independently ('neutral' / 'other'), mirroring the
+    per-stage fallbacks in orchestrator.analyze_text_with_locals.
+    """
+    n = int(X.shape[0])
+    try:
+        emo_model = centroid_model("emotion", model_name)
+        if emo_model is not None and emo_model.dim == X.shape[1]:
+            emos = emo_model.predict(X)
+        else:
+            emos = emotions_mod.emotions_from_embeddings(X, model_name=model_name)
+    except Exception:
+        emos = ["neutral"] * n
+    try:
+        intent_model = centroid_model("intent", model_name)
+        if intent_model is not None and intent_model.dim == X.shape[1]:
+            intents = intent_model.predict(X)
+        else:
+            intents = intents_mod.intents_from_embeddings(X, model_name=model_name)
+    except Exception:
+        intents = ["other"] * n
+    return emos, intents
+
+
+def classify_texts(texts: List[str], model_name: str = DEFAULT_MODEL) -> Tuple[List[str], List[str]]:
+    """Embed `texts` once and return (emotions, intents), order preserved."""
+    if not texts:
+        return [], []
+    try:
+        X = embed_texts(texts, model_name)
+    except Exception:
+        # Embedding model not available
+        return ["neutral"] * len(texts), ["other"] * len(texts)
+    return classify_embeddings(X, model_name)
@@ -0,0 +1,171 @@
+"""
+Bounded-memory clustering for full-corpus precompute.
+
+cluster_emotions / fit_emotion_centroids need the whole (n, d) embedding matrix
+in memory and run full-batch KMeans with n_init=10. For large corpora this
+module instead:
+
+1. embeds the texts in fixed-size chunks,
+2. feeds each chunk to one MiniBatchKMeans per label set via partial_fit,
+3. optionally spills every chunk to an on-disk float32/float16 file so the
+   second pass (assigning labels) replays vectors instead of re-encoding.
+   The spill is then the only copy: spilled chunks are neither added to the
+   embedding store nor to its in-memory cache. Without a spill the vectors go to the store, and
+   the second pass reads them back from there.
+
+Peak memory is O(chunk_size * d) regardless of corpus size.
+
+Usage:
+  centers, spill = fit_minibatch_centers(texts, {"emotion": 6, "intent": 9}, spill_dir="/tmp")
+  model = emotion_model_from_centers(centers["emotion"])
+  labels = predict_in_chunks(model, iter_embeddings(texts, spill=spill))
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from . import model_registry  # type: ignore
+    from .centroids import CentroidModel  # type: ignore
+except Exception:
+    import model_registry  # type: ignore
+    from centroids import CentroidModel  # type: ignore
+
+
+DEFAULT_CHUNK_SIZE = 2048
+
+
+@dataclass
+class EmbeddingSpill:
+    """Embeddings written to disk chunk by chunk, readable as a memory map."""
+
+    path: str
+    dim: int
+    dtype: str
+    rows: int = 0
+
+    def matrix(self) -> np.memmap:
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def embed_in_chunks(
+    texts: Sequence[str],
+    *,
+    model_name: str = model_registry.DEFAULT_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: bool = True,
+) -> Iterator[np.ndarray]:
+    for i in range(0, len(texts), chunk_size):
+        yield model_registry.encode([str(t) for t in texts[i : i + chunk_size]], model_name, cache=cache)
+
+
+def fit_minibatch_centers(
+    texts: Sequence[str],
+    ks: Dict[str, int],
+    *,
+    model_name: str = model_registry.DEFAULT_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    spill_dir: Optional[str] = None,
+    spill_dtype: str = "float32",
+    random_state: int = 42,
+) -> tuple[Dict[str, np.ndarray], Optional[EmbeddingSpill]]:
+    """Fit one MiniBatchKMeans per entry of `ks` (name -> k) in a single embedding pass.
+
+    Returns the cluster centers per name and, when `spill_dir` is given, the
+    spilled embeddings for the labelling pass (caller removes it when done).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    n = len(texts)
+    ks_eff = {name: max(1, min(int(k), n)) for name, k in ks.items()}
+    kms = {
+        name: MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=chunk_size, n_init=3)
+        for name, k in ks_eff.items()
+    }
+    spill: Optional[EmbeddingSpill] = None
+    fh = None
+    # partial_fit needs at least k samples on its first call; hold back small tails
+    pending: List[np.ndarray] = []
+    pending_rows = 0
+    need = max(ks_eff.values()) if ks_eff else 1
+
+    def _fit(batch: np.ndarray) -> None:
+        for km in kms.values():
+            km.partial_fit(batch)
+
+    try:
+        chunks = embed_in_chunks(texts, model_name=model_name, chunk_size=chunk_size, cache=spill_dir is None)
+        for X in chunks:
+            if spill_dir is not None:
+                if fh is None:
+                    os.makedirs(spill_dir, exist_ok=True)
+                    fd, path = tempfile.mkstemp(prefix="embeddings-", suffix=".bin", dir=spill_dir)
+                    fh = os.fdopen(fd, "wb")
+                    spill = EmbeddingSpill(path=path, dim=int(X.shape[1]), dtype=spill_dtype)
+                fh.write(np.ascontiguousarray(X, dtype=spill_dtype).tobytes())
+                spill.rows += int(X.shape[0])  # type: ignore[union-attr]
+
+            pending.append(X)
+            pending_rows += int(X.shape[0])
+            if pending_rows >= need:
+                _fit(np.vstack(pending))
+                pending, pending_rows = [], 0
+        if pending:
+            batch = np.vstack(pending)
+            if all(hasattr(km, "cluster_centers_") for km in kms.values()):
+                _fit(batch)
+            else:
+                # Corpus smaller than k for the first call: fit what we have
+                for name, km in kms.items():
+                    km.set_params(n_clusters=min(ks_eff[name], batch.shape[0]))
+                    km.partial_fit(batch)
+    except Exception:
+        if fh is not None:
+            fh.close()
+        if spill is not None:
+            spill.remove()
+        raise
+    if fh is not None:
+        fh.close()
+
+    centers = {name: np.asarray(km.cluster_centers_, dtype=np.float32) for name, km in kms.items()}
+    return centers, spill
+
+
+def iter_embeddings(
+    texts: Sequence[str],
+    *,
+    spill: Optional[EmbeddingSpill] = None,
+    model_name: str = model_registry.DEFAULT_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+    """Embeddings chunk by chunk, replayed from `spill` if available, else re-encoded."""
+    if spill is None:
+        yield from embed_in_chunks(texts, model_name=model_name, chunk_size=chunk_size)
+        return
+    M = spill.matrix()
+    for i in range(0, spill.rows, chunk_size):
+        yield np.asarray(M[i : i + chunk_size], dtype=np.float32)
+
+
+def predict_in_chunks(model: CentroidModel, chunks: Iterator[np.ndarray]) -> List[str]:
+    labels: List[str] = []
+    for X in chunks:
+        labels.extend(model.predict(X))
+    return labels
+
+
+def default_spill_dir() -> str:
+    return os.getenv("EMBEDDING_SPILL_DIR") or tempfile.gettempdir()
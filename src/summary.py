@@ -1,22 +1,25 @@
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 load_dotenv()
 
+import llm_cache
+import llm_client
+
+MODEL = "gemini-2.5-flash"
+TEMPERATURE = 0.3
+
 class GeminiSummarizer:
 	def __init__(self):
-		api_key = os.getenv("GEMINI_API_KEY")
-		if not api_key:
-			raise ValueError("GEMINI_API_KEY environment variable not set.")
-		self.llm = ChatGoogleGenerativeAI(google_api_key=api_key, model="gemini-2.5-flash", temperature=0.3)
+		self.llm = llm_client.get_chat_model(MODEL, TEMPERATURE)
 
 	def summarize(self, feedback: str, max_words: int = 20) -> str:
 		prompt = (
 			f"Summarize the following customer feedback in {max_words} words or fewer, focusing on the main points and sentiment.\n\n"
 			f"Feedback: {feedback}\n\nSummary:"
 		)
-		resp = self.llm.invoke(prompt)
-		return getattr(resp, "content", str(resp)).strip()
+		return llm_cache.cached_call(MODEL, {"temperature": TEMPERATURE}, prompt, lambda: self._invoke(prompt))
+
+	def _invoke(self, prompt: str) -> str:
+		return llm_client.invoke_chat(prompt, model=MODEL, temperature=TEMPERATURE)
 
 if __name__ == "__main__":
 	summarizer = GeminiSummarizer()
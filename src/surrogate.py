@@ -0,0 +1,464 @@
+"""
+Local surrogate for the Gemini repeat-purchase / NPS prediction.
+
+Gemini is only needed per review for `repeat_purchase` and `nps_score`. This
+module predicts both on CPU from signals the orchestrator already has:
+
+  features = [VADER compound, one-hot emotion, one-hot intent,
+              MiniLM embedding, rating / 5, has_rating]
+
+  repeat_purchase  logistic regression, Platt-scaled -> probability p, confidence max(p, 1 - p)
+  nps_score        ridge regression     -> clipped and rounded to 0..10
+
+Inference is two dot products over ~400 features (well under a millisecond).
+Training uses scikit-learn, prediction only numpy.
+
+Training data (python src/surrogate.py):
+- outputs/clean_csv.csv: `Recommended IND` is the repeat-purchase label
+  (derived as Rating >= 4 when the column is missing) and the NPS target is
+  (Rating - 1) * 2.5. Every row is also seen once with the rating masked, so the
+  model also works for API requests that carry no rating (rating: null).
+- --distill: where the Gemini response cache (llm_cache) holds a single-review
+  prediction for a CSV review, Gemini's answer replaces the CSV-derived targets.
+
+Calibration: the orchestrator escalates items whose confidence is below
+SURROGATE_MIN_CONFIDENCE to Gemini, so the confidence has to mean what it says.
+The classifier uses class_weight="balanced", which shifts its probabilities,
+so a quarter of the training split is held back. On those rows a Platt
+sigmoid (p = sigmoid(a * logit + b)) is fit and stored with the weights.
+meta["thresholds"] reports, on the test split, the share of items escalated
+and the accuracy of the kept items for a range of thresholds. Use it to pick
+SURROGATE_MIN_CONFIDENCE. meta["calibration_error"] is the expected calibration error.
+
+Weights: outputs/surrogate/surrogate.npz, with the embedding backend and
+quantization the features were computed with. As for the centroid models, a
+model is only used when model name, backend and quantization match the active
+EMBEDDING_BACKEND; otherwise it is refused and every item goes to Gemini until
+the surrogate is retrained. Files written before the backend was recorded were
+trained on torch embeddings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from . import embedding_backends  # type: ignore
+    from . import model_registry  # type: ignore
+    from .emotions import EMOTIONS  # type: ignore
+    from .intent import INTENTS  # type: ignore
+except Exception:
+    import embedding_backends  # type: ignore
+    import model_registry  # type: ignore
+    from emotions import EMOTIONS  # type: ignore
+    from intent import INTENTS  # type: ignore
+
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+SURROGATE_DIR = os.getenv("SURROGATE_DIR") or os.path.join(ROOT, "outputs", "surrogate")
+SURROGATE_PATH = os.path.join(SURROGATE_DIR, "surrogate.npz")
+CSV_PATH = os.path.join(ROOT, "outputs", "clean_csv.csv")
+
+
+@dataclass
+class SurrogateModel:
+    model_name: str
+    emotions: List[str]
+    intents: List[str]
+    mean: np.ndarray       # (f,) feature standardization
+    scale: np.ndarray      # (f,)
+    rec_coef: np.ndarray   # (f,) logistic regression for repeat_purchase
+    rec_bias: float
+    nps_coef: np.ndarray   # (f,) ridge regression for nps_score
+    nps_bias: float
+    meta: Dict[str, Any] = field(default_factory=dict)
+    calib_a: float = 1.0   # Platt scaling of the repeat_purchase logit (1, 0 = uncalibrated)
+    calib_b: float = 0.0
+    backend: str = field(default_factory=lambda: model_registry.BACKEND)  # embedding backend of the training features
+
+    @property
+    def quantization(self) -> str:
+        return embedding_backends.quantization(self.backend)
+
+    @property
+    def dim(self) -> int:
+        """Embedding dimension the model was trained on."""
+        return int(self.mean.shape[0]) - 3 - len(self.emotions) - len(self.intents)
+
+    def features(
+        self,
+        sentiment_scores: Sequence[float],
+        emotions: Sequence[str],
+        intents: Sequence[str],
+        X: np.ndarray,
+        ratings: Optional[Sequence[Optional[float]]] = None,
+    ) -> np.ndarray:
+        return build_features(sentiment_scores, emotions, intents, X, ratings, self.emotions, self.intents)
+
+    def predict(self, F: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(repeat_purchase bool, nps_score int, confidence float) for a feature matrix."""
+        Z = (np.asarray(F, dtype=np.float32) - self.mean) / self.scale
+        p = _sigmoid(self.calib_a * (Z @ self.rec_coef + self.rec_bias) + self.calib_b)
+        nps = np.clip(np.rint(Z @ self.nps_coef + self.nps_bias), 0, 10).astype(int)
+        return p >= 0.5, nps, np.maximum(p, 1.0 - p)
+
+    def logits(self, F: np.ndarray) -> np.ndarray:
+        """Uncalibrated repeat_purchase logits (input to Platt scaling)."""
+        Z = (np.asarray(F, dtype=np.float32) - self.mean) / self.scale
+        return Z @ self.rec_coef + self.rec_bias
+
+    def save(self, path: str = SURROGATE_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            model_name=np.asarray(self.model_name),
+            emotions=np.asarray(self.emotions, dtype=str),
+            intents=np.asarray(self.intents, dtype=str),
+            mean=self.mean.astype(np.float32),
+            scale=self.scale.astype(np.float32),
+            rec_coef=self.rec_coef.astype(np.float32),
+            rec_bias=np.asarray(self.rec_bias, dtype=np.float32),
+            nps_coef=self.nps_coef.astype(np.float32),
+            nps_bias=np.asarray(self.nps_bias, dtype=np.float32),
+            calib_a=np.asarray(self.calib_a, dtype=np.float32),
+            calib_b=np.asarray(self.calib_b, dtype=np.float32),
+            meta=np.asarray(json.dumps(self.meta)),
+            backend=np.asarray(self.backend),
+            quantization=np.asarray(self.quantization),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = SURROGATE_PATH) -> "SurrogateModel":
+        with np.load(path) as data:
+            backend = str(data["backend"]) if "backend" in data.files else "torch"
+            m = cls(
+                model_name=str(data["model_name"]),
+                emotions=[str(x) for x in data["emotions"]],
+                intents=[str(x) for x in data["intents"]],
+                mean=np.asarray(data["mean"], dtype=np.float32),
+                scale=np.asarray(data["scale"], dtype=np.float32),
+                rec_coef=np.asarray(data["rec_coef"], dtype=np.float32),
+                rec_bias=float(data["rec_bias"]),
+                nps_coef=np.asarray(data["nps_coef"], dtype=np.float32),
+                nps_bias=float(data["nps_bias"]),
+                meta=json.loads(str(data["meta"])),
+                calib_a=float(data["calib_a"]) if "calib_a" in data.files else 1.0,
+                calib_b=float(data["calib_b"]) if "calib_b" in data.files else 0.0,
+                backend=backend,
+            )
+            stored_quant = str(data["quantization"]) if "quantization" in data.files else m.quantization
+        if stored_quant != m.quantization:
+            raise ValueError(f"{path}: quantization {stored_quant!r} does not match backend {backend!r}")
+        return m
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def build_features(
+    sentiment_scores: Sequence[float],
+    emotions: Sequence[str],
+    intents: Sequence[str],
+    X: np.ndarray,
+    ratings: Optional[Sequence[Optional[float]]] = None,
+    emotion_labels: Sequence[str] = EMOTIONS,
+    intent_labels: Sequence[str] = INTENTS,
+) -> np.ndarray:
+    """Feature matrix (n, 3 + |emotions| + |intents| + d); unknown labels one-hot to zeros."""
+    n = len(sentiment_scores)
+    emo_idx = {e: i for i, e in enumerate(emotion_labels)}
+    intent_idx = {e: i for i, e in enumerate(intent_labels)}
+    ne, ni = len(emotion_labels), len(intent_labels)
+    X = np.asarray(X, dtype=np.float32).reshape(n, -1)
+
+    F = np.zeros((n, 3 + ne + ni + X.shape[1]), dtype=np.float32)
+    F[:, 0] = np.asarray(sentiment_scores, dtype=np.float32)
+    if ratings is not None:
+        r = np.asarray([np.nan if v is None else float(v) for v in ratings], dtype=np.float32)
+        has = np.isfinite(r) & (r > 0)  # 0 means "no rating" in the dashboard frame
+        F[has, 1] = r[has] / 5.0
+        F[has, 2] = 1.0
+    rows = np.arange(n)
+    e = np.fromiter((emo_idx.get(x, -1) for x in emotions), dtype=np.int64, count=n)
+    F[rows[e >= 0], 3 + e[e >= 0]] = 1.0
+    t = np.fromiter((intent_idx.get(x, -1) for x in intents), dtype=np.int64, count=n)
+    F[rows[t >= 0], 3 + ne + t[t >= 0]] = 1.0
+    F[:, 3 + ne + ni :] = X
+    return F
+
+
+_MODEL: Optional[SurrogateModel] = None
+_LOADED = False
+_LOCK = threading.Lock()
+
+
+def get_model(model_name: str = model_registry.DEFAULT_MODEL, backend: Optional[str] = None) -> Optional[SurrogateModel]:
+    """Persisted surrogate, loaded once; None if missing or trained on another encoder.
+
+    backend defaults to the active EMBEDDING_BACKEND. Concurrent first calls (batcher threads, thread-pool fan-out) wait for the
+    one load instead of seeing "no model" while it is still being read.
+    """
+    global _MODEL, _LOADED
+    if _LOADED:
+        return _MODEL
+    with _LOCK:
+        if _LOADED:
+            return _MODEL
+        backend = (backend or model_registry.BACKEND).lower()
+        try:
+            m = SurrogateModel.load(SURROGATE_PATH)
+        except FileNotFoundError:
+            m = None
+        except Exception as e:
+            print(f"[surrogate] Failed to load {SURROGATE_PATH}: {e}")
+            m = None
+        if m is not None and m.model_name != model_name:
+            print(f"[surrogate] Ignoring model trained with {m.model_name} (expected {model_name})")
+            m = None
+        if m is not None and (m.backend != backend or m.quantization != embedding_backends.quantization(backend)):
+            print(
+                f"[surrogate] Ignoring model trained on the {m.backend} ({m.quantization}) backend "
+                f"(active: {backend}); re-run surrogate.py to retrain it"
+            )
+            m = None
+        _MODEL = m
+        _LOADED = True
+    return _MODEL
+
+
+def reload_model() -> None:
+    global _MODEL, _LOADED
+    with _LOCK:
+        _MODEL, _LOADED = None, False
+
+
+# Training
+CONFIDENCE_THRESHOLDS = (0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9)
+
+
+def platt_scale(logits: np.ndarray, labels: np.ndarray) -> Tuple[float, float]:
+    """(a, b) with sigmoid(a * logit + b) fit to held-out `labels` by maximum likelihood."""
+    from sklearn.linear_model import LogisticRegression
+
+    labels = np.asarray(labels, dtype=bool)
+    if labels.all() or not labels.any():
+        return 1.0, 0.0
+    lr = LogisticRegression(C=1e6, max_iter=1000).fit(np.asarray(logits, dtype=np.float64).reshape(-1, 1), labels)
+    return float(lr.coef_[0, 0]), float(lr.intercept_[0])
+
+
+def calibration_error(p: np.ndarray, labels: np.ndarray, bins: int = 10) -> float:
+    """Expected calibration error of predicted probabilities p for boolean labels."""
+    p = np.asarray(p, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+    which = np.minimum((p * bins).astype(int), bins - 1)
+    err = 0.0
+    for b in range(bins):
+        sel = which == b
+        if sel.any():
+            err += sel.mean() * abs(p[sel].mean() - labels[sel].mean())
+    return float(err)
+
+
+def threshold_report(
+    correct: np.ndarray, confidence: np.ndarray, thresholds: Sequence[float] = CONFIDENCE_THRESHOLDS
+) -> List[Dict[str, float]]:
+    """Per confidence threshold: share of items escalated and accuracy of those kept locally."""
+    correct = np.asarray(correct, dtype=bool)
+    confidence = np.asarray(confidence, dtype=np.float64)
+    out = []
+    for t in thresholds:
+        keep = confidence >= t
+        out.append(
+            {
+                "threshold": float(t),
+                "escalated": float(1.0 - keep.mean()) if len(keep) else 0.0,
+                "kept_accuracy": float(correct[keep].mean()) if keep.any() else 0.0,
+            }
+        )
+    return out
+
+
+def _csv_targets(df) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    import pandas as pd
+
+    raw = df["Rating"] if "Rating" in df.columns else pd.Series(0, index=df.index)
+    rating = pd.to_numeric(raw, errors="coerce").fillna(0).to_numpy(dtype=np.float32)
+    if "Recommended IND" in df.columns:
+        rec = pd.to_numeric(df["Recommended IND"], errors="coerce")
+        rec = rec.fillna(pd.Series(rating >= 4, index=df.index).astype(float)).to_numpy() > 0.5
+    else:
+        rec = rating >= 4
+    nps = np.clip((rating - 1.0) * 2.5, 0, 10)
+    return rating, rec, nps
+
+
+def _distilled_targets(
+    texts: List[str], signals_list: List[Any], rec: np.ndarray, nps: np.ndarray
+) -> int:
+    """Overwrite targets with cached Gemini single-review answers; returns how many were found."""
+    try:
+        from . import llm_cache, orchestrator  # type: ignore
+    except Exception:
+        import llm_cache  # type: ignore
+        import orchestrator  # type: ignore
+
+    cache = llm_cache.get_cache()
+    if cache is None:
+        return 0
+    config = orchestrator.SINGLE_GENERATION_CONFIG
+    found = 0
+    for i, (text, sig) in enumerate(zip(texts, signals_list)):
+        key = llm_cache.cache_key(orchestrator.GEMINI_MODEL, config, orchestrator._build_gemini_prompt(text, sig))
+        raw = cache.peek(key)
+        if not raw:
+            continue
+        try:
+            data = orchestrator._extract_json(raw)
+            label = orchestrator._coerce_bool(data["repeat_purchase"])
+            score = float(np.clip(int(data["nps_score"]), 0, 10))
+        except Exception:
+            continue
+        if label is None:
+            continue
+        rec[i], nps[i] = label, score
+        found += 1
+    return found
+
+
+def train(
+    csv_path: str = CSV_PATH,
+    *,
+    model_name: str = model_registry.DEFAULT_MODEL,
+    distill: bool = False,
+    limit: Optional[int] = None,
+    seed: int = 0,
+) -> SurrogateModel:
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression, Ridge
+    from sklearn.model_selection import train_test_split
+
+    try:
+        from . import sentiment as sentiment_mod  # type: ignore
+        from . import signals as signals_mod  # type: ignore
+    except Exception:
+        import sentiment as sentiment_mod  # type: ignore
+        import signals as signals_mod  # type: ignore
+
+    df = pd.read_csv(csv_path)
+    df = df[df["Review Text"].notna()].reset_index(drop=True)
+    if limit:
+        df = df.sample(n=min(limit, len(df)), random_state=seed).reset_index(drop=True)
+    texts = df["Review Text"].astype(str).tolist()
+    rating, rec, nps = _csv_targets(df)
+
+    print(f"[surrogate] Computing signals for {len(texts)} reviews ...")
+    scores = sentiment_mod.vader_sentiment_scores(texts)
+    X = signals_mod.embed_texts(texts, model_name)
+    emos, intents = signals_mod.classify_embeddings(X, model_name)
+
+    distilled = 0
+    if distill:
+        try:
+            from . import orchestrator  # type: ignore
+        except Exception:
+            import orchestrator  # type: ignore
+        signals_list = [
+            orchestrator.OrchestratedSignals(
+                sentiment_score=float(s),
+                sentiment_label=sentiment_mod.vader_sentiment_label(float(s)),
+                emotion=e,
+                intent=t,
+            )
+            for s, e, t in zip(scores, emos, intents)
+        ]
+        distilled = _distilled_targets(texts, signals_list, rec, nps)
+        print(f"[surrogate] Distilled targets from {distilled} cached Gemini predictions")
+
+    F_rated = build_features(scores, emos, intents, X, rating)
+    F_blind = build_features(scores, emos, intents, X, None)
+    idx_train, idx_test = train_test_split(np.arange(len(texts)), test_size=0.2, random_state=seed, stratify=rec)
+
+    # A quarter of the training split is held back to calibrate the classifier
+    idx_fit, idx_cal = train_test_split(idx_train, test_size=0.25, random_state=seed, stratify=rec[idx_train])
+
+    # Each training review appears with and without its rating
+    F_train = np.vstack([F_rated[idx_train], F_blind[idx_train]])
+    rec_train = np.concatenate([rec[idx_train], rec[idx_train]])
+    nps_train = np.concatenate([nps[idx_train], nps[idx_train]])
+    fit_rows = np.concatenate([np.isin(idx_train, idx_fit)] * 2)
+
+    mean = F_train.mean(axis=0)
+    scale = F_train.std(axis=0)
+    scale[scale < 1e-6] = 1.0
+    Z = (F_train - mean) / scale
+
+    clf = LogisticRegression(C=0.1, max_iter=2000, class_weight="balanced").fit(Z[fit_rows], rec_train[fit_rows])
+    reg = Ridge(alpha=10.0).fit(Z, nps_train)
+
+    model = SurrogateModel(
+        model_name=model_name,
+        emotions=list(EMOTIONS),
+        intents=list(INTENTS),
+        mean=mean.astype(np.float32),
+        scale=scale.astype(np.float32),
+        rec_coef=clf.coef_[0].astype(np.float32),
+        rec_bias=float(clf.intercept_[0]),
+        nps_coef=reg.coef_.astype(np.float32),
+        nps_bias=float(reg.intercept_),
+    )
+    model.calib_a, model.calib_b = platt_scale(model.logits(F_train[~fit_rows]), rec_train[~fit_rows])
+
+    meta: Dict[str, Any] = {
+        "train_rows": int(len(idx_fit)),
+        "calibration_rows": int(len(idx_cal)),
+        "test_rows": int(len(idx_test)),
+        "distilled": distilled,
+        "platt": [model.calib_a, model.calib_b],
+    }
+    correct_all, conf_all, p_all, rec_all = [], [], [], []
+    for name, F in (("with_rating", F_rated), ("without_rating", F_blind)):
+        pred_rec, pred_nps, conf = model.predict(F[idx_test])
+        meta[name] = {
+            "repeat_purchase_accuracy": float((pred_rec == rec[idx_test]).mean()),
+            "nps_mae": float(np.abs(pred_nps - nps[idx_test]).mean()),
+            "mean_confidence": float(conf.mean()),
+        }
+        correct_all.append(pred_rec == rec[idx_test])
+        conf_all.append(conf)
+        p_all.append(np.where(pred_rec, conf, 1.0 - conf))
+        rec_all.append(rec[idx_test])
+    meta["calibration_error"] = calibration_error(np.concatenate(p_all), np.concatenate(rec_all))
+    meta["thresholds"] = threshold_report(np.concatenate(correct_all), np.concatenate(conf_all))
+    model.meta = meta
+    return model
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Train the local repeat-purchase / NPS surrogate model")
+    p.add_argument("--csv", default=CSV_PATH, help="CSV with 'Review Text', 'Rating' and optionally 'Recommended IND'")
+    p.add_argument("--distill", action="store_true", help="Prefer cached Gemini predictions as targets where available")
+    p.add_argument("--limit", type=int, default=None, help="Train on a random sample of this many reviews")
+    p.add_argument("--out", default=SURROGATE_PATH, help="Output .npz path")
+    args = p.parse_args(argv)
+
+    model = train(args.csv, distill=args.distill, limit=args.limit)
+    path = model.save(args.out)
+    print(json.dumps(model.meta, indent=2))
+    print(f"[surrogate] Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
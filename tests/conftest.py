@@ -0,0 +1,8 @@
+"""Put src/ on sys.path so tests import modules the way the server does (`import review_store`)."""
+
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
@@ -0,0 +1,48 @@
+import numpy as np
+
+import centroids
+from centroids import CentroidModel, load_centroid_model
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _model(backend: str) -> CentroidModel:
+    return CentroidModel(
+        name="emotion",
+        model_name=MODEL,
+        centers=np.eye(2, 3, dtype=np.float32),
+        labels=["joy", "anger"],
+        backend=backend,
+    )
+
+
+def test_roundtrip_keeps_backend_and_quantization(tmp_path):
+    _model("onnx-int8").save(str(tmp_path))
+    m = load_centroid_model("emotion", MODEL, str(tmp_path), backend="onnx-int8")
+    assert m is not None
+    assert (m.backend, m.quantization) == ("onnx-int8", "int8")
+    assert m.predict(np.array([[0.0, 1.0, 0.0]])) == ["anger"]
+
+
+def test_backend_mismatch_is_refused(tmp_path):
+    _model("torch").save(str(tmp_path))
+    assert load_centroid_model("emotion", MODEL, str(tmp_path), backend="onnx-int8") is None
+    assert load_centroid_model("emotion", MODEL, str(tmp_path), backend="onnx") is None
+    assert load_centroid_model("emotion", MODEL, str(tmp_path), backend="torch") is not None
+
+
+def test_files_without_backend_are_torch_fp32(tmp_path):
+    np.savez(
+        tmp_path / "emotion.npz",
+        centers=np.eye(2, 3, dtype=np.float32),
+        labels=np.asarray(["joy", "anger"]),
+        model_name=np.asarray(MODEL),
+    )
+    assert load_centroid_model("emotion", MODEL, str(tmp_path), backend="torch") is not None
+    assert load_centroid_model("emotion", MODEL, str(tmp_path), backend="onnx-int8") is None
+
+
+def test_default_backend_is_active_backend(monkeypatch):
+    monkeypatch.setattr(centroids.model_registry, "BACKEND", "onnx")
+    m = CentroidModel("intent", MODEL, np.zeros((1, 2), dtype=np.float32), ["other"])
+    assert (m.backend, m.quantization) == ("onnx", "fp32")
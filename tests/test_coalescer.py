@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from coalescer import MicroBatcher
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_submissions_share_one_batch_in_order():
+    batches = []
+
+    async def fn(items):
+        batches.append(list(items))
+        return [i * 10 for i in items]
+
+    async def main():
+        b = MicroBatcher(fn, window_ms=20, max_batch=32)
+        results = await asyncio.gather(*(b.submit(i) for i in range(5)))
+        return b, results
+
+    b, results = _run(main())
+    assert results == [0, 10, 20, 30, 40]
+    assert batches == [[0, 1, 2, 3, 4]]
+    assert b.stats()["batches"] == 1 and b.stats()["largest_batch"] == 5
+
+
+def test_max_batch_flushes_without_waiting_for_the_window():
+    batches = []
+
+    async def fn(items):
+        batches.append(list(items))
+        return items
+
+    async def main():
+        b = MicroBatcher(fn, window_ms=10_000, max_batch=3)
+        return await asyncio.wait_for(asyncio.gather(*(b.submit(i) for i in range(6))), timeout=2)
+
+    assert _run(main()) == list(range(6))
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+
+
+def test_zero_window_runs_each_item_alone():
+    batches = []
+
+    async def fn(items):
+        batches.append(list(items))
+        return items
+
+    async def main():
+        b = MicroBatcher(fn, window_ms=0)
+        return await asyncio.gather(b.submit("a"), b.submit("b"))
+
+    assert _run(main()) == ["a", "b"]
+    assert batches == [["a"], ["b"]]
+
+
+def test_batch_failure_reaches_every_caller():
+    async def fn(items):
+        raise RuntimeError("model down")
+
+    async def main():
+        b = MicroBatcher(fn, window_ms=5)
+        return await asyncio.gather(b.submit(1), b.submit(2), return_exceptions=True)
+
+    results = _run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_callers_are_dropped_from_the_batch():
+    batches = []
+
+    async def fn(items):
+        batches.append(list(items))
+        return items
+
+    async def main():
+        b = MicroBatcher(fn, window_ms=30)
+        gone = asyncio.ensure_future(b.submit("gone"))
+        kept = asyncio.ensure_future(b.submit("kept"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        assert await kept == "kept"
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+
+    _run(main())
+    assert batches == [["kept"]]
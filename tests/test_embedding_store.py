@@ -0,0 +1,70 @@
+import numpy as np
+
+import embedding_store
+from embedding_store import EmbeddingStore
+
+MODEL = "test/encoder"
+
+
+class Encoder:
+    """Deterministic 4-d vectors; records every batch it is asked to encode."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.asarray([[len(t), t.count("a"), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+def test_duplicates_and_known_texts_are_encoded_once(tmp_path):
+    enc = Encoder()
+    store = EmbeddingStore(MODEL, root=str(tmp_path))
+    X = store.get_or_encode(["a", "bb", "a"], enc)
+    assert enc.batches == [["a", "bb"]]
+    assert np.array_equal(X[0], X[2]) and X.shape == (3, 4)
+    Y = store.get_or_encode(["bb", "ccc"], enc)
+    assert enc.batches[1:] == [["ccc"]]
+    assert np.array_equal(Y[0], X[1])
+    assert len(store) == 3
+
+
+def test_persisted_vectors_survive_a_reopen(tmp_path):
+    enc = Encoder()
+    EmbeddingStore(MODEL, root=str(tmp_path)).get_or_encode(["a", "bb"], enc)
+    reopened = EmbeddingStore(MODEL, root=str(tmp_path))
+    X = reopened.get_or_encode(["bb", "a"], enc)
+    assert len(enc.batches) == 1 and len(reopened) == 2
+    assert X[:, 0].tolist() == [2.0, 1.0]
+
+
+def test_online_vectors_stay_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "ONLINE_CACHE_SIZE", 2)
+    enc = Encoder()
+    store = EmbeddingStore(MODEL, root=str(tmp_path))
+    store.get_or_encode(["q1", "q2", "q3"], enc, persist=False)
+    assert len(store) == 0 and store.stats()["online_cached"] == 2
+    store.get_or_encode(["q3"], enc, persist=False)
+    assert len(enc.batches) == 1  # still cached
+    store.get_or_encode(["q1"], enc, persist=False)
+    assert enc.batches[-1] == ["q1"]  # evicted as least recently used
+    assert len(EmbeddingStore(MODEL, root=str(tmp_path))) == 0
+
+
+def test_persisting_an_online_text_moves_it_to_the_store(tmp_path):
+    enc = Encoder()
+    store = EmbeddingStore(MODEL, root=str(tmp_path))
+    store.get_or_encode(["query"], enc, persist=False)
+    store.get_or_encode(["query", "review"], enc)
+    assert enc.batches == [["query"], ["review"]]
+    assert len(store) == 2 and store.stats()["online_cached"] == 0
+    assert len(EmbeddingStore(MODEL, root=str(tmp_path))) == 2
+
+
+def test_uncached_reads_keep_new_vectors_nowhere(tmp_path):
+    enc = Encoder()
+    store = EmbeddingStore(MODEL, root=str(tmp_path))
+    store.get_or_encode(["known"], enc)
+    X = store.get_or_encode(["known", "bulk"], enc, cache=False)
+    assert enc.batches == [["known"], ["bulk"]] and X.shape == (2, 4)
+    assert len(store) == 1 and store.stats()["online_cached"] == 0
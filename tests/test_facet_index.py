@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from facet_index import FacetIndex
+
+FACETS = ["department", "rating"]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(7)
+    n = 5000  # ~80 words, so page() scans with several step sizes
+    return pd.DataFrame(
+        {
+            "department": rng.choice(["Tops", "Dresses", "Bottoms", "Jackets"], size=n, p=[0.5, 0.3, 0.19, 0.01]),
+            "rating": rng.choice(["1", "2", "3", "4", "5"], size=n),
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def index(data):
+    return FacetIndex.build({f: data[f].to_numpy() for f in FACETS}, FACETS)
+
+
+def _expected(data, filters):
+    keep = np.ones(len(data), dtype=bool)
+    for facet, allowed in filters.items():
+        if allowed is not None:
+            keep &= data[facet].isin(allowed).to_numpy()
+    return np.flatnonzero(keep)
+
+
+FILTERS = [
+    {},
+    {"department": ["Tops"]},
+    {"department": ["Tops", "Dresses"], "rating": ["5"]},
+    {"department": ["Jackets"], "rating": ["1", "2"]},
+    {"department": ["Unknown"]},
+    {"department": None, "rating": ["3"]},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_mask_count_and_rows_match_a_full_scan(data, index, filters):
+    m = index.mask(filters)
+    expected = _expected(data, filters)
+    assert index.count(m) == len(expected)
+    assert np.array_equal(index.rows_of(m), expected)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("limit", [1, 7, 500])
+def test_pages_cover_every_row_once_in_order(data, index, filters, limit):
+    m = index.mask(filters)
+    seen, after, more = [], -1, True
+    while more:
+        rows, more = index.page(m, after=after, limit=limit)
+        assert len(rows) <= limit
+        if more:
+            assert len(rows) == limit
+        seen.extend(rows.tolist())
+        if len(rows):
+            after = int(rows[-1])
+    assert seen == _expected(data, filters).tolist()
+
+
+def test_facet_counts_ignore_the_filter_on_their_own_facet(data, index):
+    filters = {"department": ["Tops"], "rating": ["4", "5"]}
+    counts = index.facet_counts(filters)
+    high = data[data["rating"].isin(["4", "5"])]
+    assert counts["department"] == high["department"].value_counts().to_dict()
+    tops = data[data["department"] == "Tops"]
+    assert counts["rating"] == tops["rating"].value_counts().to_dict()
+
+
+def test_empty_values_are_skipped_in_facet_counts():
+    idx = FacetIndex.build({"department": np.array(["Tops", "Dresses", "Tops"]), "rating": np.array(["5", "1", "1"])}, FACETS)
+    counts = idx.facet_counts({"rating": ["5"]})
+    assert counts["department"] == {"Tops": 1}
+    assert idx.labels("department") == ["Dresses", "Tops"]
@@ -0,0 +1,217 @@
+import json
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import fastapi_serve as fs
+import review_store
+import serialization
+
+
+def _frame(n=12):
+    return pd.DataFrame(
+        {
+            "row_hash": range(1, n + 1),
+            "text": [f"Review {i} — naïve “quotes”" for i in range(n)],
+            "rating": [float(1 + i % 5) for i in range(n)],
+            "department": ["Tops" if i % 3 else "Dresses" for i in range(n)],
+            "class": ["Knits"] * n,
+            "age": [25.0 + i for i in range(n)],
+            "sentiment": ["positive" if i % 2 else "negative" for i in range(n)],
+            "emotion": ["joy" if i % 2 else "anger" for i in range(n)],
+        }
+    )
+
+
+@pytest.fixture
+def publish(tmp_path, monkeypatch):
+    """Publish a reviews frame as the served dashboard (no startup, no models)."""
+    monkeypatch.setattr(fs, "REVIEWS_DIR", str(tmp_path / "reviews"))
+    saved = fs.DASHBOARD
+
+    def _publish(frame, fast_json=False):
+        monkeypatch.setattr(fs, "FAST_JSON", fast_json)
+        review_store.write(frame, fs.REVIEWS_DIR)
+        fs._set_dashboard(review_store.ReviewStore.load(fs.REVIEWS_DIR))
+        return fs.DASHBOARD
+
+    yield _publish
+    fs.DASHBOARD = saved
+    fs.RESPONSES.clear()
+
+
+def _republish(monkeypatch, fast_json):
+    """Publish the served cache generation again with FAST_JSON switched."""
+    monkeypatch.setattr(fs, "FAST_JSON", fast_json)
+    fs._set_dashboard(fs.DASHBOARD.store, fs.DASHBOARD.cube)
+
+
+@pytest.fixture
+def client():
+    return TestClient(fs.app)
+
+
+@pytest.mark.parametrize("query", ["", "?limit=5", "?department=Tops&counts=true", "?sentiment=positive&limit=3"])
+def test_reviews_json_is_the_same_with_and_without_fast_json(publish, client, monkeypatch, query):
+    publish(_frame(), fast_json=False)
+    plain = client.get("/reviews" + query)
+    _republish(monkeypatch, True)
+    assert fs.DASHBOARD.fragments is not None
+    fast = client.get("/reviews" + query)
+    assert plain.status_code == fast.status_code == 200
+    assert json.loads(fast.content) == json.loads(plain.content)
+
+
+def test_fast_json_pages_follow_the_same_cursors(publish, client):
+    frame = _frame()
+    for fast_json in (False, True):
+        publish(frame, fast_json=fast_json)
+        ids, cursor = [], None
+        while True:
+            body = client.get("/reviews", params={"limit": 5, **({"cursor": cursor} if cursor else {})}).json()
+            ids += [item["id"] for item in body["items"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert ids == list(range(len(frame)))
+
+
+def test_stale_cursor_is_rejected_with_409(publish, client):
+    publish(_frame())
+    first = client.get("/reviews", params={"limit": 5}).json()
+    assert first["next_cursor"]
+    publish(_frame(8))  # a refresh publishes a new generation
+    stale = client.get("/reviews", params={"limit": 5, "cursor": first["next_cursor"]})
+    assert stale.status_code == 409
+    assert client.get("/reviews", params={"cursor": "not-a-cursor"}).status_code == 409
+    generation = fs.DASHBOARD.version
+    assert client.get("/reviews", params={"cursor": f"{generation}:x"}).status_code == 400
+
+
+def test_etag_revalidation_and_new_version(publish, client):
+    publish(_frame())
+    first = client.get("/reviews")
+    etag = first.headers["etag"]
+    assert first.headers["x-data-version"] == fs.DASHBOARD.version
+    again = client.get("/reviews", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    publish(_frame(8))
+    changed = client.get("/reviews", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_large_responses_are_compressed_when_accepted(publish, client, monkeypatch):
+    monkeypatch.setattr(serialization, "COMPRESS_MIN_BYTES", 10)
+    publish(_frame())
+    plain = client.get("/reviews", headers={"Accept-Encoding": "identity"})
+    gz = client.get("/reviews", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.json() == plain.json()  # httpx decodes the body
+    assert gz.headers["etag"] != plain.headers["etag"]
+
+
+@pytest.fixture
+def slow_gemini(monkeypatch):
+    """Gemini predictions and replies that each take 0.3s; no models loaded."""
+    import orchestrator
+    import time
+
+    sig = orchestrator.OrchestratedSignals(0.5, "positive", "joy", "praise")
+
+    def predict(text, signals):
+        time.sleep(0.3)
+        return orchestrator.GeminiPrediction(True, 9, "slow", source="gemini")
+
+    def reply(text, signals):
+        time.sleep(0.3)
+        return "Gemini reply", False
+
+    monkeypatch.setattr(fs, "local_signals_and_embeddings", lambda texts: ([sig] * len(texts), None))
+    monkeypatch.setattr(orchestrator, "PREDICTION_MODE", "gemini")
+    monkeypatch.setattr(orchestrator, "GEMINI_BATCH_PREDICT", False)
+    monkeypatch.setattr(orchestrator, "_predict", predict)
+    monkeypatch.setattr(orchestrator.llm_client.breaker, "is_open", lambda: False)
+    monkeypatch.setattr(fs, "_generate_reply", reply)
+    monkeypatch.setattr(fs, "_LLM_SEMAPHORE", None)
+
+
+def test_coalesced_reviews_keep_their_own_deadlines(slow_gemini):
+    import asyncio
+    import time
+
+    async def main():
+        b = fs.MicroBatcher(fs._analyze_coalesced, window_ms=20, max_batch=8)
+        now = time.monotonic()
+        return await asyncio.gather(b.submit(("short", None, now + 0.05)), b.submit(("long", None, now + 5)))
+
+    short, long = asyncio.run(main())
+    assert short.degraded == ["nps", "buy_again", "reply"]
+    # The tight deadline of the other caller does not cut this one short
+    assert long.degraded == [] and long.reply == "Gemini reply" and long.nps == 9.0
+
+
+def test_requested_deadline_is_raised_to_the_floor(monkeypatch):
+    import time
+
+    monkeypatch.setattr(fs, "REQUEST_DEADLINE_MIN_MS", 500)
+    assert fs._request_deadline(0) - time.monotonic() > 0.4
+    assert fs._request_deadline(2000) - time.monotonic() > 1.9
+
+
+@pytest.fixture
+def stub_gemini(monkeypatch):
+    """Gemini stand-ins that answer at once, except for texts starting with "slow" (0.3s)."""
+    import orchestrator
+    import time
+
+    sig = orchestrator.OrchestratedSignals(0.5, "positive", "joy", "praise")
+
+    def predict(text, signals):
+        if text.startswith("slow"):
+            time.sleep(0.3)
+        return orchestrator.GeminiPrediction(True, 9, "stub", source="gemini")
+
+    monkeypatch.setattr(fs, "local_signals_and_embeddings", lambda texts: ([sig] * len(texts), None))
+    monkeypatch.setattr(orchestrator, "PREDICTION_MODE", "gemini")
+    monkeypatch.setattr(orchestrator, "GEMINI_BATCH_PREDICT", False)
+    monkeypatch.setattr(orchestrator, "_predict", predict)
+    monkeypatch.setattr(orchestrator.llm_client.breaker, "is_open", lambda: False)
+    monkeypatch.setattr(fs, "_generate_reply", lambda text, signals: (f"Re: {text}", False))
+    monkeypatch.setattr(fs, "_LLM_SEMAPHORE", None)
+
+
+STREAM_BODY = {"reviews": [{"text": "slow one", "rating": 2}, {"text": "  "}, {"text": "quick one", "rating": 5}]}
+
+
+def test_stream_sends_ndjson_review_frames_as_they_complete(stub_gemini, client):
+    r = client.post("/analyze_reviews/stream", json=STREAM_BODY)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    frames = [json.loads(line) for line in r.text.splitlines()]
+    assert [(f["type"], f.get("index")) for f in frames] == [("review", 2), ("review", 0), ("summary", None)]
+    assert frames[0]["review"]["reply"] == "Re: quick one"
+    assert frames[2]["count"] == 2 and frames[2]["degraded"] is False
+
+
+@pytest.mark.parametrize("how", [{"params": {"format": "sse"}}, {"headers": {"Accept": "text/event-stream"}}])
+def test_stream_speaks_sse_when_asked(stub_gemini, client, how):
+    r = client.post("/analyze_reviews/stream", json=STREAM_BODY, **how)
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in r.text.split("\n\n") if e]
+    assert len(events) == 3
+    for event, kind in zip(events, ["review", "review", "summary"]):
+        head, data = event.split("\n")
+        assert head == f"event: {kind}" and json.loads(data[len("data: ") :])["type"] == kind
+
+
+def test_stream_ends_with_an_error_frame_when_analysis_fails(stub_gemini, client, monkeypatch):
+    async def broken(texts, deadline, ratings=None):
+        raise RuntimeError("signals unavailable")
+        yield
+
+    monkeypatch.setattr(fs, "_analyze_stream", broken)
+    r = client.post("/analyze_reviews/stream", json=STREAM_BODY)
+    assert [json.loads(line) for line in r.text.splitlines()] == [
+        {"type": "error", "detail": "orchestrator error: signals unavailable"}
+    ]
@@ -0,0 +1,76 @@
+import llm_cache
+from llm_cache import LLMCache
+
+
+def _cache(tmp_path, **kw):
+    return LLMCache(path=str(tmp_path / "cache.sqlite3"), **kw)
+
+
+def _last_access(cache, key):
+    return cache._conn.execute("SELECT last_access FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "m", "v")
+    assert cache.get("k") == "v"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 1, 1, 1)
+
+
+def test_expired_entries_are_misses_and_deleted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, ttl=60)
+    cache.put("k", "m", "v")
+    now[0] += 59
+    assert cache.get("k") == "v"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.peek("k") is None
+
+
+def test_hits_only_refresh_last_access_after_a_tenth_of_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, ttl=100)
+    cache.put("k", "m", "v")
+    now[0] += 5
+    cache.get("k")
+    assert _last_access(cache, "k") == 1000.0
+    now[0] += 6
+    cache.get("k")
+    assert _last_access(cache, "k") == 1011.0
+
+
+def test_eviction_runs_every_n_puts_and_drops_least_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, ttl=0, max_entries=3, evict_every=2)
+    for key in "abc":
+        now[0] += 1
+        cache.put(key, "m", key)
+    now[0] += cache.touch_interval + 1
+    assert cache.get("a") == "a"  # a is now the most recently used
+    now[0] += 1
+    cache.put("d", "m", "d")  # 4 rows, second put since the last check: evict one
+    assert cache.stats()["entries"] == 3
+    assert cache.evictions == 1
+    assert cache.peek("b") is None
+    assert [cache.peek(k) for k in "acd"] == ["a", "c", "d"]
+    now[0] += 1
+    cache.put("e", "m", "e")  # first put since the last check: no COUNT, bound briefly exceeded
+    assert cache.stats()["entries"] == 4
+
+
+def test_expired_rows_are_evicted_before_live_ones(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = _cache(tmp_path, ttl=10, max_entries=1, evict_every=1)
+    cache.put("old", "m", "1")
+    now[0] += 20
+    cache.put("new", "m", "2")
+    assert cache.peek("new") == "2"
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,223 @@
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the `time` module: monotonic() only advances through sleep()."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_client, "time", fake)
+    return fake
+
+
+# TokenBucket
+def test_bucket_serves_the_burst_then_paces_at_the_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+    assert bucket.waited_seconds == pytest.approx(1.0)
+
+
+def test_bucket_refills_with_elapsed_time_up_to_capacity(clock):
+    bucket = TokenBucket(rate_per_minute=120, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60  # far more than needed to refill, but only 2 are banked
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_bucket_refuses_a_wait_past_the_deadline(clock):
+    bucket = TokenBucket(rate_per_minute=6, capacity=1)
+    bucket.acquire()
+    with pytest.raises(LLMDeadlineExceeded):
+        bucket.acquire(deadline=clock.now + 5)  # next token in 10s
+    assert clock.slept == []
+    bucket.acquire(deadline=clock.now + 11)
+    assert clock.slept == [pytest.approx(10.0)]
+
+
+def test_zero_rate_disables_limiting(clock):
+    bucket = TokenBucket(rate_per_minute=0, capacity=1)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.slept == []
+
+
+def test_forked_workers_split_the_rate(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RPM", 60.0)
+    monkeypatch.setattr(llm_client, "LLM_BURST", 10.0)
+    monkeypatch.setattr(llm_client, "_BUCKET", None)
+    llm_client.share_rate_limit(4)
+    assert llm_client._BUCKET.rate == pytest.approx(15 / 60)
+    assert llm_client._BUCKET.capacity == pytest.approx(2.5)
+
+
+# CircuitBreaker
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()  # a success resets the streak
+    for _ in range(3):
+        assert breaker.state == "closed"
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open" and breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats() == {"state": "open", "consecutive_failures": 3, "times_opened": 1}
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 2
+    assert not breaker.is_open()
+    breaker.before_call()  # the probe
+    assert breaker.state == "half_open" and breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and not breaker.is_open()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_for_another_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 11
+    breaker.before_call()
+    breaker.record_failure()  # one failure is enough while half-open
+    assert breaker.state == "open" and breaker.times_opened == 2
+    clock.now += 9
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_slot_can_be_taken_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 11
+    breaker.before_call()
+    breaker.release_probe()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+# call_with_policy
+@pytest.fixture
+def policy(clock, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    monkeypatch.setattr(llm_client, "breaker", breaker)
+    monkeypatch.setattr(llm_client, "_BUCKET", TokenBucket(0, 1))
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(llm_client.random, "uniform", lambda lo, hi: hi)
+    return breaker
+
+
+def test_retryable_errors_are_retried_with_backoff(policy, clock):
+    calls = []
+
+    def fn(remaining):
+        calls.append(remaining)
+        if len(calls) == 1:
+            raise ConnectionError("reset by peer")
+        return "ok"
+
+    assert llm_client.call_with_policy(fn, timeout=30) == "ok"
+    assert len(calls) == 2
+    assert clock.slept == [pytest.approx(2 * llm_client.LLM_BACKOFF_BASE)]
+    assert calls[1] == pytest.approx(30 - clock.slept[0])  # the retry gets what is left
+    assert policy.state == "closed"
+
+
+def test_non_retryable_errors_propagate_at_once(policy):
+    calls = []
+
+    def fn(remaining):
+        calls.append(remaining)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        llm_client.call_with_policy(fn, timeout=30)
+    assert len(calls) == 1
+
+
+def test_request_deadline_caps_the_call_budget(policy, clock):
+    seen = []
+    token = llm_client.request_deadline.set(clock.now + 2)
+    try:
+        llm_client.call_with_policy(lambda remaining: seen.append(remaining), timeout=30)
+    finally:
+        llm_client.request_deadline.reset(token)
+    assert seen == [pytest.approx(2)]
+
+
+def test_repeated_failures_open_the_circuit_for_later_calls(policy):
+    def fn(remaining):
+        raise ConnectionError("unavailable")
+
+    with pytest.raises(ConnectionError):
+        llm_client.call_with_policy(fn, timeout=300)
+    # Four attempts, but one logical call: one failure on the breaker
+    assert policy.failures == 1 and policy.state == "closed"
+    with pytest.raises(ConnectionError):
+        llm_client.call_with_policy(fn, timeout=300)
+    with pytest.raises(CircuitOpenError):
+        llm_client.call_with_policy(lambda remaining: "never", timeout=30)
+
+
+def test_client_errors_do_not_count_against_the_breaker(policy):
+    def fn(remaining):
+        raise ValueError("bad request")
+
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            llm_client.call_with_policy(fn, timeout=30)
+    assert policy.failures == 0 and policy.state == "closed"
+
+
+def test_half_open_probe_keeps_its_slot_across_retries(policy, clock):
+    policy.record_failure()
+    policy.record_failure()
+    clock.now += 31
+    calls = []
+
+    def fn(remaining):
+        calls.append(remaining)
+        if len(calls) == 1:
+            raise ConnectionError("reset by peer")
+        return "ok"
+
+    assert llm_client.call_with_policy(fn, timeout=300) == "ok"
+    assert len(calls) == 2 and policy.state == "closed"
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import model_registry
+
+
+class FakeEncoder:
+    def encode(self, texts, normalize_embeddings=False, **_):
+        X = np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+        return X / np.linalg.norm(X, axis=1, keepdims=True) if normalize_embeddings else X
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    builds = []
+
+    def build(model_name, backend):
+        builds.append((model_name, backend))
+        time.sleep(0.05)
+        return FakeEncoder()
+
+    monkeypatch.setattr(model_registry, "_MODELS", {})
+    monkeypatch.setattr(model_registry, "_STATS", {})
+    monkeypatch.setattr(model_registry, "_build_model", build)
+    return builds
+
+
+def test_concurrent_callers_share_one_loaded_model(registry):
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(model_registry.get_model("m", "torch"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert registry == [("m", "torch")]
+    assert len(got) == 8 and all(m is got[0] for m in got)
+    assert model_registry.model_stats()["m"]["backend"] == "torch"
+
+
+def test_each_backend_gets_its_own_entry(registry):
+    assert model_registry.model_key("m", "torch") == "m"
+    assert model_registry.model_key("m", "onnx-int8") == "m@onnx-int8"
+    torch_model = model_registry.get_model("m", "torch")
+    int8_model = model_registry.get_model("m", "onnx-int8")
+    assert torch_model is not int8_model
+    assert registry == [("m", "torch"), ("m", "onnx-int8")]
+
+
+def test_unknown_backend_is_rejected(registry):
+    with pytest.raises(ValueError):
+        model_registry.get_model("m", "tensorrt")
+    assert registry == []
+
+
+def test_encode_without_store_normalizes(registry, monkeypatch):
+    monkeypatch.setattr(model_registry, "BACKEND", "torch")
+    X = model_registry.encode(["ab", "abcd"], "m", use_store=False)
+    assert X.dtype == np.float32 and X.shape == (2, 2)
+    assert np.allclose(np.linalg.norm(X, axis=1), 1.0)
+    raw = model_registry.encode(["ab"], "m", use_store=False, normalize=False)
+    assert raw.tolist() == [[2.0, 1.0]]
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import orchestrator
+from orchestrator import OrchestratedSignals
+
+SIG = OrchestratedSignals(sentiment_score=0.6, sentiment_label="positive", emotion="joy", intent="praise")
+
+
+# Batch packing and validation
+def test_pack_batches_respects_budget_and_item_cap():
+    overhead = orchestrator._estimate_tokens(orchestrator._BATCH_HEADER) + orchestrator._estimate_tokens(orchestrator._BATCH_FOOTER)
+    blocks = ["x" * 396] * 5  # 100 tokens each
+    assert orchestrator._pack_batches(blocks, overhead + 250, max_items=10) == [[0, 1], [2, 3], [4]]
+    assert orchestrator._pack_batches(blocks, 10_000, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_oversized_item_gets_a_batch_of_its_own():
+    assert orchestrator._pack_batches(["x" * 4000, "y", "z"], 300, max_items=10) == [[0], [1, 2]]
+
+
+@pytest.mark.parametrize(
+    "obj, expected",
+    [
+        ({"repeat_purchase": True, "nps_score": 9, "reason": "ok"}, (True, 9)),
+        ({"repeat_purchase": "no", "nps_score": "3.6"}, (False, 4)),
+        ({"repeat_purchase": True, "nps_score": 42}, (True, 10)),
+        ({"repeat_purchase": "maybe", "nps_score": 5}, None),
+        ({"repeat_purchase": True, "nps_score": True}, None),
+        ({"repeat_purchase": True, "nps_score": "high"}, None),
+        ({"nps_score": 5}, None),
+        (["not", "an", "object"], None),
+    ],
+)
+def test_validate_batch_item(obj, expected):
+    pred = orchestrator._validate_batch_item(obj)
+    assert (None if pred is None else (pred.repeat_purchase, pred.nps_score)) == expected
+
+
+def test_partial_batch_answer_falls_back_per_item(monkeypatch):
+    answer = [
+        {"id": 2, "repeat_purchase": False, "nps_score": 2, "reason": "late"},
+        {"id": 0, "repeat_purchase": True, "nps_score": 9, "reason": "love it"},
+        {"id": 1, "repeat_purchase": "perhaps", "nps_score": 5},  # malformed
+        {"id": 0, "repeat_purchase": False, "nps_score": 0},  # duplicate id, ignored
+        {"id": 7, "repeat_purchase": True, "nps_score": 5},  # unknown id
+    ]
+
+    def fake_generate(prompt, config, finish, cache_if=None):
+        finish["finish_reason"] = "STOP"
+        return json.dumps(answer)
+
+    monkeypatch.setattr(orchestrator, "_cached_generate", fake_generate)
+    preds = orchestrator.gemini_predict_batch(["a", "b", "c", "d"], [SIG] * 4, max_items=10)
+    assert [(p.source, p.nps_score) for p in (preds[0], preds[2])] == [("gemini", 9), ("gemini", 2)]
+    assert preds[1].source == "fallback" and preds[3].source == "fallback"
+    assert "item missing or malformed" in preds[3].reason
+
+
+def test_failed_batch_call_falls_back_for_its_items_only(monkeypatch):
+    def fake_generate(prompt, config, finish, cache_if=None):
+        if "[id=0]\nFeedback: boom" in prompt:
+            raise RuntimeError("500 internal")
+        n = prompt.count("[id=")
+        return json.dumps([{"id": i, "repeat_purchase": True, "nps_score": 8} for i in range(n)])
+
+    monkeypatch.setattr(orchestrator, "_cached_generate", fake_generate)
+    preds = orchestrator.gemini_predict_batch(["boom", "x", "y"], [SIG] * 3, max_items=1)
+    assert [p.source for p in preds] == ["fallback", "gemini", "gemini"]
+
+
+# Hybrid routing
+@pytest.fixture
+def surrogate_answers(monkeypatch):
+    """The local model answers items 0-2 with confidence 0.9, 0.6 and 0.75; item 3 has no prediction."""
+    local = orchestrator.GeminiPrediction(True, 8, "local", source="local")
+
+    def fake(signals_list, embeddings, ratings=None):
+        return [local, local, local, None], [0.9, 0.6, 0.75, 0.0]
+
+    monkeypatch.setattr(orchestrator, "surrogate_predict", fake)
+    monkeypatch.setattr(orchestrator, "SURROGATE_MIN_CONFIDENCE", 0.75)
+    monkeypatch.setattr(orchestrator.llm_client.breaker, "is_open", lambda: False)
+    return local
+
+
+def test_hybrid_escalates_low_confidence_items(surrogate_answers):
+    preds, escalate = orchestrator._route_predictions([SIG] * 4, None, "hybrid")
+    assert escalate == [1, 3]
+    assert preds == [surrogate_answers, None, surrogate_answers, None]
+
+
+def test_hybrid_answers_locally_while_the_circuit_is_open(surrogate_answers, monkeypatch):
+    monkeypatch.setattr(orchestrator.llm_client.breaker, "is_open", lambda: True)
+    preds, escalate = orchestrator._route_predictions([SIG] * 4, None, "hybrid")
+    assert escalate == []
+    assert [p.source for p in preds] == ["local", "fallback", "local", "fallback"]
+
+
+def test_local_mode_never_escalates(surrogate_answers):
+    preds, escalate = orchestrator._route_predictions([SIG] * 4, None, "local")
+    assert escalate == []
+    assert [p.source for p in preds] == ["local", "local", "local", "fallback"]
+
+
+def test_gemini_mode_escalates_everything(surrogate_answers):
+    assert orchestrator._route_predictions([SIG] * 4, None, "gemini") == ([None] * 4, [0, 1, 2, 3])
+    with pytest.raises(ValueError):
+        orchestrator._route_predictions([SIG], None, "magic")
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import precompute_dashboard as precompute
+import review_store
+from centroids import CentroidModel
+from dashboard_cube import AggregateCube
+
+# Fake encoder: texts mentioning "love" sit on the first axis, all others on the second
+CENTROIDS = CentroidModel(
+    name="emotion",
+    model_name="test",
+    centers=np.eye(2, dtype=np.float32),
+    labels=["joy", "anger"],
+    backend="torch",
+)
+
+
+def _embed(texts, *args, **kwargs):
+    return np.asarray([[1.0, 0.0] if "love" in t else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+
+def _raw(texts, ratings, departments=None):
+    return precompute.prepare_reviews(
+        pd.DataFrame(
+            {
+                "Review Text": texts,
+                "Rating": ratings,
+                "Department Name": departments or ["Tops"] * len(texts),
+                "Class Name": ["Knits"] * len(texts),
+                "Age": [30] * len(texts),
+            }
+        )
+    )
+
+
+@pytest.fixture
+def previous(tmp_path, monkeypatch):
+    """Cached store whose rows carry emotions no fresh clustering would produce."""
+    monkeypatch.setattr(precompute, "embed_texts", _embed)
+    monkeypatch.setattr(precompute.signals, "centroid_model", lambda name, *a: CENTROIDS)
+    # Clustering the changed rows themselves is exactly what must not happen
+    monkeypatch.setattr(
+        precompute.signals.emotions_mod,
+        "emotions_from_embeddings",
+        lambda *a, **k: pytest.fail("incremental refresh re-clustered the new rows"),
+    )
+    d = _raw(["I love this top", "Too small", "Fits well", "Fits well"], [5, 2, 4, 4], ["Tops", "Tops", "Dresses", "Dresses"])
+    frame = pd.DataFrame(
+        {
+            "row_hash": precompute.row_hashes(d),
+            "text": d["Review Text"],
+            "rating": d["Rating"],
+            "department": d["Department Name"],
+            "class": d["Class Name"],
+            "age": d["Age"],
+            "sentiment": ["positive", "negative", "positive", "positive"],
+            "emotion": ["surprise", "fear", "sadness", "sadness"],
+        }
+    )
+    path = str(tmp_path / "reviews")
+    review_store.write(frame, path)
+    store = precompute.load_previous(path)
+    cube = AggregateCube.from_frame(store.frame())
+    cube.generation = store.generation
+    return store, cube
+
+
+def test_unchanged_rows_keep_labels_and_new_rows_use_stored_centroids(previous):
+    store, _ = previous
+    # "Too small" edited, one "Fits well" deleted, one review added
+    d = _raw(["I love this top", "Too small, returned it", "Fits well", "Would love it in blue"], [5, 1, 4, 5])
+    d.loc[2, "Department Name"] = "Dresses"
+    dfp, stats = precompute.compute_signals_incremental(d, store)
+    assert stats == {"rows": 4, "reused": 2, "computed": 2, "deleted": 1, "mode": "incremental"}
+    assert dfp["emotion"].tolist() == ["surprise", "anger", "sadness", "joy"]
+    assert dfp["sentiment"].tolist()[:1] == ["positive"]
+
+
+def test_missing_centroid_model_falls_back_to_a_full_compute(previous, monkeypatch):
+    store, _ = previous
+    monkeypatch.setattr(precompute.signals, "centroid_model", lambda name, *a: None)
+    monkeypatch.setattr(precompute, "compute_signals", lambda d, **k: d.assign(marker=1))
+    dfp, stats = precompute.compute_signals_incremental(_raw(["Brand new review"], [3]), store)
+    assert stats["mode"] == "full" and stats["computed"] == 1 and stats["deleted"] == 4
+    assert "marker" in dfp.columns
+
+
+def test_no_fresh_rows_needs_no_centroid_model(previous, monkeypatch):
+    store, _ = previous
+    monkeypatch.setattr(precompute.signals, "centroid_model", lambda name, *a: None)
+    _, stats = precompute.compute_signals_incremental(_raw(["Fits well"], [4], ["Dresses"]), store)
+    assert stats["mode"] == "incremental" and stats["computed"] == 0
+
+
+def test_cube_delta_matches_a_full_rebuild(previous):
+    store, cube = previous
+    d = _raw(["I love this top", "Fits well", "New arrival, love it"], [5, 4, 3], ["Tops", "Dresses", "Jackets"])
+    dfp, _ = precompute.compute_signals_incremental(d, store)
+    removed, added = precompute.cache_delta(store, dfp)
+    assert sorted(removed["emotion"]) == ["fear", "sadness"]  # one of the two identical rows left
+    assert added["text"].tolist() == ["New arrival, love it"]
+
+    updated, how = precompute.build_cube(dfp, store, cube)
+    rebuilt = AggregateCube.from_frame(dfp)
+    assert how == "updated"
+    assert updated.labels == rebuilt.labels
+    assert np.array_equal(updated.count, rebuilt.count)
+    assert np.allclose(updated.rating_sum, rebuilt.rating_sum)
+    for filters in ({}, {"department": ["Jackets"]}, {"emotion": ["sadness", "joy"]}):
+        assert updated.aggregate(filters) == rebuilt.aggregate(filters)
+
+
+def test_cube_of_another_generation_is_rebuilt(previous):
+    store, cube = previous
+    cube.generation = "elsewhere"
+    dfp, _ = precompute.compute_signals_incremental(_raw(["Fits well"], [4], ["Dresses"]), store)
+    _, how = precompute.build_cube(dfp, store, cube)
+    assert how == "rebuilt"
+
+
+def test_summary_is_read_off_the_cube(tmp_path):
+    dfp = pd.DataFrame(
+        {
+            "rating": [5.0, 1.0, 4.0],
+            "department": ["Tops", "Tops", "Dresses"],
+            "sentiment": ["positive", "negative", "positive"],
+            "emotion": ["joy", "anger", "joy"],
+        }
+    )
+    path = tmp_path / "summary.json"
+    precompute.write_summary(AggregateCube.from_frame(dfp), str(path))
+    summary = pd.read_json(path, typ="series")
+    assert summary["total_reviews"] == 3
+    assert summary["nps"] == pytest.approx(100 / 3)
+    assert summary["positive_sentiment_pct"] == pytest.approx(200 / 3)
+    assert summary["department_ratings"] == [
+        {"department": "Dresses", "averageRating": 4.0},
+        {"department": "Tops", "averageRating": 3.0},
+    ]
+
+
+def test_empty_previous_cache_scores_every_row(tmp_path, monkeypatch):
+    monkeypatch.setattr(precompute, "embed_texts", _embed)
+    monkeypatch.setattr(precompute.signals, "centroid_model", lambda name, *a: CENTROIDS)
+    # A cache written from an empty CSV
+    path = str(tmp_path / "reviews")
+    review_store.write(pd.DataFrame({"row_hash": pd.Series([], dtype="uint64")}), path)
+    store = precompute.load_previous(path)
+    assert store is not None and len(store) == 0
+
+    d = _raw(["I love this top", "Too small"], [5, 2])
+    dfp, stats = precompute.compute_signals_incremental(d, store)
+    assert stats == {"rows": 2, "reused": 0, "computed": 2, "deleted": 0, "mode": "incremental"}
+    assert dfp["emotion"].tolist() == ["joy", "anger"]
+
+    cube = AggregateCube.from_frame(store.frame())
+    cube.generation = store.generation
+    updated, how = precompute.build_cube(dfp, store, cube)
+    assert how == "updated"
+    assert updated.aggregate() == AggregateCube.from_frame(dfp).aggregate()
+
@@ -0,0 +1,60 @@
+from response_cache import ResponseCache, etag_matches, make_etag
+
+
+def test_etag_depends_on_version_and_body():
+    etag = make_etag("gen1", b"{}")
+    assert etag.startswith('"gen1-') and etag.endswith('"')
+    assert make_etag("gen1", b"{}") == etag
+    assert make_etag("gen2", b"{}") != etag
+    assert make_etag("gen1", b"[]") != etag
+
+
+def test_if_none_match_comparison():
+    etag = make_etag("gen1", b"{}")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"gen0-0000"', etag)
+
+
+def test_compressed_variants_have_their_own_etag():
+    cache = ResponseCache()
+    entry = cache.put("k", "gen1", b"{}")
+    gz = entry.variant_etag("gzip")
+    assert gz != entry.etag and gz.endswith('-gzip"')
+    assert entry.variant_etag(None) == entry.etag
+    assert not etag_matches(gz, entry.etag)
+
+
+def test_entries_of_another_version_are_misses():
+    cache = ResponseCache()
+    cache.put("k", "gen1", b"v1")
+    assert cache.get("k", "gen1").body == b"v1"
+    assert cache.get("k", "gen2") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_bound_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("a", "v", b"12")
+    cache.put("b", "v", b"34")
+    cache.get("a", "v")
+    cache.put("c", "v", b"56")  # evicts b, the least recently used
+    assert cache.get("b", "v") is None and cache.get("a", "v") is not None
+    cache.put("d", "v", b"123456789")  # 9 bytes: only d fits
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 9
+    big = cache.put("e", "v", b"x" * 11)  # larger than the cache: returned, not kept
+    assert big.body == b"x" * 11 and cache.get("e", "v") is None
+
+
+def test_variants_count_towards_the_byte_bound_and_clear_invalidates():
+    cache = ResponseCache(max_entries=4, max_bytes=100)
+    entry = cache.put("k", "v", b"x" * 40)
+    cache.add_variant(entry, "gzip", b"z" * 10)
+    cache.add_variant(entry, "gzip", b"ignored")
+    assert cache.stats()["bytes"] == 50 and entry.variants["gzip"] == b"z" * 10
+    cache.clear()
+    assert cache.get("k", "v") is None
+    assert cache.stats()["bytes"] == 0 and cache.invalidations == 1
@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+import review_store
+from review_store import ReviewStore
+
+
+def _frame(texts, emotion="joy"):
+    n = len(texts)
+    return pd.DataFrame(
+        {
+            "row_hash": range(1, n + 1),
+            "text": texts,
+            "rating": [5.0] * n,
+            "department": ["Tops"] * n,
+            "sentiment": ["positive"] * n,
+            "emotion": [emotion] * n,
+        }
+    )
+
+
+def test_roundtrip_with_defaults_for_missing_columns(tmp_path):
+    path = str(tmp_path)
+    review_store.write(_frame(["ünïcode ✓", ""]), path)
+    store = ReviewStore.load(path)
+    assert len(store) == 2
+    assert store.texts([0, 1]) == ["ünïcode ✓", ""]
+    assert store.take("class", [0, 1]) == ["Unknown", "Unknown"]
+    assert store.take("age", [1]) == [0.0]
+    assert store.take("row_hash", [1]) == [2]
+    assert store.frame()["emotion"].tolist() == ["joy", "joy"]
+
+
+def test_each_write_is_a_new_generation_and_old_mappings_stay_consistent(tmp_path):
+    path = str(tmp_path)
+    review_store.write(_frame(["first", "second"]), path)
+    old = ReviewStore.load(path)
+    review_store.write(_frame(["replaced"], emotion="anger"), path)
+    new = ReviewStore.load(path)
+    assert new.generation != old.generation
+    assert new.texts([0]) == ["replaced"] and new.take("emotion", [0]) == ["anger"]
+    # The earlier mapping still reads its own generation (POSIX keeps unlinked files readable)
+    assert old.texts([0, 1]) == ["first", "second"] and old.take("emotion", [1]) == ["joy"]
+    bins = [f for f in os.listdir(path) if f.endswith(".bin")]
+    assert bins and all(f.startswith(new.generation + ".") for f in bins)
+
+
+def test_empty_frame(tmp_path):
+    review_store.write(_frame([]), str(tmp_path))
+    store = ReviewStore.load(str(tmp_path))
+    assert len(store) == 0 and store.frame().empty
+
+
+def test_load_or_none(tmp_path):
+    assert review_store.load_or_none(str(tmp_path)) is None
+    (tmp_path / "meta.json").write_text('{"version": 99}')
+    assert review_store.load_or_none(str(tmp_path)) is None
+
+
+@pytest.mark.skipif(review_store.fcntl is None, reason="refresh election needs POSIX flock")
+def test_refresh_election_lets_one_holder_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(review_store, "_ELECTION_SECONDS", 0.05)
+    path = str(tmp_path)
+    assert not review_store.refresh_in_progress(path)
+    with review_store.refresh_lock(path) as elected:
+        assert elected
+        assert review_store.refresh_in_progress(path)
+        with review_store.refresh_lock(path) as other:
+            assert not other  # another open file description sees the lock held
+    assert not review_store.refresh_in_progress(path)
+    with review_store.refresh_lock(path) as elected_again:
+        assert elected_again
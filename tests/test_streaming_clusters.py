@@ -0,0 +1,38 @@
+import numpy as np
+
+import streaming_clusters
+
+
+def _fake_encode(calls):
+    def encode(texts, model_name=None, *, cache=True, **_):
+        calls.append(cache)
+        rng = np.random.default_rng(len(texts))
+        X = rng.normal(size=(len(texts), 4)).astype(np.float32)
+        return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+    return encode
+
+
+def test_spilled_chunks_are_not_persisted_to_the_store(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(streaming_clusters.model_registry, "encode", _fake_encode(calls))
+    texts = [f"review {i}" for i in range(25)]
+    centers, spill = streaming_clusters.fit_minibatch_centers(texts, {"emotion": 3}, chunk_size=10, spill_dir=str(tmp_path))
+    try:
+        assert calls == [False, False, False]
+        assert spill is not None and spill.rows == 25
+        assert centers["emotion"].shape == (3, 4)
+        replayed = list(streaming_clusters.iter_embeddings(texts, spill=spill, chunk_size=10))
+        assert sum(len(X) for X in replayed) == 25
+        assert len(calls) == 3  # labelling pass reads the spill, no re-encode
+    finally:
+        spill.remove()
+
+
+def test_without_spill_vectors_go_to_the_store(monkeypatch):
+    calls = []
+    monkeypatch.setattr(streaming_clusters.model_registry, "encode", _fake_encode(calls))
+    texts = [f"review {i}" for i in range(12)]
+    _, spill = streaming_clusters.fit_minibatch_centers(texts, {"emotion": 2}, chunk_size=6)
+    assert spill is None
+    assert calls == [True, True]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import numpy as np
+
+import surrogate
+from surrogate import SurrogateModel
+
+
+def _model(**kw):
+    return SurrogateModel(
+        model_name=surrogate.model_registry.DEFAULT_MODEL,
+        emotions=["joy"],
+        intents=["other"],
+        mean=np.zeros(6, dtype=np.float32),
+        scale=np.ones(6, dtype=np.float32),
+        rec_coef=np.array([4.0, 0, 0, 0, 0, 0], dtype=np.float32),
+        rec_bias=0.0,
+        nps_coef=np.zeros(6, dtype=np.float32),
+        nps_bias=5.0,
+        **kw,
+    )
+
+
+def test_concurrent_first_calls_wait_for_one_load(monkeypatch):
+    loads = []
+
+    def slow_load(cls, path=surrogate.SURROGATE_PATH):
+        loads.append(path)
+        time.sleep(0.2)
+        return _model()
+
+    monkeypatch.setattr(SurrogateModel, "load", classmethod(slow_load))
+    surrogate.reload_model()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(surrogate.get_model())) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(loads) == 1
+        assert len(results) == 8 and all(r is not None and r is results[0] for r in results)
+    finally:
+        surrogate.reload_model()
+
+
+def test_platt_scale_recovers_overconfident_logits():
+    rng = np.random.default_rng(0)
+    true_logit = rng.normal(scale=2.0, size=20000)
+    labels = rng.random(20000) < 1.0 / (1.0 + np.exp(-true_logit))
+    raw = 3.0 * true_logit - 1.0  # overconfident and shifted
+    a, b = surrogate.platt_scale(raw, labels)
+    assert abs(a - 1 / 3) < 0.03
+    assert abs(b - 1 / 3) < 0.1
+    raw_err = surrogate.calibration_error(1.0 / (1.0 + np.exp(-raw)), labels)
+    cal_err = surrogate.calibration_error(1.0 / (1.0 + np.exp(-(a * raw + b))), labels)
+    assert cal_err < 0.02 < raw_err
+
+
+def test_predict_applies_calibration_and_roundtrips(tmp_path):
+    F = np.array([[0.5, 0, 0, 0, 0, 0]], dtype=np.float32)  # logit 2.0
+    _, _, raw_conf = _model().predict(F)
+    m = _model(calib_a=0.5, calib_b=0.0)
+    _, _, conf = m.predict(F)
+    assert np.isclose(raw_conf[0], 1 / (1 + np.exp(-2.0)))
+    assert np.isclose(conf[0], 1 / (1 + np.exp(-1.0)))
+    loaded = SurrogateModel.load(m.save(str(tmp_path / "s.npz")))
+    assert (loaded.calib_a, loaded.calib_b) == (0.5, 0.0)
+
+
+def test_threshold_report_escalation_and_kept_accuracy():
+    correct = np.array([True, False, True, True])
+    conf = np.array([0.55, 0.65, 0.8, 0.95])
+    rows = {r["threshold"]: r for r in surrogate.threshold_report(correct, conf, (0.6, 0.9))}
+    assert rows[0.6]["escalated"] == 0.25 and np.isclose(rows[0.6]["kept_accuracy"], 2 / 3)
+    assert rows[0.9]["escalated"] == 0.75 and rows[0.9]["kept_accuracy"] == 1.0
+
+
+def test_backend_mismatch_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(surrogate, "SURROGATE_PATH", str(tmp_path / "surrogate.npz"))
+    _model(backend="torch").save(surrogate.SURROGATE_PATH)
+    try:
+        for backend, usable in (("onnx-int8", False), ("onnx", False), ("torch", True)):
+            surrogate.reload_model()
+            assert (surrogate.get_model(backend=backend) is not None) is usable
+    finally:
+        surrogate.reload_model()
+
+
+def test_files_without_backend_are_torch_fp32(tmp_path):
+    path = str(tmp_path / "surrogate.npz")
+    _model(backend="onnx-int8").save(path)
+    with np.load(path) as data:
+        legacy = {k: data[k] for k in data.files if k not in ("backend", "quantization")}
+    np.savez(path, **legacy)
+    m = SurrogateModel.load(path)
+    assert (m.backend, m.quantization) == ("torch", "fp32")